@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tabulated background cosmology, built once per Cosmo.
+
+Background(cosmo) samples E(a), Ω_m(a), dlnH/dlna and the comoving distance
+χ(a) on a fine uniform ln a grid together with their ln a derivatives, and
+serves lookups by cubic Hermite interpolation (error ~ h⁴; ≲1e-12 relative on
+the default grid).  Supports the optional Cosmo components in ilg_common
+(radiation, curvature, w0–wa dark energy).
+
+Distances are in Mpc/h:  χ(a) = (c/H0)·h ∫_a^1 da'/(a'² E(a')), computed once by
+a derivative-corrected trapezoid rule (4th order) at build time.
+
+Use background_for(cosmo) to share one object per parameter set; growth
+(linear_growth_demo.integrate_growth(bg=...)), the kernel (ilg_common.mu_eff_grid(...,
+bg=...)) and lensing draw their background quantities from it.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import math
+from dataclasses import astuple
+
+from ilg_common import Cosmo, E2, KM_S_MPC_TO_SI, d2lnE2_dlna2, dlnE2_dlna
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - scalar lookups work without NumPy
+    np = None
+
+C_KM_S = 299_792.458
+
+
+class Background:
+    """E, Ω_m, dlnH/dlna, χ tables on ln a ∈ [ln a_min, ln a_max]."""
+
+    QUANTITIES = ('E', 'omega_m', 'dlnH', 'chi')
+
+    def __init__(self, cosmo: Cosmo | None = None, a_min: float = 1e-8, a_max: float = 1.0, n: int = 4096):
+        self.cosmo = cosmo or Cosmo()
+        c = self.cosmo
+        self.lna_min = math.log(a_min)
+        self.lna_max = math.log(a_max)
+        self.n = n
+        self.h = (self.lna_max - self.lna_min) / (n - 1)
+        self._inv_h = 1.0 / self.h
+        # c/H0 in Mpc/h
+        self.hubble_distance = C_KM_S * c.h / c.H0
+        lna = [self.lna_min + i * self.h for i in range(n)]
+        a = [math.exp(t) for t in lna]
+        e = [math.sqrt(E2(t, c)) for t in a]
+        dl = [dlnE2_dlna(t, c) for t in a]          # d ln E²/d ln a
+        d2l = [d2lnE2_dlna2(t, c) for t in a]
+        om = [c.Omega_m0 / t**3 / ei**2 for t, ei in zip(a, e)]
+        tab = {
+            'E': (e, [ei * 0.5 * d for ei, d in zip(e, dl)]),
+            'omega_m': (om, [o * (-3.0 - d) for o, d in zip(om, dl)]),
+            'dlnH': ([0.5 * d for d in dl], [0.5 * d for d in d2l]),
+        }
+        # χ(ln a) = D_H ∫_{ln a}^{0} f dln a',  f = 1/(a E),  df/dln a = -f (1 + dlnH/dlna)
+        f = [self.hubble_distance / (t * ei) for t, ei in zip(a, e)]
+        fp = [-fi * (1.0 + 0.5 * d) for fi, d in zip(f, dl)]
+        cum = [0.0] * n
+        for i in range(1, n):
+            cum[i] = cum[i - 1] + 0.5 * self.h * (f[i - 1] + f[i]) + self.h**2 / 12.0 * (fp[i - 1] - fp[i])
+        # χ is measured from a = 1 (or a_max when it is below 1)
+        if self.lna_max >= 0.0:
+            i1 = min(int(-self.lna_min * self._inv_h), n - 2)
+            ref = self._hermite_raw(cum, f, i1, (-self.lna_min) * self._inv_h - i1)
+        else:
+            ref = cum[-1]
+        tab['chi'] = ([ref - v for v in cum], [-v for v in f])
+        self._neg_chi = [v - ref for v in cum]  # increasing, for bisection
+        self._tab = tab
+        self._arr = None
+        if np is not None:
+            self._arr = {k: (np.asarray(v), np.asarray(d)) for k, (v, d) in tab.items()}
+
+    # ---------- interpolation ----------
+
+    def _hermite_raw(self, v, d, i, t):
+        h = self.h
+        t2 = t * t
+        t3 = t2 * t
+        return ((2 * t3 - 3 * t2 + 1) * v[i] + (t3 - 2 * t2 + t) * h * d[i]
+                + (-2 * t3 + 3 * t2) * v[i + 1] + (t3 - t2) * h * d[i + 1])
+
+    def _loc(self, lna):
+        u = (lna - self.lna_min) * self._inv_h
+        if not (-1e-9 <= u <= self.n - 1 + 1e-9):
+            raise ValueError(f'a={math.exp(lna):g} outside background table [{math.exp(self.lna_min):g}, {math.exp(self.lna_max):g}]')
+        i = min(max(int(u), 0), self.n - 2)
+        return i, u - i
+
+    def value(self, name: str, a: float) -> float:
+        """Scalar lookup of one tabulated quantity."""
+        i, t = self._loc(math.log(a))
+        v, d = self._tab[name]
+        return self._hermite_raw(v, d, i, t)
+
+    def values(self, name: str, a):
+        """Vectorized lookup (NumPy arrays of any shape)."""
+        if np is None:
+            raise RuntimeError('vectorized background lookups require NumPy')
+        a = np.asarray(a, dtype=float)
+        u = (np.log(a) - self.lna_min) * self._inv_h
+        if np.any(u < -1e-9) or np.any(u > self.n - 1 + 1e-9):
+            raise ValueError('a outside background table')
+        i = np.clip(u.astype(np.int64), 0, self.n - 2)
+        t = u - i
+        v, d = self._arr[name]
+        t2 = t * t
+        t3 = t2 * t
+        return ((2 * t3 - 3 * t2 + 1) * v[i] + (t3 - 2 * t2 + t) * self.h * d[i]
+                + (-2 * t3 + 3 * t2) * v[i + 1] + (t3 - t2) * self.h * d[i + 1])
+
+    # ---------- public quantities ----------
+
+    def E(self, a):
+        return self.values('E', a) if not isinstance(a, (int, float)) else self.value('E', a)
+
+    def H(self, a):
+        """H(a) in 1/s."""
+        return self.cosmo.H0 * KM_S_MPC_TO_SI * self.E(a)
+
+    def omega_m(self, a):
+        return self.values('omega_m', a) if not isinstance(a, (int, float)) else self.value('omega_m', a)
+
+    def dlnH_dlna(self, a):
+        return self.values('dlnH', a) if not isinstance(a, (int, float)) else self.value('dlnH', a)
+
+    def growth_terms(self, a: float):
+        """(dlnH/dlna, Ω_m(a)) for the growth equation (scalar)."""
+        i, t = self._loc(math.log(a))
+        v, d = self._tab['dlnH']
+        dl = self._hermite_raw(v, d, i, t)
+        v, d = self._tab['omega_m']
+        return dl, self._hermite_raw(v, d, i, t)
+
+    def chi(self, a):
+        """Line-of-sight comoving distance to scale factor a [Mpc/h]."""
+        return self.values('chi', a) if not isinstance(a, (int, float)) else self.value('chi', a)
+
+    def comoving_transverse(self, a):
+        """Transverse comoving distance f_K(χ) [Mpc/h] including curvature."""
+        x = self.chi(a)
+        ok = self.cosmo.Omega_k0
+        if ok == 0:
+            return x
+        s = math.sqrt(abs(ok)) / self.hubble_distance
+        if np is not None and not isinstance(x, float):
+            return np.sinh(s * x) / s if ok > 0 else np.sin(s * x) / s
+        return math.sinh(s * x) / s if ok > 0 else math.sin(s * x) / s
+
+    def a_of_chi(self, chi):
+        """Inverse of χ(a) (monotone); linear in ln a between nodes, refined by one Newton step."""
+        v = self._tab['chi'][0]
+        if np is not None and not isinstance(chi, (int, float)):
+            chi = np.asarray(chi, dtype=float)
+            vr = self._arr['chi'][0][::-1]
+            lna_nodes = self.lna_min + self.h * np.arange(self.n)[::-1]
+            lna = np.interp(chi, vr, lna_nodes)
+            a = np.exp(lna)
+            # dχ/dln a = -D_H/(aE)
+            return a * np.exp((self.chi(a) - chi) * a * self.E(a) / self.hubble_distance)
+        j = bisect.bisect_left(self._neg_chi, -chi)
+        j = min(max(j, 1), self.n - 1)
+        lna0 = self.lna_min + (j - 1) * self.h
+        frac = (v[j - 1] - chi) / (v[j - 1] - v[j]) if v[j - 1] != v[j] else 0.0
+        a = math.exp(lna0 + frac * self.h)
+        return a * math.exp((self.chi(a) - chi) * a * self.E(a) / self.hubble_distance)
+
+
+_BACKGROUNDS = {}
+
+
+def background_for(cosmo: Cosmo | None = None, **kwargs) -> Background:
+    """Memoized Background per (Cosmo, grid settings)."""
+    cosmo = cosmo or Cosmo()
+    key = (astuple(cosmo), tuple(sorted(kwargs.items())))
+    bg = _BACKGROUNDS.get(key)
+    if bg is None:
+        bg = _BACKGROUNDS[key] = Background(cosmo, **kwargs)
+    return bg
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tabulated background: E(a), Ω_m(a), dlnH/dlna and comoving distance.')
+    parser.add_argument('--Omega-m0', type=float, default=0.3)
+    parser.add_argument('--Omega-L0', type=float, default=None, help='Default: 1 - Ω_m0 - Ω_r0 - Ω_k0.')
+    parser.add_argument('--Omega-r0', type=float, default=0.0)
+    parser.add_argument('--Omega-k0', type=float, default=0.0)
+    parser.add_argument('--w0', type=float, default=-1.0)
+    parser.add_argument('--wa', type=float, default=0.0)
+    parser.add_argument('--zs', type=str, default='0.1,0.5,1,2,5', help='Comma-separated redshifts to report.')
+    args = parser.parse_args()
+
+    ol = args.Omega_L0 if args.Omega_L0 is not None else 1.0 - args.Omega_m0 - args.Omega_r0 - args.Omega_k0
+    cosmo = Cosmo(Omega_m0=args.Omega_m0, Omega_L0=ol, Omega_r0=args.Omega_r0, Omega_k0=args.Omega_k0,
+                  w0=args.w0, wa=args.wa)
+    bg = background_for(cosmo)
+    print(f'{cosmo}')
+    for z in [float(s) for s in args.zs.split(',') if s]:
+        a = 1.0 / (1.0 + z)
+        print(f'z={z:5.2f}  E={bg.E(a):.6f}  Ω_m(a)={bg.omega_m(a):.6f}  dlnH/dlna={bg.dlnH_dlna(a):+.6f}  '
+              f'χ={bg.chi(a):9.3f} Mpc/h  D_M={bg.comoving_transverse(a):9.3f} Mpc/h')
@@ -3,7 +3,7 @@
 Minimal CI/status harness for the audit repo.
 
 Runs core checks and writes a unified docs/ci_status.json suitable for the website:
-- Gating S: run ilg_gates_check.py (import or subprocess) and ensure |B|=46, S=489/512
+- Gating S: gates_engine in-process (ilg_gates_check.py subprocess without NumPy); |B|=46, S=489/512
 - Growth JSON present and well-formed
 - Lensing JSON present and well-formed
 - Conservation checks: 2D constant-w, 2D varying-w, 3D combined
@@ -18,13 +18,29 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / 'docs'
 SCRIPTS = ROOT / 'scripts'
+sys.path.insert(0, str(SCRIPTS))
 
 
 def run_gates_check():
-    p = subprocess.run([sys.executable, str(SCRIPTS / 'ilg_gates_check.py')], capture_output=True, text=True)
-    out = p.stdout
-    ok = ('|B| (brute)   = 46' in out) and ('S   (brute)   = 1 - 46/1024' in out)
-    return {'passed': ok, 'stdout': out.strip()}
+    import gates_engine
+    from ilg_gates_check import analytic_union_size
+    if gates_engine.np is None:  # NumPy missing: fall back to the script's stdout
+        p = subprocess.run([sys.executable, str(SCRIPTS / 'ilg_gates_check.py')], capture_output=True, text=True)
+        out = p.stdout
+        ok = ('|B| (brute)   = 46' in out) and ('S   (brute)   = 1 - 46/1024' in out)
+        return {'passed': ok, 'stdout': out.strip()}
+    res = gates_engine.evaluate_schedule()
+    n_b, T = res['blocked'], res['T']
+    U = analytic_union_size()
+    out = '\n'.join([
+        f"|B| (engine)  = {n_b}",
+        f"S   (engine)  = 1 - {n_b}/{T} -> {1.0 - n_b / T:.9f}",
+        f"|B| (analytic)= {U}",
+        f"S   (analytic)= 1 - {U}/{T} -> {1.0 - U / T:.9f}",
+    ])
+    ok = n_b == 46 and U == 46 and res['S_fraction'] == '489/512'
+    return {'passed': ok, 'blocked': n_b, 'S': res['S'], 'S_fraction': res['S_fraction'],
+            'per_gate': res['per_gate'], 'overlap': res['overlap'], 'stdout': out}
 
 
 def check_json(path, keys):
@@ -83,6 +99,13 @@ if __name__ == '__main__':
     status['cons_2d_var'] = run_conservation('conservation_check_varying_w.py', 'conservation_check_varying.json')
     # Conservation 3D
     status['cons_3d'] = run_conservation('conservation_check_3d.py', 'conservation_check_3d.json')
+    # Stencil grid-refinement study (exits non-zero when the observed order misses the expected one);
+    # it needs NumPy, so without it the check is reported as skipped rather than failed
+    from ilg_common import have_numpy
+    if have_numpy():
+        status['cons_convergence'] = run_conservation('convergence_study.py', 'convergence_study.json')
+    else:
+        status['cons_convergence'] = {'present': False, 'skipped': 'requires NumPy (not installed)'}
     # Ledger snapshot (non-failing): capture stdout to docs/ledger_snapshot_v22c.txt
     try:
         out_txt = DOCS / 'ledger_snapshot_v22c.txt'
@@ -164,6 +187,7 @@ if __name__ == '__main__':
         'cons_2d_const': '2D conservation (constant w=1): discrete Laplacian test passes with negligible residuals.',
         'cons_2d_var': '2D conservation (varying w): discrete divergence theorem (source minus flux) agrees to numerical precision.',
         'cons_3d': '3D conservation: both constant-w Laplacian and varying-w divergence checks pass on a voxel cube.',
+        'cons_convergence': 'Stencil refinement study: observed order of the 2D/3D face-flux divergence error matches 2 and every level conserves to round-off.',
         'ilg_limits': 'ILG limits: numeric probes confirm Newtonian recovery (mu→1) and controlled deep-regime behavior; sweep serialized to docs/ilg_limit_checks.json.',
         'metrics': 'Aggregated residual metrics computed and badges derived.',
         'uncertainties': 'Presence/shape of docs/masses_uncertainties.json; values may be zero until measured/model uncertainties are provided.',
@@ -244,6 +268,13 @@ if __name__ == '__main__':
             meaning='Extends conservation verification to the 3D lattice used by the framework.',
             result_builder=first_lines,
         ),
+        'cons_convergence': check_detail(
+            'cons_convergence',
+            purpose='Measure accuracy and cost scaling of the face-flux stencil under grid refinement.',
+            method='Run convergence_study.py over 2D/3D refinement levels in parallel; gate on observed order.',
+            meaning='Backs the O(h^2) consistency sketch in the Study Guide with measured orders and timings.',
+            result_builder=lambda i: first_lines(i) or i.get('skipped', ''),
+        ),
         'masses_json': check_detail(
             'masses_json',
             purpose='Ensure mass/mixing snapshot export contains all sectors.',
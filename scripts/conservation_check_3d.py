@@ -9,185 +9,192 @@
    Compute interior sum of div(w ∇Φ) via face flux differences and compare to
    outward boundary flux sum; residual should be ~0.
 
-Outputs JSON with both checks and pass/fail.
+Both run on the slab-streamed stencil in stencil.py, with fields generated slab
+by slab, so --n 512 fits in a few hundred MB.  With --memmap DIR, Φ and w are
+first written to float64 .npy files in DIR and the checks read them back slab
+by slab (one-plane halos along z), reporting bytes read and peak RSS; this is
+the out-of-core mode for 2048³ grids (2 × 64 GiB of disk).  Files in DIR are
+reused on a rerun with the same n, h and a.  With --workers N the grid is
+split into blocks held in shared memory (domain_decomp.py); the JSON then
+carries per-worker sums and timings under 'parallel'.  The two combine: with
+--memmap and --workers each worker fills its block from the files in DIR, but
+the whole grid then sits in shared memory (16·n³ bytes plus halos, in
+/dev/shm), so that combination is not out-of-core; it is refused above
+--max-shared-gib.  Outputs JSON with both checks and pass/fail.
 """
+import argparse
 import json
+import os
+import time
 from datetime import datetime
+from pathlib import Path
+
+from domain_decomp import decomposed_checks, shared_bytes
+from stencil import (SLAB, NpyPlanes, conservation_sums, divergence, format_rss, grid_shape, laplacian_error,
+                     peak_rss_mb, radial_weight, radius2, write_npy_planes)
+
+
+MAX_SHARED_BYTES = 4 * 2**30  # shared-memory cap for --memmap with --workers
 
 
 def laplacian_central_3d(phi, h=1.0):
-    nz = len(phi)
-    ny = len(phi[0])
-    nx = len(phi[0][0])
-    lap = [[[0.0]*nx for _ in range(ny)] for __ in range(nz)]
-    inv_h2 = 1.0/(h*h)
-    for k in range(1, nz-1):
-        for j in range(1, ny-1):
-            for i in range(1, nx-1):
-                lap[k][j][i] = (
-                    (phi[k][j][i+1] - 2.0*phi[k][j][i] + phi[k][j][i-1])
-                  + (phi[k][j+1][i] - 2.0*phi[k][j][i] + phi[k][j-1][i])
-                  + (phi[k+1][j][i] - 2.0*phi[k][j][i] + phi[k-1][j][i])
-                ) * inv_h2
-    return lap
+    return divergence(phi, None, h)
 
 
 def build_phi_w_3d(nx=17, ny=17, nz=17, h=1.0, a=1e-4):
-    phi = [[[ (i*h)**2 + (j*h)**2 + (k*h)**2 for i in range(nx)] for j in range(ny)] for k in range(nz)]
-    w = [[[ 1.0/(1.0 + a*((i*h)**2 + (j*h)**2 + (k*h)**2)) for i in range(nx)] for j in range(ny)] for k in range(nz)]
+    return radius2((nz, ny, nx), h), radial_weight((nz, ny, nx), h, a)
+
+
+def divergence_sum_and_boundary_flux_3d(phi, w, h=1.0, slab=SLAB):
+    res = conservation_sums(phi, w, grid_shape(phi), h, slab)
+    return res['sum_div_interior'], res['flux_out_boundary']
+
+
+def _analytic_fields(shape, h, a):
+    def phi(lo, hi):
+        return radius2(shape, h, lo, hi)
+
+    def w(lo, hi):
+        return radial_weight(shape, h, a, lo, hi)
+
     return phi, w
 
 
-def face_avg(a, b):
-    return 0.5*(a+b)
-
-
-def divergence_sum_and_boundary_flux_3d(phi, w, h=1.0):
-    nz = len(phi)
-    ny = len(phi[0])
-    nx = len(phi[0][0])
-
-    def grad_x(i_half, j, k):
-        i = i_half
-        return (phi[k][j][i+1] - phi[k][j][i]) / h
-
-    def grad_y(i, j_half, k):
-        j = j_half
-        return (phi[k][j+1][i] - phi[k][j][i]) / h
-
-    def grad_z(i, j, k_half):
-        k = k_half
-        return (phi[k+1][j][i] - phi[k][j][i]) / h
-
-    def w_x(i_half, j, k):
-        i = i_half
-        return face_avg(w[k][j][i], w[k][j][i+1])
-
-    def w_y(i, j_half, k):
-        j = j_half
-        return face_avg(w[k][j][i], w[k][j+1][i])
-
-    def w_z(i, j, k_half):
-        k = k_half
-        return face_avg(w[k][j][i], w[k+1][j][i])
-
-    sum_div = 0.0
-    for k in range(1, nz-1):
-        for j in range(1, ny-1):
-            for i in range(1, nx-1):
-                fxR = w_x(i, j, k) * grad_x(i, j, k)
-                fxL = w_x(i-1, j, k) * grad_x(i-1, j, k)
-                fyT = w_y(i, j, k) * grad_y(i, j, k)
-                fyB = w_y(i, j-1, k) * grad_y(i, j-1, k)
-                fzU = w_z(i, j, k) * grad_z(i, j, k)
-                fzD = w_z(i, j, k-1) * grad_z(i, j, k-1)
-                div_ijk = (fxR - fxL + fyT - fyB + fzU - fzD) / h
-                sum_div += div_ijk
-
-    flux_out = 0.0
-    # x-min face (i=0), outward normal (-1,0,0)
-    i = 0
-    for k in range(nz):
-        for j in range(ny):
-            if j in (0, ny-1) or k in (0, nz-1):
-                continue
-            gx = (phi[k][j][i] - phi[k][j][i+1]) / h
-            wx = w_x(i, j, k)
-            flux_out += wx * gx
-    # x-max face (i=nx-1)
-    i = nx-2
-    for k in range(nz):
-        for j in range(ny):
-            if j in (0, ny-1) or k in (0, nz-1):
-                continue
-            gx = (phi[k][j][i+1] - phi[k][j][i]) / h
-            wx = w_x(i, j, k)
-            flux_out += wx * gx
-    # y-min face (j=0)
-    j = 0
-    for k in range(nz):
-        for i in range(nx):
-            if i in (0, nx-1) or k in (0, nz-1):
-                continue
-            gy = (phi[k][j][i] - phi[k][j+1][i]) / h
-            wy = w_y(i, j, k)
-            flux_out += wy * gy
-    # y-max face (j=ny-1)
-    j = ny-2
-    for k in range(nz):
-        for i in range(nx):
-            if i in (0, nx-1) or k in (0, nz-1):
-                continue
-            gy = (phi[k][j+1][i] - phi[k][j][i]) / h
-            wy = w_y(i, j, k)
-            flux_out += wy * gy
-    # z-min face (k=0)
-    k = 0
-    for j in range(ny):
-        for i in range(nx):
-            if i in (0, nx-1) or j in (0, ny-1):
-                continue
-            gz = (phi[k][j][i] - phi[k+1][j][i]) / h
-            wz = w_z(i, j, k)
-            flux_out += wz * gz
-    # z-max face (k=nz-1)
-    k = nz-2
-    for j in range(ny):
-        for i in range(nx):
-            if i in (0, nx-1) or j in (0, ny-1):
-                continue
-            gz = (phi[k+1][j][i] - phi[k][j][i]) / h
-            wz = w_z(i, j, k)
-            flux_out += wz * gz
-
-    return sum_div, flux_out
-
-
-def run_checks_3d():
-    h = 1.0
-    nx = ny = nz = 17
-    phi, w = build_phi_w_3d(nx, ny, nz, h, a=1e-4)
+def run_checks_3d(n=17, h=1.0, a=1e-4, slab=SLAB, phi=None, w=None):
+    shape = (n, n, n)
+    if phi is None or w is None:
+        phi, w = _analytic_fields(shape, h, a)
     # Constant-w Laplacian (use w=1 via phi only)
-    lap = laplacian_central_3d(phi, h)
-    max_abs_err = 0.0
-    count = 0
-    for k in range(1, nz-1):
-        for j in range(1, ny-1):
-            for i in range(1, nx-1):
-                err = abs(lap[k][j][i] - 6.0)
-                if err > max_abs_err:
-                    max_abs_err = err
-                count += 1
-    lap_ok = (max_abs_err <= 1e-12)
+    lap = laplacian_error(phi, shape, 6.0, h, slab)
     # Varying-w divergence theorem
-    sum_div, flux_out = divergence_sum_and_boundary_flux_3d(phi, w, h)
-    resid = abs(sum_div - flux_out)
-    div_ok = (resid <= 1e-8)
+    res = conservation_sums(phi, w, shape, h, slab)
+    return _checks_result(lap['max_abs_err'], lap['count_interior'], res)
+
+
+def _checks_result(lap_err, count, res):
+    lap_ok = (lap_err <= 1e-12)
+    # at large n the sums grow like n^3, so allow round-off relative to the boundary flux
+    tol = max(1e-8, 1e-13 * abs(res['flux_out_boundary']))
+    div_ok = (res['abs_residual'] <= tol)
     return {
         'constant_w_laplacian': {
             'expected': 6.0,
-            'max_abs_err': max_abs_err,
+            'max_abs_err': lap_err,
             'count_interior': count,
             'passed': lap_ok
         },
         'varying_w_divergence': {
-            'sum_div_interior': sum_div,
-            'flux_out_boundary': flux_out,
-            'abs_residual': resid,
+            'sum_div_interior': res['sum_div_interior'],
+            'flux_out_boundary': res['flux_out_boundary'],
+            'abs_residual': res['abs_residual'],
             'passed': div_ok
         }
     }
 
 
+def run_checks_3d_parallel(n=17, h=1.0, a=1e-4, workers=None, grid=None, slab=SLAB, files=None):
+    """run_checks_3d over a shared-memory block decomposition, with per-worker timings."""
+    res = decomposed_checks(n, h, a, workers, grid, slab, files)
+    result = _checks_result(res['laplacian_max_abs_err'], res['count_interior'], res)
+    result['parallel'] = res['parallel']
+    return result
+
+
+def run_checks_3d_streaming(n, out_dir, h=1.0, a=1e-4, slab=SLAB, workers=None, max_shared_bytes=MAX_SHARED_BYTES):
+    """run_checks_3d on Φ and w stored as float64 .npy files in ``out_dir``, plus I/O and memory stats.
+
+    With ``workers`` the checks run over the shared-memory decomposition, each
+    worker reading its own block from the files; the blocks hold the whole grid
+    in shared memory, so this raises ValueError above ``max_shared_bytes``.
+    """
+    if workers:
+        need = shared_bytes(n, workers)
+        if need > max_shared_bytes:
+            raise ValueError(f'--workers would hold {need / 2**30:.2f} GiB in shared memory (limit '
+                             f'{max_shared_bytes / 2**30:.2f} GiB); drop --workers for the out-of-core path')
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    shape = (n, n, n)
+    manifest = {'n': n, 'h': h, 'a': a}
+    man_path = out / 'manifest.json'
+    paths = {'phi': out / 'phi.npy', 'w': out / 'w.npy'}
+    t0 = time.perf_counter()
+    bytes_written = 0
+    if man_path.exists():
+        with open(man_path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(f'{out} was written for a different grid; use a fresh --memmap directory')
+    else:
+        with open(man_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    for name, src in zip(('phi', 'w'), _analytic_fields(shape, h, a)):
+        if not paths[name].exists():
+            bytes_written += write_npy_planes(paths[name], shape, src, slab)
+    t_write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if workers:
+        result = run_checks_3d_parallel(n, h, a, workers, slab=slab, files=(str(paths['phi']), str(paths['w'])))
+        par = result['parallel']
+        # owned nodes come from the files; halos are copied between shared blocks
+        io = {'bytes_read': par['bytes_read'], 'halo_bytes': par['halo_bytes'], 'shared_bytes': par['shared_bytes'],
+              'max_worker_rss_mb': max((r['peak_rss_mb'] for r in par['per_worker'] if r['peak_rss_mb'] is not None),
+                                       default=None)}
+    else:
+        phi, w = NpyPlanes(paths['phi']), NpyPlanes(paths['w'])
+        result = run_checks_3d(n, h, a, slab, phi=phi, w=w)
+        # includes the one-plane halos re-read at slab edges
+        io = {'bytes_read': phi.bytes_read + w.bytes_read}
+    result['streaming'] = {
+        'grid': f'{n}^3',
+        'slab_planes': slab,
+        'bytes_on_disk': os.path.getsize(paths['phi']) + os.path.getsize(paths['w']),
+        'bytes_written': bytes_written,
+        **io,
+        'seconds_write': t_write,
+        'seconds_check': time.perf_counter() - t0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    return result
+
+
 if __name__ == '__main__':
-    result = run_checks_3d()
+    parser = argparse.ArgumentParser(description='3D conservation checks.')
+    parser.add_argument('--n', type=int, default=17, help='Nodes per side.')
+    parser.add_argument('--slab', type=int, default=SLAB, help='Planes per streamed slab.')
+    parser.add_argument('--memmap', type=str, default=None,
+                        help='Directory for memory-mapped Φ and w files (out-of-core mode).')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Shared-memory domain decomposition over this many worker processes.')
+    parser.add_argument('--max-shared-gib', type=float, default=MAX_SHARED_BYTES / 2**30,
+                        help='Refuse --memmap with --workers above this much shared memory (not out-of-core).')
+    parser.add_argument('--out', type=str, default='docs/conservation_check_3d.json')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.memmap:
+        result = run_checks_3d_streaming(args.n, args.memmap, slab=args.slab, workers=args.workers,
+                                         max_shared_bytes=int(args.max_shared_gib * 2**30))
+        st = result['streaming']
+        line = f"streamed {st['bytes_read'] / 2**30:.2f} GiB, peak RSS {format_rss(st['peak_rss_mb'])}"
+        if 'shared_bytes' in st:
+            line += (f" (driver); shared {st['shared_bytes'] / 2**30:.2f} GiB, "
+                     f"max worker RSS {format_rss(st['max_worker_rss_mb'])}")
+        print(line)
+    elif args.workers:
+        result = run_checks_3d_parallel(args.n, workers=args.workers, slab=args.slab)
+    else:
+        result = run_checks_3d(args.n, slab=args.slab)
+    if 'parallel' in result:
+        par = result['parallel']
+        print(f"{par['blocks']} blocks on a {par['process_grid']} grid, "
+              f"compute phase {par['seconds_compute_phase']:.2f} s")
     payload = {
         'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
         'conservation_check_3d': result,
     }
-    out_path = 'docs/conservation_check_3d.json'
+    out_path = args.out
     with open(out_path, 'w') as f:
         json.dump(payload, f, indent=2)
-    print(f"Wrote {out_path}: Laplacian OK={result['constant_w_laplacian']['passed']}, Varying-w OK={result['varying_w_divergence']['passed']}")
-
-
+    print(f"Wrote {out_path}: Laplacian OK={result['constant_w_laplacian']['passed']}, "
+          f"Varying-w OK={result['varying_w_divergence']['passed']} ({time.perf_counter() - t0:.1f} s)")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Grid-refinement study of the face-flux stencil (the "consistency and
+convergence" sketch in the Study Guide).
+
+On the unit square/cube with h = 1/(n-1), n = 2^k + 1, take Φ = r² and
+w = 1/(1 + a r²), for which
+
+  ∇·(w∇Φ) = 2d w - 4a r² w².
+
+Each level streams the stencil of stencil.py over the grid and records the
+max and RMS error of div_h against this, the discrete divergence-theorem
+residual, the value at the domain centre (a node on every level), wall time
+and peak RSS.  Levels run in separate worker processes (one level per
+process on Python ≥ 3.11, so peak RSS is per level).  Between successive
+levels the observed order is log2(e_h / e_h/2); the centre values are
+Richardson-extrapolated with the expected order.  The gate passes when the observed order of the
+max error on the finest pair is within --order-tol of --expected-order
+(2 for this stencil) and every level conserves to round-off; the script
+exits 1 otherwise.  Output is a JSON summary plus a one-row-per-level CSV.
+Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from stencil import SLAB, conservation_sums, divergence, format_rss, peak_rss_mb, planes, radius2
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+CSV_COLUMNS = ('dim', 'n', 'h', 'max_err', 'rms_err', 'order_max', 'order_rms', 'center', 'abs_residual',
+               'seconds', 'peak_rss_mb')
+
+
+def exact_divergence(r2, dim: int, a: float):
+    w = 1.0 / (1.0 + a * r2)
+    return 2 * dim * w - 4 * a * r2 * w * w
+
+
+def run_level(dim: int, n: int, a: float = 1.0, slab: int = SLAB) -> dict:
+    """Errors, conservation residual, timing and memory for one n^dim level."""
+    if np is None:
+        raise RuntimeError('convergence_study requires NumPy')
+    t0 = time.perf_counter()
+    h = 1.0 / (n - 1)
+    shape = (n,) * dim
+    c = (n - 1) // 2
+
+    def phi(lo, hi):
+        return radius2(shape, h, lo, hi)
+
+    def w(lo, hi):
+        return 1.0 / (1.0 + a * radius2(shape, h, lo, hi))
+
+    err_max, err_sq, center = 0.0, 0.0, None
+    for k0 in range(1, n - 1, slab):
+        k1 = min(k0 + slab, n - 1)
+        p = planes(phi, k0 - 1, k1 + 1)
+        e = divergence(p, 1.0 / (1.0 + a * p), h)
+        e -= exact_divergence(p[(slice(1, -1),) * dim], dim, a)
+        err_max = max(err_max, float(np.abs(e).max()))
+        err_sq += float(np.square(e).sum())
+        if k0 <= c < k1:
+            center = float(e[(c - k0,) + (c - 1,) * (dim - 1)])
+    count = (n - 2)**dim
+    cons = conservation_sums(phi, w, shape, h, slab)
+    exact_c = float(exact_divergence(np.array(dim * (c * h)**2), dim, a))
+    return {
+        'dim': dim, 'n': n, 'h': h,
+        'max_err': err_max, 'rms_err': math.sqrt(err_sq / count),
+        'center': center + exact_c, 'center_exact': exact_c,
+        'abs_residual': cons['abs_residual'],
+        'rel_residual': cons['abs_residual'] / max(abs(cons['flux_out_boundary']), 1e-300),
+        'seconds': time.perf_counter() - t0, 'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _order(e1: float, e2: float):
+    return math.log2(e1 / e2) if e1 > 0 and e2 > 0 else None
+
+
+def summarize(rows, expected_order: float = 2.0, order_tol: float = 0.25, rel_tol: float = 1e-12) -> dict:
+    """Observed orders, Richardson extrapolation and the order gate for one dimension's levels."""
+    rows = sorted(rows, key=lambda r: r['n'])
+    rows[0]['order_max'] = rows[0]['order_rms'] = None
+    for prev, cur in zip(rows[:-1], rows[1:]):
+        cur['order_max'] = _order(prev['max_err'], cur['max_err'])
+        cur['order_rms'] = _order(prev['rms_err'], cur['rms_err'])
+    out = {'levels': rows, 'expected_order': expected_order}
+    exact = rows[-1]['center_exact']
+    if len(rows) >= 2:
+        f1, f2 = rows[-2]['center'], rows[-1]['center']
+        rich = f2 + (f2 - f1) / (2**expected_order - 1)
+        out['richardson'] = {'center': rich, 'exact': exact, 'err_finest': abs(f2 - exact),
+                             'err_extrapolated': abs(rich - exact)}
+    if len(rows) >= 3:
+        f0, f1, f2 = (r['center'] for r in rows[-3:])
+        out['richardson']['observed_order'] = _order(abs(f1 - f0), abs(f2 - f1))
+    last = rows[-1]['order_max']
+    order_ok = last is not None and abs(last - expected_order) <= order_tol
+    cons_ok = all(r['rel_residual'] <= rel_tol for r in rows)
+    out['observed_order'] = last
+    out['passed'] = bool(order_ok and cons_ok)
+    return out
+
+
+def run_study(dims=(2, 3), k_ranges=None, a: float = 1.0, slab: int = SLAB, workers: int | None = None,
+              expected_order: float = 2.0, order_tol: float = 0.25) -> dict:
+    k_ranges = k_ranges or {2: range(4, 10), 3: range(3, 8)}
+    tasks = [(d, 2**k + 1) for d in dims for k in k_ranges[d]]
+    # largest levels first so the longest jobs start early
+    tasks.sort(key=lambda t: -t[1]**t[0])
+    t0 = time.perf_counter()
+    if workers == 1:
+        rows = [run_level(d, n, a, slab) for d, n in tasks]
+    else:
+        # one level per worker process so ru_maxrss is per level (the option needs Python 3.11;
+        # older interpreters reuse workers and report the running peak)
+        opts = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), **opts) as pool:
+            rows = list(pool.map(run_level, *zip(*tasks), [a] * len(tasks), [slab] * len(tasks)))
+    out = {'a_param': a, 'dims': {}}
+    for d in dims:
+        out['dims'][str(d)] = summarize([r for r in rows if r['dim'] == d], expected_order, order_tol)
+    out['passed'] = all(v['passed'] for v in out['dims'].values())
+    out['wall_seconds'] = time.perf_counter() - t0
+    return out
+
+
+def write_csv(path, study):
+    with open(path, 'w', newline='') as f:
+        wr = csv.writer(f)
+        wr.writerow(CSV_COLUMNS)
+        for d in study['dims'].values():
+            for r in d['levels']:
+                wr.writerow([r[c] if r[c] is not None else '' for c in CSV_COLUMNS])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grid-refinement convergence study of the face-flux stencil.')
+    parser.add_argument('--k2', type=str, default='4:10', help='2D levels n = 2^k + 1, as kmin:kmax (exclusive).')
+    parser.add_argument('--k3', type=str, default='3:8', help='3D levels, as kmin:kmax (exclusive).')
+    parser.add_argument('--a', type=float, default=1.0, help='w = 1/(1 + a r²) on the unit domain.')
+    parser.add_argument('--expected-order', type=float, default=2.0)
+    parser.add_argument('--order-tol', type=float, default=0.25)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', type=str, default='docs/convergence_study.json')
+    parser.add_argument('--csv', type=str, default='docs/convergence_study.csv')
+    args = parser.parse_args()
+    if np is None:
+        sys.exit('convergence_study requires NumPy')
+
+    ks = {d: range(*map(int, s.split(':'))) for d, s in ((2, args.k2), (3, args.k3))}
+    study = run_study((2, 3), ks, args.a, workers=args.workers, expected_order=args.expected_order,
+                      order_tol=args.order_tol)
+    for d, res in study['dims'].items():
+        for r in res['levels']:
+            o = f"{r['order_max']:.3f}" if r['order_max'] is not None else '  -  '
+            print(f"{d}D n={r['n']:4d}  max err {r['max_err']:.3e}  order {o}  "
+                  f"residual {r['abs_residual']:.1e}  {r['seconds']:.2f}s  {format_rss(r['peak_rss_mb'])}")
+        rc = res.get('richardson', {})
+        if rc:
+            print(f"{d}D centre: finest err {rc['err_finest']:.2e} → Richardson {rc['err_extrapolated']:.2e}")
+    payload = {
+        'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+        'convergence_study': study,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(payload, f, indent=2)
+    write_csv(args.csv, study)
+    print(f"Wrote {args.out}, {args.csv}: passed={study['passed']} ({study['wall_seconds']:.1f} s)")
+    sys.exit(0 if study['passed'] else 1)
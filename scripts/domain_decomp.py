@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Shared-memory domain decomposition of the 3D face-flux checks.
+
+The n³ node grid is split into a px × py × pz process grid of blocks.  Each
+block lives in its own multiprocessing.shared_memory buffer for Φ and w,
+sized to the owned nodes plus a one-node halo on every side, so workers only
+ever receive buffer names and index ranges (no arrays are pickled).  A run
+has two pool phases, and the end of each phase is the synchronisation point:
+
+  1. fill: every worker writes its owned nodes (analytic Φ = r², w = 1/(1+a r²),
+     or planes read from the .npy files of conservation_check_3d --memmap);
+  2. exchange + compute: every worker copies the owned boundary layers of its
+     six face neighbours into its halo, then sums, over its owned interior
+     nodes C, div(w∇Φ)·h³ (streamed in z-slabs of the block) and the outward
+     flux through the faces of C.  The faces of C that lie on the global
+     boundary are reported separately, and the worker also returns the max
+     Laplacian error of Φ against 6.
+
+Internal faces cancel between neighbouring blocks, so Σ_blocks div = Σ_blocks
+(global-boundary flux) is the global divergence theorem.  The driver reduces
+the per-block sums in block order, which makes the result independent of
+completion order, and returns per-worker timings, bytes read from the files
+and halo bytes copied.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from stencil import SLAB, divergence, face_flux, peak_rss_mb
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def process_grid(workers: int) -> tuple:
+    """Factor ``workers`` into (pz, py, px), as even as possible with the largest factor along z."""
+    best = None
+    for pz in range(1, workers + 1):
+        if workers % pz:
+            continue
+        for py in range(1, workers // pz + 1):
+            if (workers // pz) % py:
+                continue
+            px = workers // pz // py
+            key = (max(pz, py, px) - min(pz, py, px), -pz)
+            if best is None or key < best[0]:
+                best = (key, (pz, py, px))
+    return tuple(sorted(best[1], reverse=True))
+
+
+def _split(n: int, p: int):
+    edges = [n * i // p for i in range(p + 1)]
+    return [(edges[i], edges[i + 1]) for i in range(p)]
+
+
+def blocks(n: int, grid) -> list:
+    """Owned node ranges ((z0, z1), (y0, y1), (x0, x1)) of every block, in block order."""
+    if any(n // p < 2 for p in grid):
+        raise ValueError(f'process grid {grid} is too fine for n = {n}')
+    zs, ys, xs = (_split(n, p) for p in grid)
+    return [(z, y, x) for z in zs for y in ys for x in xs]
+
+
+def _alloc_shape(rng):
+    return tuple(b - a + 2 for a, b in rng)
+
+
+def shared_bytes(n: int, workers: int | None = None, grid=None) -> int:
+    """Total shared-memory buffer size (Φ and w, owned nodes plus halos) of a decomposition."""
+    grid = tuple(grid) if grid else process_grid(workers or os.cpu_count())
+    return sum(2 * 8 * int(np.prod(_alloc_shape(rng))) for rng in blocks(n, grid))
+
+
+def _attach(name, shape):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _fill(task):
+    """Phase 1: write the owned nodes of one block."""
+    t0 = time.perf_counter()
+    idx, rng, names, n, h, a, files = task
+    shape = _alloc_shape(rng)
+    owned = tuple(slice(1, -1) for _ in rng)
+    handles = [_attach(nm, shape) for nm in names]
+    nbytes = 0
+    try:
+        if files is None:
+            r2 = np.zeros(tuple(b - lo for lo, b in rng))
+            for ax, (lo, hi) in enumerate(rng):
+                x = (np.arange(lo, hi) * h)**2
+                r2 += x.reshape((-1,) + (1,) * (2 - ax))
+            handles[0][1][owned] = r2
+            handles[1][1][owned] = 1.0 / (1.0 + a * r2)
+        else:
+            sel = tuple(slice(lo, hi) for lo, hi in rng)
+            for (_, arr), path in zip(handles, files):
+                arr[owned] = np.load(path, mmap_mode='r')[sel]
+                nbytes += arr[owned].nbytes
+    finally:
+        for shm, _ in handles:
+            shm.close()
+    return idx, (time.perf_counter() - t0, nbytes)
+
+
+def _faces(p, w, ax: int, side: int, h: float):
+    """Σ outward flux through the low (side 0) or high (side 1) faces of C normal to ``ax``."""
+    idx = [slice(1, -1)] * 3
+    idx[ax] = slice(0, 2) if side == 0 else slice(-2, None)
+    idx = tuple(idx)
+    f = float(face_flux(p[idx], w[idx], ax, h).sum())
+    return -f if side == 0 else f
+
+
+def _compute(task):
+    """Phase 2: halo exchange, then local divergence, subdomain flux and Laplacian error."""
+    idx, rng, names, neighbours, n, h, slab = task
+    shape = _alloc_shape(rng)
+    t0 = time.perf_counter()
+    mine = [_attach(nm, shape) for nm in names]
+    peers = []
+    halo_bytes = 0
+    try:
+        for ax, side, nrng, nnames in neighbours:
+            nshape = _alloc_shape(nrng)
+            theirs = [_attach(nm, nshape) for nm in nnames]
+            peers.extend(theirs)
+            # my halo layer on this side ← their owned layer next to me
+            dst = [slice(1, -1)] * 3
+            src = [slice(1, -1)] * 3
+            dst[ax] = slice(0, 1) if side == 0 else slice(-1, None)
+            src[ax] = slice(-2, -1) if side == 0 else slice(1, 2)
+            for (_, a_mine), (_, a_theirs) in zip(mine, theirs):
+                a_mine[tuple(dst)] = a_theirs[tuple(src)]
+                halo_bytes += a_mine[tuple(dst)].nbytes
+        t_exchange = time.perf_counter() - t0
+
+        t1 = time.perf_counter()
+        phi, w = mine[0][1], mine[1][1]
+        # C = owned ∩ interior, as buffer index ranges (the buffer is offset by the halo)
+        c = [(max(lo, 1) - lo + 1, min(hi, n - 1) - lo + 1) for lo, hi in rng]
+        vol, area = h**3, h**2
+        sum_div, lap_err = 0.0, 0.0
+        if all(c0 < c1 for c0, c1 in c):
+            (z0, z1), (y0, y1), (x0, x1) = c
+            for k0 in range(z0, z1, slab):
+                k1 = min(k0 + slab, z1)
+                sel = (slice(k0 - 1, k1 + 1), slice(y0 - 1, y1 + 1), slice(x0 - 1, x1 + 1))
+                sum_div += float(divergence(phi[sel], w[sel], h).sum()) * vol
+                lap_err = max(lap_err, float(np.abs(divergence(phi[sel], None, h) - 6.0).max()))
+            box = (slice(z0 - 1, z1 + 1), slice(y0 - 1, y1 + 1), slice(x0 - 1, x1 + 1))
+            p, ww = phi[box], w[box]
+            flux_sub, flux_global = 0.0, 0.0
+            for ax, (lo, hi) in enumerate(rng):
+                for side, on_boundary in ((0, lo <= 1), (1, hi >= n - 1)):
+                    f = _faces(p, ww, ax, side, h) * area
+                    flux_sub += f
+                    if on_boundary:
+                        flux_global += f
+        else:
+            flux_sub = flux_global = 0.0
+        t_compute = time.perf_counter() - t1
+    finally:
+        for shm, _ in mine + peers:
+            shm.close()
+    return {
+        'block': idx, 'pid': os.getpid(), 'owned': [list(r) for r in rng],
+        'sum_div': sum_div, 'flux_subdomain': flux_sub, 'flux_global_boundary': flux_global,
+        'local_residual': abs(sum_div - flux_sub), 'laplacian_max_abs_err': lap_err,
+        'halo_bytes': halo_bytes, 'seconds_exchange': t_exchange, 'seconds_compute': t_compute,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _neighbours(b: int, grid, rngs, names):
+    pz, py, px = grid
+    coords = (b // (py * px), (b // px) % py, b % px)
+    out = []
+    for ax in range(3):
+        for side, step in ((0, -1), (1, 1)):
+            cc = list(coords)
+            cc[ax] += step
+            if 0 <= cc[ax] < grid[ax]:
+                nb = (cc[0] * py + cc[1]) * px + cc[2]
+                out.append((ax, side, rngs[nb], names[nb]))
+    return out
+
+
+def decomposed_checks(n: int, h: float = 1.0, a: float = 1e-4, workers: int | None = None, grid=None,
+                      slab: int = SLAB, files=None) -> dict:
+    """Both 3D checks over a shared-memory block decomposition; see the module docstring."""
+    if np is None:
+        raise RuntimeError('domain_decomp requires NumPy')
+    workers = workers or os.cpu_count()
+    grid = tuple(grid) if grid else process_grid(workers)
+    rngs = blocks(n, grid)
+    t0 = time.perf_counter()
+    shms = []
+    try:
+        names = []
+        for rng in rngs:
+            nbytes = 8 * int(np.prod(_alloc_shape(rng)))
+            pair = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(2)]
+            shms.extend(pair)
+            names.append(tuple(s.name for s in pair))
+        t_alloc = time.perf_counter() - t0
+        with ProcessPoolExecutor(max_workers=min(workers, len(rngs))) as pool:
+            t1 = time.perf_counter()
+            fill = dict(pool.map(_fill, [(i, r, names[i], n, h, a, files) for i, r in enumerate(rngs)]))
+            t_fill = time.perf_counter() - t1
+            t1 = time.perf_counter()
+            tasks = [(i, r, names[i], _neighbours(i, grid, rngs, names), n, h, slab) for i, r in enumerate(rngs)]
+            parts = list(pool.map(_compute, tasks))
+            t_compute = time.perf_counter() - t1
+    finally:
+        for s in shms:
+            s.close()
+            s.unlink()
+    # fixed-order reduction
+    parts.sort(key=lambda r: r['block'])
+    sum_div = 0.0
+    flux = 0.0
+    lap_err = 0.0
+    for r in parts:
+        r['seconds_fill'], r['bytes_read'] = fill[r['block']]
+        sum_div += r['sum_div']
+        flux += r['flux_global_boundary']
+        lap_err = max(lap_err, r['laplacian_max_abs_err'])
+    return {
+        'sum_div_interior': sum_div, 'flux_out_boundary': flux, 'abs_residual': abs(sum_div - flux),
+        'laplacian_max_abs_err': lap_err, 'count_interior': (n - 2)**3,
+        'parallel': {
+            'workers': min(workers, len(rngs)), 'process_grid': list(grid), 'blocks': len(rngs),
+            'shared_bytes': sum(s.size for s in shms),
+            'bytes_read': sum(r['bytes_read'] for r in parts), 'halo_bytes': sum(r['halo_bytes'] for r in parts),
+            'seconds_alloc': t_alloc, 'seconds_fill_phase': t_fill, 'seconds_compute_phase': t_compute,
+            'seconds_total': time.perf_counter() - t0,
+            'max_local_residual': max(r['local_residual'] for r in parts),
+            'per_worker': parts,
+        },
+    }
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Polynomial-chaos emulator for the ILG/ΛCDM growth ratio.
+
+The surrogate is a total-degree Legendre expansion of ln(D_ILG/D_LCDM) in the
+rescaled inputs (ln a, ln k, ln κ - ln β, Ω_m0).  The kernel enters only
+through x = a0 k/(β (aH)²) and a0 ∝ κ, so the ratio depends on κ and β only via
+κ/β; using that combination as one input keeps the expansion 4-dimensional.
+Σ = μ has a closed form and is returned exactly from mu_eff_grid rather than
+emulated.
+
+Training points are a Latin hypercube over (κ, β, Ω_m0) (flat, Ω_L0 = 1 - Ω_m0),
+each solved once with integrate_growth_batch for a Chebyshev grid of (a, k).
+Chunks of the design run across a process pool; coefficients come from the
+accumulated normal equations.  A separate hypercube is held out for validation.
+Models are stored as compressed .npz (coefficients + JSON metadata) under
+ilg_common.cache_dir(), keyed by the training settings.  Inputs outside the
+trained box raise ValueError.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ilg_common import Cosmo, cache_dir, compute_a0_from_kappa, gating_beta, kappa_for_target_a0, mu_eff_grid, params_key
+from linear_growth_demo import integrate_growth_batch
+from param_sweep import build_points, resolve
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+EMULATOR_VERSION = 1
+INPUTS = ('a', 'k', 'kappa', 'beta', 'Omega_m0')
+
+
+def default_domain():
+    kc, bc = kappa_for_target_a0(1.2e-10), gating_beta()
+    return {'a': [0.1, 1.0], 'k': [1e-3, 1.0], 'kappa': [0.5 * kc, 2.0 * kc],
+            'beta': [0.5 * bc, 2.0 * bc], 'Omega_m0': [0.25, 0.35]}
+
+
+def multi_indices(dim: int, degree: int):
+    """Total-degree multi-indices in a fixed order."""
+    return [m for d in range(degree + 1) for m in itertools.product(range(d + 1), repeat=dim) if sum(m) == d]
+
+
+def legendre_table(u, degree: int):
+    """P_0..P_degree at points u ∈ [-1,1] → (degree+1, n)."""
+    P = np.empty((degree + 1,) + u.shape)
+    P[0] = 1.0
+    if degree:
+        P[1] = u
+    for n in range(1, degree):
+        P[n + 1] = ((2 * n + 1) * u * P[n] - n * P[n - 1]) / (n + 1)
+    return P
+
+
+def _feature_box(domain):
+    """Bounds of the internal features (ln a, ln k, ln κ - ln β, Ω_m0)."""
+    la = [math.log(v) for v in domain['a']]
+    lk = [math.log(v) for v in domain['k']]
+    r = [math.log(domain['kappa'][0]) - math.log(domain['beta'][1]),
+         math.log(domain['kappa'][1]) - math.log(domain['beta'][0])]
+    return np.array([la, lk, r, list(domain['Omega_m0'])], dtype=float)
+
+
+def _cheb_nodes(lo, hi, n):
+    t = np.cos(np.pi * np.arange(n) / (n - 1))[::-1]
+    return 0.5 * (lo + hi) + 0.5 * (hi - lo) * t
+
+
+def _lhs_spec(domain, n, seed):
+    return {'mode': 'lhs', 'samples': n, 'seed': seed, 'params': {
+        'kappa': {'kind': 'range', 'lo': domain['kappa'][0], 'hi': domain['kappa'][1], 'log': True},
+        'beta': {'kind': 'range', 'lo': domain['beta'][0], 'hi': domain['beta'][1], 'log': True},
+        'Omega_m0': {'kind': 'range', 'lo': domain['Omega_m0'][0], 'hi': domain['Omega_m0'][1]},
+    }}
+
+
+def training_chunk(domain, spec, start, stop, n_a, n_k, steps):
+    """Features (n, 4) and targets ln(D_ILG/D_LCDM) for design points [start, stop)."""
+    pts = build_points(spec, start, stop)
+    resolved = [resolve(p) for p in pts]
+    a0s = np.array([r[0] for r in resolved])
+    betas = np.array([r[1] for r in resolved])
+    cosmos = [r[2] for r in resolved]
+    a_nodes = np.exp(_cheb_nodes(*np.log(domain['a']), n_a))
+    k_nodes = np.exp(_cheb_nodes(*np.log(domain['k']), n_k))
+    D = integrate_growth_batch(k_nodes, cosmos, a0=a0s, beta=betas, a_end=1.0, N=steps, a_out=a_nodes)
+    ref = integrate_growth_batch([1.0], cosmos, a0=0.0, a_end=1.0, N=steps, a_out=a_nodes)
+    y = np.log(D / ref)                                               # (n_c, n_k, n_a)
+    ratio_in = np.array([math.log(p['kappa']) - math.log(p['beta']) for p in pts])
+    om = np.array([p['Omega_m0'] for p in pts])
+    C, K, A = np.meshgrid(np.arange(len(pts)), np.log(k_nodes), np.log(a_nodes), indexing='ij')
+    X = np.stack([A.ravel(), K.ravel(), ratio_in[C.ravel()], om[C.ravel()]], axis=1)
+    return X, y.ravel()
+
+
+class Emulator:
+    """Legendre expansion of ln(D_ILG/D_LCDM) with exact Σ."""
+
+    BLOCK = 2048
+
+    def __init__(self, domain, degree: int, coef, meta=None):
+        if np is None:
+            raise RuntimeError('emulator requires NumPy')
+        self.domain = {k: [float(v[0]), float(v[1])] for k, v in domain.items()}
+        self.degree = degree
+        self.coef = np.asarray(coef, dtype=float)
+        self.meta = meta or {}
+        self._box = _feature_box(self.domain)
+        self._idx = np.array(multi_indices(4, degree))
+        self._tensor = np.zeros((degree + 1,) * 4)
+        self._tensor[tuple(self._idx.T)] = self.coef
+
+    # ---------- basis ----------
+
+    def _scaled(self, X):
+        lo, hi = self._box[:, 0], self._box[:, 1]
+        return np.clip(2.0 * (X - lo) / (hi - lo) - 1.0, -1.0, 1.0)
+
+    def design(self, X):
+        """Basis matrix (n, n_terms) for internal features X (n, 4)."""
+        U = self._scaled(np.asarray(X, dtype=float))
+        P = [legendre_table(U[:, d], self.degree) for d in range(4)]
+        B = np.ones((len(U), len(self._idx)))
+        for d in range(4):
+            B *= P[d][self._idx[:, d]].T
+        return B
+
+    # ---------- public API ----------
+
+    def check_domain(self, **inputs):
+        for name, v in inputs.items():
+            lo, hi = self.domain[name]
+            v = np.asarray(v, dtype=float)
+            if np.any(v < lo * (1 - 1e-12)) or np.any(v > hi * (1 + 1e-12)):
+                raise ValueError(f'{name} outside emulator domain [{lo:g}, {hi:g}]')
+
+    def predict_ratio(self, a, k, kappa, beta, Omega_m0):
+        """D_ILG/D_LCDM for broadcastable inputs (k in h/Mpc)."""
+        a, k, kappa, beta, om = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, k, kappa, beta, Omega_m0)))
+        self.check_domain(a=a, k=k, kappa=kappa, beta=beta, Omega_m0=om)
+        X = np.stack([np.log(a).ravel(), np.log(k).ravel(), (np.log(kappa) - np.log(beta)).ravel(), om.ravel()], axis=1)
+        return np.exp(self._evaluate(X)).reshape(a.shape)
+
+    def _evaluate(self, X):
+        """Σ_m c_m Π_d P_{m_d}(u_d), contracting one dimension at a time against the dense coefficient tensor."""
+        U = self._scaled(X)
+        n1 = self.degree + 1
+        out = np.empty(len(U))
+        for s in range(0, len(U), self.BLOCK):
+            u = U[s:s + self.BLOCK]
+            r = legendre_table(u[:, 3], self.degree).T @ self._tensor.reshape(-1, n1).T     # (n, n1³)
+            for d in (2, 1, 0):
+                r = np.einsum('nij,nj->ni', r.reshape(len(u), -1, n1), legendre_table(u[:, d], self.degree).T)
+            out[s:s + self.BLOCK] = r[:, 0]
+        return out
+
+    def predict(self, a, k, kappa, beta, Omega_m0):
+        """(D_ILG/D_LCDM, Σ) for broadcastable inputs."""
+        ratio = self.predict_ratio(a, k, kappa, beta, Omega_m0)
+        # (n, 1) columns so mu_eff_grid evaluates elementwise rather than on an outer plane
+        a, k, kappa, beta, om = (np.broadcast_to(np.asarray(v, dtype=float), ratio.shape).reshape(-1, 1)
+                                 for v in (a, k, kappa, beta, Omega_m0))
+        cosmo = Cosmo(Omega_m0=om, Omega_L0=1.0 - om)
+        sigma = mu_eff_grid(a, k, compute_a0_from_kappa(kappa), cosmo, beta)[0]
+        return ratio, sigma.reshape(ratio.shape)
+
+    # ---------- persistence ----------
+
+    def save(self, path):
+        meta = dict(self.meta, version=EMULATOR_VERSION, domain=self.domain, degree=self.degree)
+        np.savez_compressed(path, coef=self.coef, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            meta = json.loads(str(z['meta']))
+            coef = z['coef']
+        if meta.get('version') != EMULATOR_VERSION:
+            raise ValueError(f'{path}: emulator version {meta.get("version")} != {EMULATOR_VERSION}')
+        return cls(meta['domain'], meta['degree'], coef, meta)
+
+
+def train_emulator(domain=None, degree: int = 10, n_train: int = 256, n_valid: int = 64, n_a: int = 12, n_k: int = 16,
+                   steps: int = 400, workers=None, chunk: int = 32, seed: int = 0, log=print):
+    """Fit the expansion on a Latin hypercube and validate on a held-out one → Emulator."""
+    domain = domain or default_domain()
+    emu = Emulator(domain, degree, np.zeros(len(multi_indices(4, degree))))
+    n_terms = len(emu.coef)
+    t0 = time.time()
+    train_spec = _lhs_spec(domain, n_train, seed)
+    valid_spec = _lhs_spec(domain, n_valid, seed + 1)
+    jobs = [(train_spec, s, min(s + chunk, n_train)) for s in range(0, n_train, chunk)]
+    jobs += [(valid_spec, s, min(s + chunk, n_valid)) for s in range(0, n_valid, chunk)]
+    AtA = np.zeros((n_terms, n_terms))
+    Aty = np.zeros(n_terms)
+    Xv, yv = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [(spec is valid_spec, pool.submit(training_chunk, domain, spec, s, e, n_a, n_k, steps))
+                for spec, s, e in jobs]
+        for is_valid, fut in futs:
+            X, y = fut.result()
+            if is_valid:
+                Xv.append(X)
+                yv.append(y)
+            else:
+                B = emu.design(X)
+                AtA += B.T @ B
+                Aty += B.T @ y
+    t_data = time.time() - t0
+    n_pts = n_train * n_a * n_k
+    if n_pts < n_terms:
+        raise ValueError(f'{n_pts} training points for {n_terms} terms; raise n_train or lower degree')
+    ridge = 1e-12 * np.trace(AtA) / n_terms
+    emu = Emulator(domain, degree, np.linalg.solve(AtA + ridge * np.eye(n_terms), Aty))
+    Xv = np.concatenate(Xv)
+    yv = np.concatenate(yv)
+    err = np.exp(emu._evaluate(Xv) - yv) - 1.0
+    emu.meta = {'n_train': n_train, 'n_valid': n_valid, 'grid': [n_a, n_k], 'steps': steps, 'seed': seed,
+                'n_terms': n_terms, 'valid_rms_rel': float(np.sqrt(np.mean(err**2))),
+                'valid_max_rel': float(np.max(np.abs(err))), 'train_seconds': time.time() - t0,
+                'data_seconds': t_data}
+    log(f"emulator: {n_terms} terms from {n_pts} points; held-out rel. error rms {emu.meta['valid_rms_rel']:.2e}, "
+        f"max {emu.meta['valid_max_rel']:.2e} ({emu.meta['train_seconds']:.1f}s)")
+    return emu
+
+
+def load_or_train_emulator(domain=None, degree: int = 10, n_train: int = 256, n_valid: int = 64, n_a: int = 12,
+                           n_k: int = 16, steps: int = 400, workers=None, seed: int = 0, path=None, force=False):
+    """Cached emulator for these training settings (trains and stores it on a miss)."""
+    domain = domain or default_domain()
+    if path is None:
+        key = params_key('emulator', version=EMULATOR_VERSION, domain=domain, degree=degree, n_train=n_train,
+                         n_valid=n_valid, grid=[n_a, n_k], steps=steps, seed=seed)
+        path = cache_dir() / f'emulator_{key}.npz'
+    path = Path(path)
+    if path.exists() and not force:
+        return Emulator.load(path)
+    emu = train_emulator(domain, degree, n_train, n_valid, n_a, n_k, steps, workers, seed=seed)
+    emu.save(path)
+    return emu
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train/load the polynomial-chaos emulator of D_ILG/D_LCDM.')
+    parser.add_argument('--degree', type=int, default=10)
+    parser.add_argument('--n-train', type=int, default=256, help='Latin-hypercube (κ, β, Ω_m0) training points.')
+    parser.add_argument('--n-valid', type=int, default=64, help='Held-out validation points.')
+    parser.add_argument('--steps', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=None, help='Process-pool size (default: all cores).')
+    parser.add_argument('--path', type=str, default=None, help='Model file (default: keyed file in the cache dir).')
+    parser.add_argument('--force', action='store_true', help='Retrain even if a stored model exists.')
+    args = parser.parse_args()
+
+    emu = load_or_train_emulator(degree=args.degree, n_train=args.n_train, n_valid=args.n_valid, steps=args.steps,
+                                 workers=args.workers, path=args.path, force=args.force)
+    m = emu.meta
+    print(f"degree {emu.degree}, {len(emu.coef)} terms; held-out rel. error rms {m['valid_rms_rel']:.2e}, max {m['valid_max_rel']:.2e}")
+    kc, bc = kappa_for_target_a0(1.2e-10), gating_beta()
+    rng = np.random.default_rng(0)
+    n = 100_000
+    lo, hi = np.log(emu.domain['k'])
+    k = np.exp(rng.uniform(lo, hi, n))
+    a = rng.uniform(*emu.domain['a'], n)
+    t0 = time.perf_counter()
+    ratio, sigma = emu.predict(a, k, kc, bc, 0.3)
+    dt = time.perf_counter() - t0
+    print(f"batched predict: {n} points in {dt * 1e3:.1f} ms ({dt / n * 1e6:.2f} µs/point)")
+    for kv in (0.01, 0.1, 0.5):
+        r, s = emu.predict(1.0, kv, kc, bc, 0.3)
+        print(f"a=1  k={kv:5.2f} h/Mpc  D_ILG/D_LCDM={float(r):.5f}  Σ={float(s):.5f}")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Vectorized gate-schedule engine for breaths of 2^10 … 2^30 ticks.
+
+A gate j blocks tick t when (t & MASKS[j]) == PATTERNS[j] and the phase of t
+lies in PHASES[j].  The phase is t & (P-1) for the canonical 8-beat cycle, or
+phase_map[t mod len(phase_map)] for any other tick→phase schedule (e.g. a
+Gray-code cycle from hypercube_cycles).  The engine evaluates the gates as
+boolean array operations over chunks of ticks and accumulates
+
+  - the blocked count |B| and S = 1 - |B|/T,
+  - per-gate hit counts and the pairwise overlap matrix |G_i ∩ G_j|,
+  - optionally the packed blocked-tick bitmap (little-endian bits, T/8 bytes).
+
+Chunks are independent, so long breaths can be split across a process pool;
+results are reduced in chunk order and are bit-identical for any worker
+count.  evaluate_schedule() returns a plain dict for in-process callers such
+as ci_status.
+
+Analytic counting (no tick loop).  For a gate subset S the ticks hit by every
+gate in S number
+
+  N(S) = 2^(n_bits - lg P - |M_S|) · |∩_j Φ'_j|    (0 if the patterns conflict)
+
+where M_S is the union of the masks above the phase bits and Φ'_j the allowed
+phases consistent with gate j's low mask bits.  analytic_blocked() sums the
+inclusion–exclusion series by depth-first search, extending each subset's
+forced-bit masks and phase bitmask from its parent and pruning a whole branch
+as soon as the patterns conflict or the phase set is empty (every superset
+then contributes 0).  subset_counts() builds the full N table by doubling
+(O(2^n) vectorized) and exact_hit_counts() applies the superset Möbius
+transform (O(n·2^n)) to get the number of ticks hit by exactly each gate set,
+hence |B|, per-gate counts and overlaps at once.  Both match the tick engine
+for the canonical phase t & (P-1).  Requires NumPy (analytic_blocked does not).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from ilg_gates_check import MASKS, PATTERNS, PHASES, popcount
+
+CHUNK_BITS = 18
+
+
+def validate_schedule(masks, patterns, phases, n_bits: int, n_phases: int):
+    if not (len(masks) == len(patterns) == len(phases)):
+        raise ValueError('masks, patterns and phases must have one entry per gate')
+    if n_phases < 1 or n_phases & (n_phases - 1):
+        raise ValueError('n_phases must be a power of two')
+    for j, (m, p, ph) in enumerate(zip(masks, patterns, phases)):
+        if m >> n_bits:
+            raise ValueError(f'gate {j}: mask uses bits beyond the {n_bits}-bit breath')
+        if p & ~m:
+            raise ValueError(f'gate {j}: pattern sets bits outside its mask')
+        if any(not 0 <= q < n_phases for q in ph):
+            raise ValueError(f'gate {j}: phase outside 0..{n_phases - 1}')
+
+
+def _chunk_stats(masks, patterns, phase_sets, n_phases, phase_map, start, stop, want_bitmap):
+    """Per-gate counts, overlaps, |B| and (optionally) packed bits for ticks [start, stop)."""
+    dt = np.uint32 if stop <= 1 << 32 else np.uint64
+    t = np.arange(start, stop, dtype=dt)
+    if phase_map is None:
+        phi = t & dt(n_phases - 1)
+    else:
+        pm = np.asarray(phase_map, dtype=np.int64)
+        phi = pm[t % dt(len(pm))]
+    n_g = len(masks)
+    hits = np.empty((n_g, len(t)), dtype=bool)
+    for j in range(n_g):
+        allowed = np.zeros(n_phases, dtype=bool)
+        allowed[list(phase_sets[j])] = True
+        np.equal(t & dt(masks[j]), dt(patterns[j]), out=hits[j])
+        hits[j] &= allowed[phi]
+    blocked = hits.any(axis=0)
+    h = hits.astype(np.float32)
+    # float32 products are exact for chunks below 2^24 ticks
+    overlap = np.rint(h @ h.T).astype(np.int64)
+    bitmap = np.packbits(blocked, bitorder='little') if want_bitmap else None
+    return start, np.diag(overlap).copy(), overlap, int(blocked.sum()), bitmap
+
+
+def evaluate_schedule(masks=None, patterns=None, phases=None, n_bits: int = 10, n_phases: int = 8,
+                      phase_map=None, chunk_bits: int = CHUNK_BITS, workers: int | None = None,
+                      bitmap: bool = False) -> dict:
+    """|B|, S, per-gate counts and overlap matrix over a 2^n_bits breath (canonical schedule by default)."""
+    if np is None:
+        raise RuntimeError('gates_engine requires NumPy')
+    masks = list(MASKS if masks is None else masks)
+    patterns = list(PATTERNS if patterns is None else patterns)
+    phases = [set(p) for p in (PHASES if phases is None else phases)]
+    validate_schedule(masks, patterns, phases, n_bits, n_phases)
+    if phase_map is not None and any(not 0 <= int(q) < n_phases for q in phase_map):
+        raise ValueError(f'phase_map entries must lie in 0..{n_phases - 1}')
+    T = 1 << n_bits
+    step = 1 << min(chunk_bits, n_bits, 23)
+    spans = [(s, min(s + step, T)) for s in range(0, T, step)]
+    args = (masks, patterns, phases, n_phases, None if phase_map is None else list(map(int, phase_map)))
+    if workers and workers > 1 and len(spans) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_chunk_stats, *zip(*[args + (s, e, bitmap) for s, e in spans])))
+    else:
+        parts = [_chunk_stats(*args, s, e, bitmap) for s, e in spans]
+    parts.sort(key=lambda r: r[0])
+    n_g = len(masks)
+    per_gate = np.zeros(n_g, dtype=np.int64)
+    overlap = np.zeros((n_g, n_g), dtype=np.int64)
+    n_blocked = 0
+    for _, c, o, b, _bits in parts:
+        per_gate += c
+        overlap += o
+        n_blocked += b
+    S = Fraction(T - n_blocked, T)
+    result = {
+        'T': T,
+        'n_gates': n_g,
+        'blocked': n_blocked,
+        'S': float(S),
+        'S_fraction': f'{S.numerator}/{S.denominator}',
+        'per_gate': per_gate.tolist(),
+        'overlap': overlap.tolist(),
+    }
+    if bitmap:
+        result['bitmap'] = np.concatenate([r[4] for r in parts])
+    return result
+
+
+def blocked_ticks(bitmap, T: int):
+    """Tick indices set in a packed little-endian bitmap."""
+    return np.flatnonzero(np.unpackbits(bitmap, count=T, bitorder='little'))
+
+
+# ------------------- Analytic counting -------------------
+
+def _gate_bits(masks, patterns, phases, n_phases):
+    """Per gate: (ones, zeros, high mask) above the phase bits and the effective phase bitmask."""
+    low = n_phases - 1
+    out = []
+    for m, p, ph in zip(masks, patterns, phases):
+        ml, pl = m & low, p & low
+        phase = sum(1 << q for q in ph if (q & ml) == pl)
+        hi = m & ~low
+        out.append((p & hi, ~p & hi, hi, phase))
+    return out
+
+
+def analytic_blocked(masks=None, patterns=None, phases=None, n_bits: int = 10, n_phases: int = 8) -> int:
+    """|B| by pruned depth-first inclusion–exclusion (pure Python)."""
+    masks = list(MASKS if masks is None else masks)
+    patterns = list(PATTERNS if patterns is None else patterns)
+    phases = [set(p) for p in (PHASES if phases is None else phases)]
+    validate_schedule(masks, patterns, phases, n_bits, n_phases)
+    gates = _gate_bits(masks, patterns, phases, n_phases)
+    free = n_bits - (n_phases.bit_length() - 1)
+    n = len(gates)
+    total = 0
+    # stack of (next gate, forced ones, forced zeros, mask, phase bits, sign)
+    stack = [(0, 0, 0, 0, (1 << n_phases) - 1, -1)]
+    while stack:
+        j0, f1, f0, m, ph, sgn = stack.pop()
+        for j in range(j0, n):
+            ones, zeros, hi, phj = gates[j]
+            if (f1 & zeros) or (f0 & ones):
+                continue
+            ph2 = ph & phj
+            if not ph2:
+                continue
+            m2 = m | hi
+            total -= sgn * (popcount(ph2) << (free - popcount(m2)))
+            stack.append((j + 1, f1 | ones, f0 | zeros, m2, ph2, -sgn))
+    return total
+
+
+def _popcount(a):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(a).astype(np.int64)
+    b = a.view(np.uint8).reshape(a.shape + (a.dtype.itemsize,))
+    return np.unpackbits(b, axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def subset_counts(masks=None, patterns=None, phases=None, n_bits: int = 10, n_phases: int = 8):
+    """N(S) for every gate subset S (bit j of the index ↔ gate j), N(∅) = T; int64 array of 2^n."""
+    if np is None:
+        raise RuntimeError('gates_engine requires NumPy')
+    masks = list(MASKS if masks is None else masks)
+    patterns = list(PATTERNS if patterns is None else patterns)
+    phases = [set(p) for p in (PHASES if phases is None else phases)]
+    validate_schedule(masks, patterns, phases, n_bits, n_phases)
+    gates = _gate_bits(masks, patterns, phases, n_phases)
+    n = len(gates)
+    wt = np.uint32 if n_bits <= 32 else np.uint64
+    pt = np.uint8 if n_phases <= 8 else np.uint64
+    f1 = np.zeros(1 << n, dtype=wt)
+    mk = np.zeros(1 << n, dtype=wt)
+    ph = np.zeros(1 << n, dtype=pt)
+    ph[0] = (1 << n_phases) - 1
+    for j, (ones, zeros, hi, phj) in enumerate(gates):
+        lo, up = slice(0, 1 << j), slice(1 << j, 2 << j)
+        # conflict: a bit forced to 1 that gate j forces to 0, or vice versa
+        f0 = mk[lo] & ~f1[lo]
+        ok = ((f1[lo] & wt(zeros)) | (f0 & wt(ones))) == 0
+        f1[up] = f1[lo] | wt(ones)
+        mk[up] = mk[lo] | wt(hi)
+        ph[up] = np.where(ok, ph[lo] & pt(phj), 0)
+    del f1
+    free = n_bits - (n_phases.bit_length() - 1)
+    counts = _popcount(ph) << (free - _popcount(mk))
+    return counts
+
+
+def exact_hit_counts(counts):
+    """Superset Möbius transform: N(S) → E(S) = #ticks whose set of blocking gates is exactly S."""
+    e = np.array(counts, dtype=np.int64)
+    n = e.size.bit_length() - 1
+    for j in range(n):
+        v = e.reshape(-1, 2, 1 << j)
+        v[:, 0, :] -= v[:, 1, :]
+    return e
+
+
+def analytic_summary(masks=None, patterns=None, phases=None, n_bits: int = 10, n_phases: int = 8) -> dict:
+    """|B|, S, per-gate counts, overlaps and the hit-multiplicity histogram from subset_counts()."""
+    counts = subset_counts(masks, patterns, phases, n_bits, n_phases)
+    n = counts.size.bit_length() - 1
+    exact = exact_hit_counts(counts)
+    T = 1 << n_bits
+    n_blocked = T - int(exact[0])
+    overlap = [[int(counts[(1 << i) | (1 << j)]) for j in range(n)] for i in range(n)]
+    mult = np.bincount(_popcount(np.arange(1 << n, dtype=np.uint64)), weights=exact, minlength=n + 1)
+    S = Fraction(T - n_blocked, T)
+    return {'T': T, 'n_gates': n, 'blocked': n_blocked, 'S': float(S),
+            'S_fraction': f'{S.numerator}/{S.denominator}',
+            'per_gate': [int(counts[1 << j]) for j in range(n)], 'overlap': overlap,
+            'hit_multiplicity': [int(round(v)) for v in mult]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vectorized |B|/S and coverage analytics for the gate schedule.')
+    parser.add_argument('--bits', type=int, default=10, help='Breath length 2^bits ticks (canonical: 10).')
+    parser.add_argument('--chunk-bits', type=int, default=CHUNK_BITS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--bitmap', type=str, default=None, help='Write the packed blocked-tick bitmap to this .npy file.')
+    parser.add_argument('--analytic', action='store_true', help='Also count via subset DP + Möbius transform.')
+    parser.add_argument('--write-json', type=str, default=None)
+    args = parser.parse_args()
+
+    res = evaluate_schedule(n_bits=args.bits, chunk_bits=args.chunk_bits, workers=args.workers,
+                            bitmap=args.bitmap is not None)
+    print(f"|B| = {res['blocked']} of T = {res['T']}  ->  S = {res['S_fraction']} = {res['S']:.9f}")
+    print('per-gate hits:', ' '.join(str(c) for c in res['per_gate']))
+    print('overlap matrix:')
+    for row in res['overlap']:
+        print('  ' + ' '.join(f'{v:6d}' for v in row))
+    if args.analytic:
+        an = analytic_summary(n_bits=args.bits)
+        print(f"|B| (analytic) = {an['blocked']}  (DFS: {analytic_blocked(n_bits=args.bits)})")
+        print('ticks blocked by exactly k gates:', ' '.join(str(c) for c in an['hit_multiplicity']))
+        res['analytic'] = an
+    if args.bitmap:
+        np.save(args.bitmap, res.pop('bitmap'))
+    if args.write_json:
+        with open(args.write_json, 'w') as f:
+            json.dump(res, f, indent=2)
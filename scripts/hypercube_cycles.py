@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Hamiltonian (Gray-code) cycles on the hypercube Q_D — the 2^D-tick generalization
+of the eight-tick cycle behind PHASES in ilg_gates_check.py.
+
+Counting is a bitmask DP over path states (visited set, endpoint), advanced one
+layer (path length) at a time as sorted NumPy key arrays so that equal states
+merge their path counts (the memoization).  Two symmetries and a meet in the
+middle keep the tables small:
+
+  - every automorphism fixing vertex 0 permutes the coordinate directions, so
+    all paths can be taken to start 0 → 1 → 3 (a factor D(D-1));
+  - a directed cycle through 0 splits at step 2^(D-1) into two paths of that
+    length from 0 that share only their endpoints, so only one table of
+    half-length paths is built.  The second half is looked up in the same
+    table under each of the D(D-1) direction relabelings (one per starting
+    prefix of the second path), and those lookups run in parallel: the table
+    is built once in the parent and shared with the workers through
+    multiprocessing.shared_memory, and each worker joins it in chunks.
+
+The table has ~6.5·10^6 states for D = 5 (906 545 760 cycles, ~30 s on one core;
+building it peaks near 1 GB).  Counting is exact for D ≤ 5; the D = 6 table is
+far beyond memory, so for D = 6 cycles are only enumerated, by depth-first
+search with dead-end pruning.  Emitted cycles are phase maps — the vertex
+visited at each tick, starting at 0 — that
+gates_engine.evaluate_schedule(phase_map=..., n_phases=2^D) consumes directly.
+Requires NumPy for counting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+MAX_COUNT_DIM = 5
+JOIN_CHUNK = 1 << 20  # first-half states per lookup pass
+
+
+def gray_code(D: int) -> list[int]:
+    """Reflected binary Gray code: a Hamiltonian cycle of Q_D starting at 0."""
+    return [t ^ (t >> 1) for t in range(1 << D)]
+
+
+def is_hamiltonian_cycle(seq, D: int) -> bool:
+    n = 1 << D
+    if len(seq) != n or sorted(seq) != list(range(n)):
+        return False
+    return all(bin(seq[i] ^ seq[(i + 1) % n]).count('1') == 1 for i in range(n))
+
+
+# ------------------- Counting -------------------
+
+def _path_table(D: int):
+    """Merged (visited, endpoint) → #paths for paths 0 → 1 → 3 → … of 2^(D-1) steps; sorted keys."""
+    shift = np.uint64(D)
+    v = np.array([3], dtype=np.uint64)
+    mask = np.array([0b1011], dtype=np.uint64)
+    cnt = np.array([1], dtype=np.int64)
+    for _ in range(2, 1 << (D - 1)):
+        ms, vs, cs = [], [], []
+        for d in range(D):
+            w = v ^ np.uint64(1 << d)
+            bit = np.left_shift(np.uint64(1), w)
+            ok = (mask & bit) == 0
+            ms.append(mask[ok] | bit[ok])
+            vs.append(w[ok])
+            cs.append(cnt[ok])
+        key = (np.concatenate(ms) << shift) | np.concatenate(vs)
+        c = np.concatenate(cs)
+        order = np.argsort(key, kind='stable')
+        key, c = key[order], c[order]
+        keys, idx = np.unique(key, return_index=True)
+        cnt = np.add.reduceat(c, idx)
+        mask, v = keys >> shift, keys & np.uint64((1 << D) - 1)
+    return (mask << shift) | v, cnt
+
+
+def _relabel_tables(D: int, dims):
+    """Byte lookup tables mapping a vertex-set mask through the direction relabeling ``dims``."""
+    n = 1 << D
+    vmap = [sum(((u >> i) & 1) << dims[i] for i in range(D)) for u in range(n)]
+    tabs = []
+    for b0 in range(0, n, 8):
+        t = np.zeros(256, dtype=np.uint64)
+        for byte in range(256):
+            t[byte] = sum(1 << vmap[b0 + i] for i in range(8) if byte >> i & 1 and b0 + i < n)
+        tabs.append(t)
+    return vmap, tabs
+
+
+_TABLE = None
+_SHM = []
+
+
+def _init_worker(names, n_states: int):
+    """Attach the parent's (keys, counts) path table from shared memory."""
+    global _TABLE
+    arrays = []
+    for name, dtype in zip(names, (np.uint64, np.int64)):
+        shm = shared_memory.SharedMemory(name=name)
+        _SHM.append(shm)
+        arrays.append(np.ndarray((n_states,), dtype=dtype, buffer=shm.buf))
+    _TABLE = tuple(arrays)
+
+
+def _join_prefix(D: int, dims, table=None):
+    """Σ over first-half states of #first × #second halves whose first two steps are along dims[0], dims[1]."""
+    keys, cnt = table if table is not None else _TABLE
+    n = 1 << D
+    shift = np.uint64(D)
+    full = np.uint64((1 << n) - 1) if n < 64 else np.uint64(0xFFFFFFFFFFFFFFFF)
+    # relabel so the second half's first two directions become 0 and 1 (the table's prefix)
+    inv = [0] * D
+    for i, d in enumerate(dims):
+        inv[d] = i
+    vmap, tabs = _relabel_tables(D, inv)
+    vmap = np.asarray(vmap, dtype=np.uint64)
+    total = 0
+    for s in range(0, len(keys), JOIN_CHUNK):
+        mask, v = keys[s:s + JOIN_CHUNK] >> shift, keys[s:s + JOIN_CHUNK] & np.uint64(n - 1)
+        # second half covers the complement plus the shared endpoints 0 and v
+        comp = (full ^ mask) | np.uint64(1) | np.left_shift(np.uint64(1), v)
+        m2 = np.zeros_like(comp)
+        for j, t in enumerate(tabs):
+            m2 |= t[((comp >> np.uint64(8 * j)) & np.uint64(255)).astype(np.intp)]
+        k2 = (m2 << shift) | vmap[v.astype(np.intp)]
+        pos = np.minimum(np.searchsorted(keys, k2), len(keys) - 1)
+        hit = keys[pos] == k2
+        total += int(np.dot(cnt[s:s + JOIN_CHUNK][hit], cnt[pos[hit]]))
+    return total
+
+
+def _prefix_dims(D: int):
+    """Direction orders whose first two entries cover every ordered pair of distinct directions."""
+    out = []
+    for a, b in permutations(range(D), 2):
+        out.append([a, b] + [d for d in range(D) if d not in (a, b)])
+    return out
+
+
+def count_cycles(D: int, workers: int | None = None) -> dict:
+    """Directed Hamiltonian cycles through 0 and undirected cycles of Q_D (2 ≤ D ≤ 5)."""
+    if np is None:
+        raise RuntimeError('hypercube_cycles counting requires NumPy')
+    if not 2 <= D <= MAX_COUNT_DIM:
+        raise ValueError(f'exact counting supports 2 ≤ D ≤ {MAX_COUNT_DIM}; use enumerate_cycles beyond')
+    if D == 2:
+        return {'D': 2, 'directed_from_0': 2, 'undirected': 1, 'table_states': 1}
+    table = _path_table(D)
+    n_states = len(table[0])
+    prefixes = _prefix_dims(D)
+    if workers and workers > 1:
+        # one copy of the table, shared by all workers; only prefixes are sent
+        shms = []
+        try:
+            for arr in table:
+                shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+                shms.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            del table
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(tuple(s.name for s in shms), n_states)) as pool:
+                parts = list(pool.map(_join_prefix, [D] * len(prefixes), prefixes))
+        finally:
+            for s in shms:
+                s.close()
+                s.unlink()
+    else:
+        parts = [_join_prefix(D, p, table) for p in prefixes]
+    # directed cycles whose first two steps are 0 → 1 → 3; every ordered pair of directions is alike
+    fixed = sum(parts)
+    directed = fixed * D * (D - 1)
+    return {'D': D, 'directed_from_0': directed, 'undirected': directed // 2, 'table_states': n_states}
+
+
+# ------------------- Enumeration -------------------
+
+def enumerate_cycles(D: int, limit: int = 10, prefix=(0,)):
+    """Yield up to ``limit`` Hamiltonian cycles of Q_D (as vertex lists from 0) extending ``prefix``."""
+    n = 1 << D
+    if not prefix or prefix[0] != 0:
+        raise ValueError('cycles are listed from vertex 0')
+    nbrs = [[u ^ (1 << d) for d in range(D)] for u in range(n)]
+    closing = set(nbrs[0])
+    path = list(prefix)
+    seen = [False] * n
+    free = [D] * n  # unvisited neighbours of each vertex
+    for u in path:
+        seen[u] = True
+        for x in nbrs[u]:
+            free[x] -= 1
+    found = 0
+
+    def dfs():
+        nonlocal found
+        u = path[-1]
+        if len(path) == n:
+            if u in closing:
+                found += 1
+                yield list(path)
+            return
+        for w in nbrs[u]:
+            if seen[w]:
+                continue
+            seen[w] = True
+            for x in nbrs[w]:
+                free[x] -= 1
+            path.append(w)
+            # an unvisited neighbour of u has lost u as a way in; it still needs two ways
+            # through (one if it can be the last vertex, next to 0)
+            if all(seen[x] or free[x] >= (1 if x in closing else 2) for x in nbrs[u]):
+                yield from dfs()
+            path.pop()
+            for x in nbrs[w]:
+                free[x] += 1
+            seen[w] = False
+            if found >= limit:
+                return
+
+    yield from dfs()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count and emit Hamiltonian (Gray-code) cycles on Q_D.')
+    parser.add_argument('--dim', type=int, default=3, help='Hypercube dimension D (2^D ticks per cycle).')
+    parser.add_argument('--count', action='store_true', help=f'Exact cycle count (D ≤ {MAX_COUNT_DIM}).')
+    parser.add_argument('--emit', type=int, default=4, help='Number of cycles to emit as phase maps.')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--write-json', type=str, default=None)
+    args = parser.parse_args()
+
+    out = {'D': args.dim}
+    if args.count:
+        res = count_cycles(args.dim, args.workers)
+        out.update(res)
+        print(f"Q_{args.dim}: {res['undirected']} Hamiltonian cycles ({res['directed_from_0']} directed through 0)")
+    cycles = list(enumerate_cycles(args.dim, args.emit))
+    out['phase_maps'] = cycles
+    for c in cycles:
+        print(' '.join(str(u) for u in c))
+    if args.dim == 3 and cycles:
+        from gates_engine import evaluate_schedule
+
+        for c in cycles:
+            r = evaluate_schedule(phase_map=c)
+            print(f"canonical gates with phase map {c}: |B| = {r['blocked']}  S = {r['S_fraction']}")
+    if args.write_json:
+        with open(args.write_json, 'w') as f:
+            json.dump(out, f, indent=2)
@@ -3,24 +3,42 @@
 Common ILG utilities shared by cosmology demo scripts.
 
 Provides a single source for:
-- Cosmology container and background functions E(a), H(a)
+- Cosmology container and background functions E(a), H(a), Ω_m(a), dlnH/dlna
+  (matter + Λ by default; optional radiation, curvature and w0–wa dark energy)
 - k conversion and a_char proxy
 - μ(a,k) = 1 + x/(1+x) with x = a0 / a_char
+- analytic derivatives of a_char, μ and the background w.r.t. a0, β and Cosmo
 - a0 from κ (and κ from target a0) using canonical gating geometry
 - gating-derived β factor
+- broadcasting (a,k)-grid variants of the kernel (NumPy when available,
+  nested-list pure-Python fallback otherwise)
+- on-disk cache location shared by the tabulation/caching layers
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import math
-from dataclasses import dataclass
+import os
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
 
 
 @dataclass
 class Cosmo:
     H0: float = 70.0  # km/s/Mpc
     Omega_m0: float = 0.3
-    Omega_L0: float = 0.7
+    Omega_L0: float = 0.7  # dark energy density today (Λ when w0=-1, wa=0)
     h: float = 0.7
+    Omega_r0: float = 0.0
+    Omega_k0: float = 0.0
+    w0: float = -1.0
+    wa: float = 0.0
 
 
 # Unit helpers
@@ -28,12 +46,81 @@ KM_S_MPC_TO_SI = 1000.0 / (3.085677581e22)
 MPC_TO_M = 3.085677581e22
 
 
-def E(a: float, cosmo: Cosmo) -> float:
-    return math.sqrt(cosmo.Omega_m0 / a**3 + cosmo.Omega_L0)
+def is_lcdm(cosmo: Cosmo) -> bool:
+    """True when only matter + Λ are present (the closed forms below apply)."""
+    if np is not None and isinstance(cosmo.w0, np.ndarray):
+        return bool(np.all(cosmo.Omega_r0 == 0) and np.all(cosmo.Omega_k0 == 0)
+                    and np.all(cosmo.w0 == -1) and np.all(cosmo.wa == 0))
+    return cosmo.Omega_r0 == 0 and cosmo.Omega_k0 == 0 and cosmo.w0 == -1 and cosmo.wa == 0
+
+
+def _exp(x):
+    return np.exp(x) if np is not None and isinstance(x, np.ndarray) else math.exp(x)
+
+
+def de_factor(a, cosmo: Cosmo):
+    """ρ_DE(a)/ρ_DE(1) for w(a) = w0 + wa (1 - a) (CPL)."""
+    return a**(-3.0 * (1.0 + cosmo.w0 + cosmo.wa)) * _exp(-3.0 * cosmo.wa * (1.0 - a))
+
+
+def E2(a, cosmo: Cosmo):
+    """E(a)² = H²/H0²; works on floats and (broadcasting) arrays."""
+    if is_lcdm(cosmo):
+        return cosmo.Omega_m0 / a**3 + cosmo.Omega_L0
+    return (cosmo.Omega_m0 / a**3 + cosmo.Omega_r0 / a**4 + cosmo.Omega_k0 / a**2
+            + cosmo.Omega_L0 * de_factor(a, cosmo))
+
+
+def dlnE2_dlna(a, cosmo: Cosmo):
+    """d ln E²/d ln a (twice dlnH/dlna)."""
+    num = (-3.0 * cosmo.Omega_m0 / a**3 - 4.0 * cosmo.Omega_r0 / a**4 - 2.0 * cosmo.Omega_k0 / a**2
+           + cosmo.Omega_L0 * de_factor(a, cosmo) * (-3.0 * (1.0 + cosmo.w0 + cosmo.wa) + 3.0 * cosmo.wa * a))
+    return num / E2(a, cosmo)
+
+
+def d2lnE2_dlna2(a, cosmo: Cosmo):
+    """d² ln E²/d(ln a)²."""
+    e2 = E2(a, cosmo)
+    w_eff = -3.0 * (1.0 + cosmo.w0 + cosmo.wa) + 3.0 * cosmo.wa * a
+    de = cosmo.Omega_L0 * de_factor(a, cosmo)
+    s1 = (-3.0 * cosmo.Omega_m0 / a**3 - 4.0 * cosmo.Omega_r0 / a**4 - 2.0 * cosmo.Omega_k0 / a**2 + de * w_eff)
+    s2 = (9.0 * cosmo.Omega_m0 / a**3 + 16.0 * cosmo.Omega_r0 / a**4 + 4.0 * cosmo.Omega_k0 / a**2
+          + de * (w_eff**2 + 3.0 * cosmo.wa * a))
+    return s2 / e2 - (s1 / e2)**2
+
+
+def dlnH_dlna(a, cosmo: Cosmo):
+    if is_lcdm(cosmo):
+        return -1.5 * cosmo.Omega_m0 / (cosmo.Omega_m0 + cosmo.Omega_L0 * a**3)
+    return 0.5 * dlnE2_dlna(a, cosmo)
+
+
+def omega_m_a(a, cosmo: Cosmo):
+    """Ω_m(a) = Ω_m0 a^-3 / E²(a)."""
+    if is_lcdm(cosmo):
+        return cosmo.Omega_m0 / (cosmo.Omega_m0 + cosmo.Omega_L0 * a**3)
+    return cosmo.Omega_m0 / a**3 / E2(a, cosmo)
+
+
+# The kernel functions below (E, H, k_phys, a_char, x_from_a_char, mu_from_x,
+# mu_eff) are written once and evaluate elementwise on floats or on already
+# broadcast NumPy arrays; the *_grid variants further down only arrange the
+# (a, k) axes around them.
+
+def _floor(v, eps: float = 1e-30):
+    return max(v, eps) if isinstance(v, (int, float)) else np.maximum(v, eps)
+
 
+def E(a: float, cosmo: Cosmo, bg=None) -> float:
+    """E(a) = H/H0; from the tables of a background.Background when ``bg`` is given."""
+    if bg is not None:
+        return bg.E(a)
+    e2 = E2(a, cosmo)
+    return math.sqrt(e2) if isinstance(e2, (int, float)) else np.sqrt(e2)
 
-def H(a: float, cosmo: Cosmo) -> float:
-    return cosmo.H0 * KM_S_MPC_TO_SI * E(a, cosmo)
+
+def H(a: float, cosmo: Cosmo, bg=None) -> float:
+    return cosmo.H0 * KM_S_MPC_TO_SI * E(a, cosmo, bg)
 
 
 def k_phys(a: float, k_hmpc: float, cosmo: Cosmo) -> float:
@@ -43,22 +130,206 @@ def k_phys(a: float, k_hmpc: float, cosmo: Cosmo) -> float:
     return k_com_si / a
 
 
-def a_char(a: float, k_hmpc: float, cosmo: Cosmo, beta: float = 1.0) -> float:
+def a_char(a: float, k_hmpc: float, cosmo: Cosmo, beta: float = 1.0, bg=None) -> float:
     """Acceleration scale proxy with gating-derived factor β.
 
     Dimensionally, a_char ~ (a H)^2 / k_phys.
     """
     kp = k_phys(a, k_hmpc, cosmo)
-    return beta * (a * H(a, cosmo))**2 / max(kp, 1e-30)
+    return beta * (a * H(a, cosmo, bg))**2 / _floor(kp)
+
+
+def x_from_a_char(a0, ach):
+    """x = a0 / a_char (a_char floored at 1e-30)."""
+    return a0 / _floor(ach)
 
 
-def mu_eff(a: float, k_hmpc: float, a0: float, cosmo: Cosmo, beta: float = 1.0) -> float:
-    ach = a_char(a, k_hmpc, cosmo, beta)
-    x = a0 / max(ach, 1e-30)
+def mu_from_x(x: float) -> float:
     # Saturating enhancement in (1,2): 1 + x/(1+x)
     return 1.0 + x / (1.0 + x)
 
 
+def mu_eff(a: float, k_hmpc: float, a0: float, cosmo: Cosmo, beta: float = 1.0, bg=None) -> float:
+    return mu_from_x(x_from_a_char(a0, a_char(a, k_hmpc, cosmo, beta, bg)))
+
+
+# ------------------- Analytic parameter derivatives -------------------
+#
+# ln a_char = ln β + 2 ln(a H0) + ln E²(a) - ln(k h) + const and μ depends on
+# x = a0/a_char through dμ/dx = 1/(1+x)², so all first derivatives are closed
+# form.  Density parameters are independent here (no flatness constraint); for
+# a flat family combine them, e.g. d/dΩ_m0|flat = ∂/∂Ω_m0 - ∂/∂Ω_L0.
+
+KERNEL_PARAMS = ('a0', 'beta', 'H0', 'h', 'Omega_m0', 'Omega_L0', 'Omega_r0', 'Omega_k0', 'w0', 'wa')
+
+
+def dmu_dx(x):
+    return 1.0 / (1.0 + x)**2
+
+
+def _E2_partials(a, cosmo: Cosmo):
+    """{p: (∂E²/∂p, ∂(dE²/dln a)/∂p)} for the density and w0–wa parameters."""
+    de = de_factor(a, cosmo)
+    w_eff = -3.0 * (1.0 + cosmo.w0 + cosmo.wa) + 3.0 * cosmo.wa * a
+    ln_a = np.log(a) if np is not None and isinstance(a, np.ndarray) else math.log(a)
+    dde_w0 = de * (-3.0 * ln_a)
+    dde_wa = de * (-3.0 * ln_a - 3.0 * (1.0 - a))
+    ol = cosmo.Omega_L0
+    return {
+        'Omega_m0': (a**-3, -3.0 * a**-3),
+        'Omega_r0': (a**-4, -4.0 * a**-4),
+        'Omega_k0': (a**-2, -2.0 * a**-2),
+        'Omega_L0': (de, de * w_eff),
+        'w0': (ol * dde_w0, ol * (dde_w0 * w_eff - 3.0 * de)),
+        'wa': (ol * dde_wa, ol * (dde_wa * w_eff + de * (3.0 * a - 3.0))),
+    }
+
+
+def background_partials(a, cosmo: Cosmo):
+    """{p: (∂ln E²/∂p, ∂(dlnH/dlna)/∂p, ∂Ω_m(a)/∂p)} for the density and w0–wa parameters."""
+    e2 = E2(a, cosmo)
+    dlnh = dlnH_dlna(a, cosmo)
+    om = omega_m_a(a, cosmo)
+    out = {}
+    for p, (de2, de2l) in _E2_partials(a, cosmo).items():
+        dom = -om * de2 / e2 + (a**-3 / e2 if p == 'Omega_m0' else 0.0)
+        out[p] = (de2 / e2, 0.5 * (de2l - 2.0 * dlnh * de2) / e2, dom)
+    return out
+
+
+def a_char_grad(a: float, k_hmpc: float, cosmo: Cosmo, beta: float = 1.0, bg=None):
+    """a_char and {p: ∂a_char/∂p} for p in KERNEL_PARAMS (∂/∂a0 = 0); a_char from ``bg`` when given."""
+    ach = a_char(a, k_hmpc, cosmo, beta, bg)
+    dln = {'a0': 0.0, 'beta': 1.0 / beta, 'H0': 2.0 / cosmo.H0, 'h': -1.0 / cosmo.h}
+    e2 = E2(a, cosmo)
+    for p, (de2, _) in _E2_partials(a, cosmo).items():
+        dln[p] = de2 / e2
+    return ach, {p: ach * v for p, v in dln.items()}
+
+
+def mu_eff_grad(a: float, k_hmpc: float, a0: float, cosmo: Cosmo, beta: float = 1.0, bg=None):
+    """μ and {p: ∂μ/∂p} for p in KERNEL_PARAMS."""
+    ach, dach = a_char_grad(a, k_hmpc, cosmo, beta, bg)
+    ach = max(ach, 1e-30)
+    x = a0 / ach
+    m1 = dmu_dx(x)
+    grad = {p: -m1 * x * d / ach for p, d in dach.items()}
+    grad['a0'] = m1 / ach
+    return mu_from_x(x), grad
+
+
+# ------------------- Grid (broadcasting) variants -------------------
+#
+# The *_grid functions take array-like a and k and evaluate the whole plane in
+# one call.  Result shapes are the same with and without NumPy:
+#   1-D a and 1-D k      → (len(a), len(k)), a along rows;
+#   scalar a, 1-D k      → (len(k),);  1-D a, scalar k → (len(a),);
+#   scalar a, scalar k   → scalar.
+# With NumPy, any other inputs broadcast as usual (e.g. a[:, None] against an
+# ensemble column); without NumPy the results are nested lists / floats built
+# from the same kernels, and only scalars and 1-D sequences are accepted.
+# All of them take an optional ``bg`` (background.Background for the same
+# Cosmo), in which case E(a) comes from its tables instead of the closed form.
+
+
+def have_numpy() -> bool:
+    return np is not None
+
+
+def _is_scalar(v) -> bool:
+    return isinstance(v, (int, float))
+
+
+def _as_axis(v):
+    """1-D sequence → list of floats (pure-Python path)."""
+    try:
+        return [float(t) for t in v]
+    except TypeError:
+        raise ValueError('without NumPy the *_grid functions take scalars or 1-D sequences') from None
+
+
+def _py_axis(f, v):
+    """f over a scalar or 1-D sequence, keeping its shape (pure-Python path)."""
+    return f(float(v)) if _is_scalar(v) else [f(t) for t in _as_axis(v)]
+
+
+def _py_plane(f, a, k):
+    """f(a, k) with the shapes listed above (pure-Python path)."""
+    if _is_scalar(a):
+        return _py_axis(lambda t: f(float(a), t), k)
+    if _is_scalar(k):
+        return [f(t, float(k)) for t in _as_axis(a)]
+    return [[f(ai, ki) for ki in _as_axis(k)] for ai in _as_axis(a)]
+
+
+def _py_each(f, v):
+    """f over every float of a _py_plane result."""
+    return [_py_each(f, t) for t in v] if isinstance(v, list) else f(v)
+
+
+def E_grid(a, cosmo: Cosmo, bg=None):
+    if np is None:
+        return _py_axis(lambda t: E(t, cosmo, bg), a)
+    return E(np.asarray(a, dtype=float), cosmo, bg)
+
+
+def H_grid(a, cosmo: Cosmo, bg=None):
+    if np is None:
+        return _py_axis(lambda t: H(t, cosmo, bg), a)
+    return H(np.asarray(a, dtype=float), cosmo, bg)
+
+
+def k_phys_grid(a, k_hmpc, cosmo: Cosmo):
+    """Broadcast k_phys over a (rows) and k (columns)."""
+    if np is None:
+        return _py_plane(lambda ai, ki: k_phys(ai, ki, cosmo), a, k_hmpc)
+    return k_phys(*_mesh(a, k_hmpc), cosmo)
+
+
+def a_char_grid(a, k_hmpc, cosmo: Cosmo, beta: float = 1.0, bg=None):
+    if np is None:
+        return _py_plane(lambda ai, ki: a_char(ai, ki, cosmo, beta, bg), a, k_hmpc)
+    return a_char(*_mesh(a, k_hmpc), cosmo, beta, bg)
+
+
+def mu_eff_grid(a, k_hmpc, a0: float, cosmo: Cosmo, beta: float = 1.0, bg=None):
+    """Evaluate μ over the (a,k) plane in one call.
+
+    Returns (mu, x, a_char) with matching shapes, as listed above: 1-D ``a``
+    and ``k`` are the two axes of the plane (shape (len(a), len(k))), a scalar
+    adds no axis, and (with NumPy) other arrays broadcast elementwise.
+    """
+    ach = a_char_grid(a, k_hmpc, cosmo, beta, bg)
+    if np is None:
+        x = _py_each(lambda c: x_from_a_char(a0, c), ach)
+        return _py_each(mu_from_x, x), x, ach
+    x = x_from_a_char(a0, ach)
+    return mu_from_x(x), x, ach
+
+
+def stack_cosmos(cosmos) -> Cosmo:
+    """Ensemble of Cosmo instances → one Cosmo whose fields are (n, 1) arrays.
+
+    The result broadcasts against (1, n_k) k-rows in the *_grid functions, so a
+    whole ensemble × k plane is evaluated in one call.
+    """
+    cosmos = list(cosmos)
+    return Cosmo(**{f.name: np.array([getattr(c, f.name) for c in cosmos], dtype=float)[:, None]
+                    for f in fields(Cosmo)})
+
+
+def _mesh(a, k):
+    """Arrange a and k: two 1-D inputs become an outer (a,k) plane, anything else broadcasts as is.
+
+    Inputs are not expanded, so a scalar a against a k mesh evaluates H(a) once.
+    """
+    a = np.asarray(a, dtype=float)
+    k = np.asarray(k, dtype=float)
+    if a.ndim == 1 and k.ndim == 1:
+        return a[:, None], k[None, :]
+    return a, k
+
+
 def compute_lambda_rec() -> float:
     """Planck/recognition length λ_rec = sqrt(ħ G / c^3)."""
     HBAR = 1.054_571_817e-34  # J s
@@ -95,3 +366,20 @@ def kappa_for_target_a0(a0_target: float) -> float:
     return a0_target / denom if denom > 0 else 0.0
 
 
+# ------------------- Cache helpers -------------------
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def cache_dir() -> Path:
+    """Directory for cached tables ($ILG_CACHE_DIR, default <repo>/.cache/ilg)."""
+    d = Path(os.environ.get('ILG_CACHE_DIR', ROOT / '.cache' / 'ilg'))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def params_key(kind: str, **params) -> str:
+    """Stable hash of a parameter set (Cosmo instances are expanded field-wise)."""
+    norm = {k: (asdict(v) if isinstance(v, Cosmo) else v) for k, v in params.items()}
+    blob = json.dumps({'kind': kind, 'params': norm}, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:20]
@@ -12,7 +12,7 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
-from ilg_common import Cosmo, mu_eff, compute_a0_from_kappa, kappa_for_target_a0, gating_beta, a_char
+from ilg_common import Cosmo, mu_eff, mu_eff_grid, compute_a0_from_kappa, kappa_for_target_a0, gating_beta, a_char
 
 
 def run_checks():
@@ -28,10 +28,12 @@ def run_checks():
     x_deep = a0 / a_char(a_deep, k_deep, cosmo, beta)
     # Sweep a grid to see monotonic approach
     sweep = []
-    for a in [0.3, 0.5, 0.7, 1.0]:
-        for k in [0.01, 0.05, 0.1, 0.2]:
-            x = a0 / a_char(a, k, cosmo, beta)
-            sweep.append({'a': a, 'k': k, 'x': x, 'mu': mu_eff(a, k, a0, cosmo, beta)})
+    sweep_a = [0.3, 0.5, 0.7, 1.0]
+    sweep_k = [0.01, 0.05, 0.1, 0.2]
+    mu_plane, x_plane, _ = mu_eff_grid(sweep_a, sweep_k, a0, cosmo, beta)
+    for i, a in enumerate(sweep_a):
+        for j, k in enumerate(sweep_k):
+            sweep.append({'a': a, 'k': k, 'x': float(x_plane[i][j]), 'mu': float(mu_plane[i][j])})
     return {
         'newtonian_limit': {'mu_at_a1_k1': mu_newt},
         'deep_limit_probe': {'a': a_deep, 'k': k_deep, 'x': x_deep, 'mu': mu_deep},
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Tabulated μ(a,k) with a certified bilinear-interpolation error bound.
+
+μ is sampled once on a uniform ln a × ln k grid for fixed (a0, β, Cosmo) and
+stored as a memory-mapped .npy file under ilg_common.cache_dir(), keyed by a
+hash of those parameters and the grid spec.  Later runs with the same canonical
+parameters map the file back in without recomputing anything.
+
+Error bound.  With u = ln x = ln(a0/a_char) we have μ = 1 + σ(u), σ(u) = e^u/(1+e^u),
+and u = const + ln k - 3 ln a - ln E²(a).  Hence
+  ∂u/∂ln k = 1,   |∂u/∂ln a| = 3(1 - Ω_m(a)) ≤ 3,   |∂²u/∂(ln a)²| = 9 Ω_m(a)(1 - Ω_m(a)) ≤ 9/4,
+and with |σ'| ≤ 1/4, |σ''| ≤ 1/(6√3) the tensor-product bilinear interpolant obeys
+  |μ - Iμ| ≤ h_a²/8 · (9|σ''| + 9/4 |σ'|) + h_k²/8 · |σ''|
+everywhere inside the table.  Grid spacings are chosen from the requested tol.
+For backgrounds beyond matter + Λ (radiation, curvature, w0–wa) the ln a bound
+uses max |u'|² and max |u''| (u' = -3 - dlnE²/dlna, u'' = -d²lnE²/dlna²) sampled
+densely over the table range with a 10% safety margin.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+from dataclasses import asdict
+
+from ilg_common import (
+    Cosmo,
+    cache_dir,
+    d2lnE2_dlna2,
+    dlnE2_dlna,
+    is_lcdm,
+    compute_a0_from_kappa,
+    gating_beta,
+    kappa_for_target_a0,
+    mu_eff_grid,
+    params_key,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional for the rest of the repo
+    np = None
+
+TABLE_VERSION = 1
+SIGMA1_MAX = 0.25                        # max |σ'|
+SIGMA2_MAX = 1.0 / (6.0 * math.sqrt(3))  # max |σ''|
+M_AA = 9.0 * SIGMA2_MAX + 2.25 * SIGMA1_MAX
+M_KK = SIGMA2_MAX
+
+
+def bilinear_error_bound(h_lna: float, h_lnk: float, a0: float = 1.0, m_aa: float = M_AA) -> float:
+    """Certified max |μ - Iμ| for node spacings h_lna, h_lnk (0 when a0 = 0)."""
+    if a0 == 0.0:
+        return 0.0
+    return (h_lna**2 / 8.0) * m_aa + (h_lnk**2 / 8.0) * M_KK
+
+
+def ln_a_curvature_bound(cosmo: Cosmo, a_min: float, a_max: float, samples: int = 20000) -> float:
+    """Bound on |∂²μ/∂(ln a)²| for the given background (analytic for matter + Λ)."""
+    if is_lcdm(cosmo):
+        return M_AA
+    lo, hi = math.log(a_min), math.log(a_max)
+    u1 = u2 = 0.0
+    for i in range(samples + 1):
+        a = math.exp(lo + (hi - lo) * i / samples)
+        u1 = max(u1, abs(-3.0 - dlnE2_dlna(a, cosmo)))
+        u2 = max(u2, abs(d2lnE2_dlna2(a, cosmo)))
+    return 1.1 * (SIGMA2_MAX * u1**2 + SIGMA1_MAX * u2)
+
+
+def _grid_size(span: float, m: float, tol: float) -> int:
+    # Split the budget evenly between the two axes: h²/8 · m ≤ tol/2
+    h = math.sqrt(4.0 * tol / m)
+    return max(2, int(math.ceil(span / h)) + 1)
+
+
+class MuTable:
+    """Memory-mapped μ table on a uniform (ln a, ln k) grid."""
+
+    def __init__(self, values, meta: dict, path=None, from_cache: bool = False):
+        self.values = values
+        self.meta = meta
+        self.path = path
+        self.from_cache = from_cache
+        self.lna_min = meta['lna_min']
+        self.lnk_min = meta['lnk_min']
+        self.n_a = meta['n_a']
+        self.n_k = meta['n_k']
+        self.h_lna = meta['h_lna']
+        self.h_lnk = meta['h_lnk']
+        self.max_error = meta['max_error']
+        self._inv_ha = 1.0 / self.h_lna
+        self._inv_hk = 1.0 / self.h_lnk
+        # Column cache: a growth solve queries one k many times, so the
+        # k-interpolated column is materialized once as a plain list.
+        self._col_k = None
+        self._col = None
+
+    def _locate(self, a: float, k_hmpc: float):
+        ta = (math.log(a) - self.lna_min) * self._inv_ha
+        tk = (math.log(k_hmpc) - self.lnk_min) * self._inv_hk
+        # Small slack for round-off at the end nodes
+        if not (-1e-9 <= ta <= self.n_a - 1 + 1e-9 and -1e-9 <= tk <= self.n_k - 1 + 1e-9):
+            raise ValueError(f'(a={a:g}, k={k_hmpc:g}) outside tabulated domain {self.domain()}')
+        i = min(max(int(ta), 0), self.n_a - 2)
+        j = min(max(int(tk), 0), self.n_k - 2)
+        return i, j, ta - i, tk - j
+
+    def mu(self, a: float, k_hmpc: float) -> float:
+        """Interpolated μ(a,k) (scalar)."""
+        if k_hmpc != self._col_k:
+            _, j, _, fk = self._locate(math.exp(self.lna_min), k_hmpc)
+            v = self.values
+            self._col = (v[:, j] + fk * (v[:, j + 1] - v[:, j])).tolist()
+            self._col_k = k_hmpc
+        ta = (math.log(a) - self.lna_min) * self._inv_ha
+        if not (-1e-9 <= ta <= self.n_a - 1 + 1e-9):
+            raise ValueError(f'(a={a:g}, k={k_hmpc:g}) outside tabulated domain {self.domain()}')
+        i = min(max(int(ta), 0), self.n_a - 2)
+        fa = ta - i
+        col = self._col
+        return col[i] + fa * (col[i + 1] - col[i])
+
+    def lookup(self, a: float, k_hmpc: float):
+        """(μ, max interpolation error) at a single (a,k)."""
+        return self.mu(a, k_hmpc), self.max_error
+
+    def lookup_grid(self, a, k_hmpc):
+        """Vectorized lookup; a and k broadcast elementwise.  Returns (μ, max error)."""
+        a = np.asarray(a, dtype=float)
+        k = np.asarray(k_hmpc, dtype=float)
+        ta = (np.log(a) - self.lna_min) * self._inv_ha
+        tk = (np.log(k) - self.lnk_min) * self._inv_hk
+        if (np.any(ta < -1e-9) or np.any(ta > self.n_a - 1 + 1e-9)
+                or np.any(tk < -1e-9) or np.any(tk > self.n_k - 1 + 1e-9)):
+            raise ValueError(f'lookup outside tabulated domain {self.domain()}')
+        i = np.clip(ta.astype(np.int64), 0, self.n_a - 2)
+        j = np.clip(tk.astype(np.int64), 0, self.n_k - 2)
+        fa = ta - i
+        fk = tk - j
+        v = self.values
+        m0 = v[i, j] + fk * (v[i, j + 1] - v[i, j])
+        m1 = v[i + 1, j] + fk * (v[i + 1, j + 1] - v[i + 1, j])
+        return m0 + fa * (m1 - m0), self.max_error
+
+    def domain(self):
+        return {
+            'a': [math.exp(self.lna_min), math.exp(self.lna_min + self.h_lna * (self.n_a - 1))],
+            'k': [math.exp(self.lnk_min), math.exp(self.lnk_min + self.h_lnk * (self.n_k - 1))],
+        }
+
+
+def load_or_build_mu_table(a0: float, beta: float, cosmo: Cosmo | None = None,
+                           a_min: float = 1e-4, a_max: float = 1.0,
+                           k_min: float = 1e-4, k_max: float = 1e2,
+                           tol: float = 1e-5, directory=None) -> MuTable:
+    """Return the μ table for (a0, β, cosmo), building and caching it on first use."""
+    if np is None:
+        raise RuntimeError('ilg_table requires NumPy')
+    cosmo = cosmo or Cosmo()
+    key = params_key('mu_table', version=TABLE_VERSION, a0=a0, beta=beta, cosmo=cosmo,
+                     a_min=a_min, a_max=a_max, k_min=k_min, k_max=k_max, tol=tol)
+    d = directory or cache_dir()
+    path = os.path.join(str(d), f'mu_{key}.npy')
+    meta_path = os.path.join(str(d), f'mu_{key}.json')
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        values = np.load(path, mmap_mode='r')
+        return MuTable(values, meta, path=path, from_cache=True)
+
+    lna_min, lna_max = math.log(a_min), math.log(a_max)
+    lnk_min, lnk_max = math.log(k_min), math.log(k_max)
+    m_aa = ln_a_curvature_bound(cosmo, a_min, a_max)
+    n_a = _grid_size(lna_max - lna_min, m_aa, tol)
+    n_k = _grid_size(lnk_max - lnk_min, M_KK, tol)
+    h_lna = (lna_max - lna_min) / (n_a - 1)
+    h_lnk = (lnk_max - lnk_min) / (n_k - 1)
+    a_nodes = np.exp(lna_min + h_lna * np.arange(n_a))
+    k_nodes = np.exp(lnk_min + h_lnk * np.arange(n_k))
+    mu, _, _ = mu_eff_grid(a_nodes, k_nodes, a0, cosmo, beta)
+
+    tmp = path + f'.{os.getpid()}.tmp'
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(n_a, n_k))
+    out[:] = mu
+    out.flush()
+    del out
+    os.replace(tmp, path)
+    meta = {
+        'version': TABLE_VERSION,
+        'key': key,
+        'a0': a0,
+        'beta': beta,
+        'cosmo': asdict(cosmo),
+        'lna_min': lna_min,
+        'lnk_min': lnk_min,
+        'n_a': n_a,
+        'n_k': n_k,
+        'h_lna': h_lna,
+        'h_lnk': h_lnk,
+        'tol': tol,
+        'max_error': bilinear_error_bound(h_lna, h_lnk, a0, m_aa),
+    }
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+    values = np.load(path, mmap_mode='r')
+    return MuTable(values, meta, path=path, from_cache=False)
+
+
+def canonical_mu_table(a0_target: float = 1.2e-10, cosmo: Cosmo | None = None, **kwargs) -> MuTable:
+    """Table for the canonical parameters: β = gating_beta(), a0 from κ(a0_target)."""
+    a0 = compute_a0_from_kappa(kappa_for_target_a0(a0_target))
+    return load_or_build_mu_table(a0, gating_beta(), cosmo, **kwargs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build/load the cached μ(a,k) table for the canonical ILG parameters.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--tol', type=float, default=1e-5, help='Target max interpolation error.')
+    parser.add_argument('--a-min', type=float, default=1e-4)
+    parser.add_argument('--k-min', type=float, default=1e-4)
+    parser.add_argument('--k-max', type=float, default=1e2)
+    parser.add_argument('--verify', type=int, default=0, help='Check N random points against the exact kernel.')
+    args = parser.parse_args()
+
+    tab = canonical_mu_table(args.a0_target, tol=args.tol, a_min=args.a_min, k_min=args.k_min, k_max=args.k_max)
+    src = 'cache' if tab.from_cache else 'built'
+    print(f"μ table ({src}): {tab.n_a}×{tab.n_k} nodes, certified max error {tab.max_error:.3e}")
+    print(f"  path: {tab.path}")
+    if args.verify:
+        rng = np.random.default_rng(0)
+        dom = tab.domain()
+        a = np.exp(rng.uniform(math.log(dom['a'][0]), math.log(dom['a'][1]), args.verify))
+        k = np.exp(rng.uniform(math.log(dom['k'][0]), math.log(dom['k'][1]), args.verify))
+        approx, bound = tab.lookup_grid(a, k)
+        exact = mu_eff_grid(a[:, None], k[:, None], tab.meta['a0'], Cosmo(**tab.meta['cosmo']), tab.meta['beta'])[0][:, 0]
+        err = float(np.max(np.abs(approx - exact)))
+        print(f"  verify: max |error| over {args.verify} points = {err:.3e} (bound {bound:.3e}, ok={err <= bound})")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Limber weak-lensing angular power spectra with the ILG lensing response Σ(a,k).
+
+  C_ℓ^{ij} = ∫ dχ  q_i(χ) q_j(χ) / f_K(χ)²  Σ²(a(χ), k) P(k, a(χ)),   k = (ℓ + ½)/f_K(χ)
+
+  q_i(χ) = (3/2) Ω_m0 (H0/c)² f_K(χ)/a(χ) ∫_χ dχ' n_i(χ') f_K(χ' - χ)/f_K(χ')
+
+Geometry (χ quadrature nodes, a(χ), f_K and the tomographic lensing
+efficiencies q_i) depends only on the background and the source redshift
+distributions, so LimberKernels builds it once, together with the
+A_s · T²(k) · P_prim(k) part of the linear spectrum on each (ℓ × χ) k grid
+used.  Changing κ or β only re-evaluates Σ and the ILG growth D(k,a): one
+batched RK4 solve (linear_growth_demo.integrate_growth_batch) over every
+(a0, β) sample at once, on a fixed log-k node grid and the a(χ) nodes, read
+off at k(ℓ, χ) by linear interpolation of ln D in ln k.  D is held at its end
+values outside the node range, where μ has saturated (μ → 1 at low k, μ → 2
+at high k).  convergence_cl_batch evaluates many samples in one einsum.
+Shear spectra follow from convergence via (ℓ+2)(ℓ+1)ℓ(ℓ-1)/(ℓ+½)⁴.
+
+Units: χ in Mpc/h, k in h/Mpc, P in (Mpc/h)³.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+from datetime import datetime
+
+from background import background_for
+from ilg_common import Cosmo, compute_a0_from_kappa, gating_beta, kappa_for_target_a0, mu_eff_grid
+from linear_growth_demo import integrate_growth_batch
+from power_spectrum import linear_shape
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def smail_nz(z, z0=0.64, alpha=2.0, beta=1.5):
+    """Unnormalised Smail-type source distribution n(z) ∝ z^α exp(-(z/z0)^β)."""
+    z = np.asarray(z, dtype=float)
+    return z**alpha * np.exp(-(z / z0)**beta)
+
+
+def tomographic_bins(edges, z_max=4.0, n_z=400, **smail):
+    """Split a Smail n(z) into top-hat tomographic bins → list of (z, n(z))."""
+    z = np.linspace(0.0, z_max, n_z + 1)[1:]
+    nz = smail_nz(z, **smail)
+    bins = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        sel = np.where((z >= lo) & (z < hi), nz, 0.0)
+        bins.append((z, sel))
+    return bins
+
+
+# ------------------- Geometry cache -------------------
+
+class LimberKernels:
+    """Line-of-sight quadrature and lensing efficiencies for a set of source bins."""
+
+    def __init__(self, cosmo: Cosmo | None = None, source_bins=None, n_chi: int = 256, a_min: float = 1e-3,
+                 A_s: float = 2.1e-9, n_s: float = 0.965, k_min: float = 1e-4, k_max: float = 1e4, n_k: int = 512,
+                 a_start: float = 1e-3, N: int = 400):
+        if np is None:
+            raise RuntimeError('lensing_cl requires NumPy')
+        self.cosmo = cosmo or Cosmo()
+        self.bg = background_for(self.cosmo)
+        bins = source_bins if source_bins is not None else tomographic_bins([0.0, 4.0])
+        z_top = max(float(np.max(z[n > 0])) for z, n in bins)
+        chi_max = float(self.bg.chi(max(1.0 / (1.0 + z_top), a_min)))
+        # Gauss–Legendre nodes on (0, χ_max)
+        x, w = np.polynomial.legendre.leggauss(n_chi)
+        self.chi = 0.5 * chi_max * (x + 1.0)
+        self.w = 0.5 * chi_max * w
+        self.a = self.bg.a_of_chi(self.chi)
+        self.fk = self._fk(self.chi)
+        pref = 1.5 * self.cosmo.Omega_m0 / self.bg.hubble_distance**2
+        q = []
+        for z, nz in bins:
+            z = np.asarray(z, dtype=float)
+            nz = np.asarray(nz, dtype=float)
+            dz = np.gradient(z)
+            wz = nz * dz
+            wz = wz / np.sum(wz)
+            keep = wz > 0
+            chi_s = self.bg.chi(1.0 / (1.0 + z[keep]))
+            # f_K(χ_s - χ)/f_K(χ_s) for every (χ node, source slice); zero behind the source
+            diff = chi_s[None, :] - self.chi[:, None]
+            ratio = np.where(diff > 0, self._fk(np.maximum(diff, 0.0)) / self._fk(chi_s)[None, :], 0.0)
+            q.append(pref * self.fk / self.a * (ratio @ wz[keep]))
+        self.q = np.asarray(q)   # (n_bins, n_chi)
+        self.n_bins = len(q)
+        # Geometry part of the integrand, shared by every (ℓ, κ, β) evaluation
+        self._geom = self.w / self.fk**2
+        # linear-spectrum settings (power_spectrum.LinearPower defaults) and the growth node grid
+        self.A_s, self.n_s = A_s, n_s
+        self.k_nodes = np.logspace(math.log10(k_min), math.log10(k_max), n_k)
+        self._a_start, self._N = a_start, N
+        self._shape = {}
+
+    def _fk(self, chi):
+        ok = self.cosmo.Omega_k0
+        if ok == 0:
+            return chi
+        s = math.sqrt(abs(ok)) / self.bg.hubble_distance
+        return np.sinh(s * chi) / s if ok > 0 else np.sin(s * chi) / s
+
+    def k_grid(self, ells):
+        return (np.asarray(ells, dtype=float)[:, None] + 0.5) / self.fk[None, :]
+
+    def _shape_grid(self, ells):
+        """A_s · linear_shape on the (ℓ, χ) grid, cached per ℓ list."""
+        key = tuple(float(e) for e in np.atleast_1d(ells))
+        s = self._shape.get(key)
+        if s is None:
+            s = self._shape[key] = self.A_s * linear_shape(self.k_grid(ells), self.cosmo, self.n_s)
+        return s
+
+    def growth_grid(self, ells, a0s, betas):
+        """ILG D(k(ℓ,χ), a(χ)) for every (a0, β) sample → (n_samples, n_ℓ, n_χ), one batched solve."""
+        a0s = np.atleast_1d(np.asarray(a0s, dtype=float))
+        betas = np.atleast_1d(np.asarray(betas, dtype=float))
+        # a(χ) decreases along χ; the integrator wants increasing output times
+        lnD = np.log(integrate_growth_batch(self.k_nodes, self.cosmo, a0s, betas, self._a_start, 1.0, self._N,
+                                            a_out=self.a[::-1], bg=self.bg))[..., ::-1]
+        lnk = np.log(self.k_nodes)
+        u = np.clip((np.log(self.k_grid(ells)) - lnk[0]) / (lnk[1] - lnk[0]), 0, len(lnk) - 1)
+        i = np.minimum(u.astype(np.int64), len(lnk) - 2)
+        t = u - i
+        c = np.arange(len(self.chi))[None, :]
+        return np.exp((1 - t) * lnD[:, i, c] + t * lnD[:, i + 1, c])
+
+    def pk_grid(self, ells, a0s, betas):
+        """Linear P(k(ℓ,χ), a(χ)) with ILG growth for every sample → (n_samples, n_ℓ, n_χ)."""
+        return self._shape_grid(ells) * self.growth_grid(ells, a0s, betas)**2
+
+    def convergence_cl(self, ells, a0: float, beta: float, pk=None, pk_grid=None):
+        """C_ℓ^{κκ} for all bin pairs → array (n_ℓ, n_bins, n_bins).
+
+        ``pk(k, a)`` is evaluated on the (ℓ, χ) grid (default: the linear
+        spectrum with ILG growth for the same a0, β, see pk_grid);
+        alternatively pass the precomputed ``pk_grid`` (same shape).
+        """
+        if pk_grid is None:
+            if pk is not None:
+                k = self.k_grid(ells)
+                pk_grid = pk(k, np.broadcast_to(self.a[None, :], k.shape))
+            else:
+                pk_grid = self.pk_grid(ells, a0, beta)[0]
+        return self.convergence_cl_batch(ells, [a0], [beta], pk_grid[None])[0]
+
+    def shear_cl(self, ells, a0: float, beta: float, pk=None, pk_grid=None):
+        ells = np.asarray(ells, dtype=float)
+        fac = (ells + 2) * (ells + 1) * ells * (ells - 1) / (ells + 0.5)**4
+        return fac[:, None, None] * self.convergence_cl(ells, a0, beta, pk, pk_grid)
+
+    def convergence_cl_batch(self, ells, a0s, betas, pk_grid=None):
+        """C_ℓ for many (a0, β) samples sharing geometry → (n_samples, n_ℓ, n_bins, n_bins).
+
+        By default each sample gets its own ILG linear P (pk_grid above), so
+        row s equals convergence_cl(ells, a0s[s], betas[s]).  An explicit
+        ``pk_grid`` may be a per-sample stack (n_samples, n_ℓ, n_χ), or a
+        single (n_ℓ, n_χ) grid shared by every sample; the latter is the
+        fixed-P approximation in which only Σ² varies with (a0, β).
+        """
+        a0s = np.atleast_1d(np.asarray(a0s, dtype=float))
+        betas = np.broadcast_to(np.asarray(betas, dtype=float), a0s.shape)
+        if pk_grid is None:
+            pk_grid = self.pk_grid(ells, a0s, betas)
+        k = self.k_grid(ells)
+        sigma = mu_eff_grid(self.a[None, None, :], k[None], a0s[:, None, None], self.cosmo, betas[:, None, None],
+                            bg=self.bg)[0]
+        integrand = sigma**2 * np.asarray(pk_grid) * self._geom
+        return np.einsum('slc,ic,jc->slij', integrand, self.q, self.q)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Limber weak-lensing C_ℓ with the ILG Σ(a,k) (canonical schedule).')
+    parser.add_argument('--kappa', type=float, default=None, help='Dimensionless geometric factor κ. If omitted, inferred from a0-target.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--beta', type=float, default=None, help='Override β. If omitted, uses gating-derived β_gates.')
+    parser.add_argument('--bins', type=str, default='0.0,0.6,1.2,4.0', help='Tomographic bin edges in z.')
+    parser.add_argument('--ells', type=str, default='10,30,100,300,1000,3000')
+    parser.add_argument('--n-chi', type=int, default=256)
+    parser.add_argument('--write-json', type=str, default=None, help='If set, write C_ℓ JSON to this path.')
+    args = parser.parse_args()
+
+    kappa = args.kappa if args.kappa is not None else kappa_for_target_a0(args.a0_target)
+    a0 = compute_a0_from_kappa(kappa)
+    beta = args.beta if args.beta is not None else gating_beta()
+    cosmo = Cosmo()
+    edges = [float(s) for s in args.bins.split(',') if s]
+    ells = [float(s) for s in args.ells.split(',') if s]
+
+    kern = LimberKernels(cosmo, tomographic_bins(edges), n_chi=args.n_chi)
+    cl_ilg, cl_std = kern.convergence_cl_batch(ells, [a0, 0.0], [beta, beta])
+
+    print(f"a0 = {a0:.6e} m/s^2;  β = {beta:.3f};  bins = {edges}")
+    rows = []
+    for il, ell in enumerate(ells):
+        for i in range(kern.n_bins):
+            for j in range(i, kern.n_bins):
+                r = cl_ilg[il, i, j] / cl_std[il, i, j]
+                rows.append({'ell': ell, 'bins': [i, j], 'C_ell': float(cl_ilg[il, i, j]),
+                             'C_ell_LCDM': float(cl_std[il, i, j]), 'ratio': float(r)})
+                print(f"ℓ={ell:6.0f}  ({i},{j})  C_ℓ^κκ={cl_ilg[il, i, j]:.4e}  ILG/ΛCDM={r:.5f}")
+    if args.write_json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.write_json)), exist_ok=True)
+        payload = {
+            'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            'ilg': {'a0': a0, 'beta': beta},
+            'bins': edges,
+            'cl': rows,
+        }
+        with open(args.write_json, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f"Wrote C_ell JSON to {args.write_json}")
@@ -4,7 +4,8 @@ import argparse
 import json
 import os
 from datetime import datetime
-from ilg_common import Cosmo, a_char, mu_eff, compute_a0_from_kappa, kappa_for_target_a0, gating_beta
+from ilg_common import Cosmo, mu_eff_grid, compute_a0_from_kappa, kappa_for_target_a0, gating_beta
+from background import background_for
 
 KM_S_MPC_TO_SI = 1000.0 / (3.085677581e22)
 MPC_TO_M = 3.085677581e22
@@ -32,12 +33,14 @@ if __name__ == '__main__':
     beta_gates = gating_beta()
     beta = args.beta if args.beta is not None else beta_gates
 
-    cosmo = Cosmo()
+    # H(a) for every μ below comes from one tabulated background
+    bg = background_for(Cosmo())
+    cosmo = bg.cosmo
     ks = [float(s) for s in args.ks.split(',') if s]
     rows = []
-    for k in ks:
-        mu = mu_eff(args.a, k, a0, cosmo, beta)
-        Sigma = mu  # Σ(a,k)=μ(a,k) when Φ=Ψ
+    mu_row = mu_eff_grid(args.a, ks, a0, cosmo, beta, bg)[0]
+    for j, k in enumerate(ks):
+        Sigma = float(mu_row[j])  # Σ(a,k)=μ(a,k) when Φ=Ψ
         z = (1.0 / args.a) - 1.0 if args.a > 0 else float('inf')
         rows.append({'k': k, 'a': args.a, 'z': z, 'Sigma': Sigma})
 
@@ -49,11 +52,13 @@ if __name__ == '__main__':
         os.makedirs(os.path.dirname(os.path.abspath(args.write_json)), exist_ok=True)
         # Also build a small grid over a and k to illustrate scale dependence
         grid = []
-        for a in [0.5, 0.7, 1.0]:
-            for k in [0.01, 0.05, 0.1, 0.2]:
-                mu = mu_eff(a, k, a0, cosmo, beta)
+        grid_a = [0.5, 0.7, 1.0]
+        grid_k = [0.01, 0.05, 0.1, 0.2]
+        mu_plane = mu_eff_grid(grid_a, grid_k, a0, cosmo, beta, bg)[0]
+        for i, a in enumerate(grid_a):
+            for j, k in enumerate(grid_k):
                 z = (1.0 / a) - 1.0 if a > 0 else float('inf')
-                grid.append({'a': a, 'z': z, 'k': k, 'Sigma': mu})
+                grid.append({'a': a, 'z': z, 'k': k, 'Sigma': float(mu_plane[i][j])})
         payload = {
             'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
             'ilg': {
@@ -1,27 +1,46 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import math
 import argparse
 import json
 import os
+from dataclasses import asdict
 from datetime import datetime
-from ilg_common import Cosmo, a_char, mu_eff, compute_a0_from_kappa, kappa_for_target_a0, gating_beta
+from ilg_common import (Cosmo, a_char, mu_eff, mu_eff_grid, stack_cosmos, compute_a0_from_kappa, kappa_for_target_a0,
+                        gating_beta, cache_dir, params_key, dlnH_dlna, omega_m_a, KERNEL_PARAMS,
+                        background_partials, mu_eff_grad)
+from background import background_for
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - batched path needs NumPy
+    np = None
 
 KM_S_MPC_TO_SI = 1000.0 / (3.085677581e22)
 MPC_TO_M = 3.085677581e22
 
-def growth_rhs(ln_a, y, k_hmpc, a0, cosmo: Cosmo, beta: float):
+def growth_rhs(ln_a, y, k_hmpc, a0, cosmo: Cosmo, beta: float, mu_table=None, bg=None):
     a = math.exp(ln_a)
     D, G = y
-    dlnH_dlnA = -1.5 * cosmo.Omega_m0 / (cosmo.Omega_m0 + cosmo.Omega_L0 * a**3)
+    # Background terms from a tabulated background.Background when supplied
+    if bg is not None:
+        dlnH_dlnA, Om_a = bg.growth_terms(a)
+    else:
+        dlnH_dlnA = dlnH_dlna(a, cosmo)
+        Om_a = omega_m_a(a, cosmo)
     coeff = 2.0 + dlnH_dlnA
-    mu = mu_eff(a, k_hmpc, a0, cosmo, beta)
-    Om_a = cosmo.Omega_m0 / (cosmo.Omega_m0 + cosmo.Omega_L0 * a**3)
+    # Tabulated μ (ilg_table.MuTable) when supplied; exact kernel otherwise
+    mu = mu_table.mu(a, k_hmpc) if mu_table is not None else mu_eff(a, k_hmpc, a0, cosmo, beta, bg)
     Dp = G
     Gp = -coeff * G + 1.5 * Om_a * mu * D
     return (Dp, Gp)
 
-def integrate_growth(a_start=1e-3, a_end=1.0, k_hmpc=0.1, a0=1.2e-10, N=400, beta: float = 1.0):
-    cosmo = Cosmo()
+def integrate_growth(a_start=1e-3, a_end=1.0, k_hmpc=0.1, a0=1.2e-10, N=400, beta: float = 1.0, mu_table=None,
+                     cosmo: Cosmo | None = None, bg=None):
+    cosmo = bg.cosmo if bg is not None else (cosmo or Cosmo())
+    if a0 == 0.0:
+        mu_table = None  # μ ≡ 1 exactly; no table needed
     ln_a0 = math.log(a_start)
     ln_a1 = math.log(a_end)
     h = (ln_a1 - ln_a0) / N
@@ -29,16 +48,336 @@ def integrate_growth(a_start=1e-3, a_end=1.0, k_hmpc=0.1, a0=1.2e-10, N=400, bet
     G = D
     ln_a = ln_a0
     for _ in range(N):
-        k1 = growth_rhs(ln_a, (D,G), k_hmpc, a0, cosmo, beta)
-        k2 = growth_rhs(ln_a + 0.5*h, (D+0.5*h*k1[0], G+0.5*h*k1[1]), k_hmpc, a0, cosmo, beta)
-        k3 = growth_rhs(ln_a + 0.5*h, (D+0.5*h*k2[0], G+0.5*h*k2[1]), k_hmpc, a0, cosmo, beta)
-        k4 = growth_rhs(ln_a + h, (D+h*k3[0], G+h*k3[1]), k_hmpc, a0, cosmo, beta)
+        k1 = growth_rhs(ln_a, (D,G), k_hmpc, a0, cosmo, beta, mu_table, bg)
+        k2 = growth_rhs(ln_a + 0.5*h, (D+0.5*h*k1[0], G+0.5*h*k1[1]), k_hmpc, a0, cosmo, beta, mu_table, bg)
+        k3 = growth_rhs(ln_a + 0.5*h, (D+0.5*h*k2[0], G+0.5*h*k2[1]), k_hmpc, a0, cosmo, beta, mu_table, bg)
+        k4 = growth_rhs(ln_a + h, (D+h*k3[0], G+h*k3[1]), k_hmpc, a0, cosmo, beta, mu_table, bg)
         D += (h/6.0) * (k1[0] + 2*k2[0] + 2*k3[0] + k4[0])
         G += (h/6.0) * (k1[1] + 2*k2[1] + 2*k3[1] + k4[1])
         ln_a += h
     return D
 
 
+# ------------------- Forward-mode sensitivities -------------------
+#
+# For each parameter p the tangent state (S_D, S_G) = (∂D/∂p, ∂G/∂p) obeys
+#   S_D' = S_G
+#   S_G' = -(2 + dlnH/dlna) S_G - ∂_p(dlnH/dlna) G + 1.5 [∂_pΩ_m(a) μ D + Ω_m(a) ∂_pμ D + Ω_m(a) μ S_D]
+# with S = 0 at a_start (the initial D = G = a_start does not depend on p).
+# Integrating it with the same RK4 steps as (D, G) gives the exact derivative
+# of the discrete integrate_growth result (with the same ``bg``: the state and
+# μ then come from the background tables, the ∂_p terms from the closed forms).
+
+TANGENT_PARAMS = ('a0', 'beta', 'Omega_m0', 'Omega_L0', 'H0', 'h')
+
+
+def growth_rhs_tangent(ln_a, y, k_hmpc, a0, cosmo: Cosmo, beta: float, params, bg=None):
+    """RHS for y = [D, G, S_D(p1), S_G(p1), S_D(p2), ...]."""
+    a = math.exp(ln_a)
+    D, G = y[0], y[1]
+    if bg is not None:
+        dlnH_dlnA, Om_a = bg.growth_terms(a)
+    else:
+        dlnH_dlnA = dlnH_dlna(a, cosmo)
+        Om_a = omega_m_a(a, cosmo)
+    coeff = 2.0 + dlnH_dlnA
+    mu, dmu = mu_eff_grad(a, k_hmpc, a0, cosmo, beta, bg)
+    bgp = background_partials(a, cosmo)
+    out = [G, -coeff * G + 1.5 * Om_a * mu * D]
+    for i, p in enumerate(params):
+        sD, sG = y[2 + 2 * i], y[3 + 2 * i]
+        _, d_dlnh, d_om = bgp.get(p, (0.0, 0.0, 0.0))
+        out.append(sG)
+        out.append(-coeff * sG - d_dlnh * G + 1.5 * (d_om * mu * D + Om_a * dmu[p] * D + Om_a * mu * sD))
+    return out
+
+
+def integrate_growth_tangent(a_start=1e-3, a_end=1.0, k_hmpc=0.1, a0=1.2e-10, N=400, beta: float = 1.0,
+                             cosmo: Cosmo | None = None, params=TANGENT_PARAMS, bg=None):
+    """RK4 growth with sensitivities in one pass → (D, {p: ∂D/∂p}).
+
+    Uses the same steps as integrate_growth, so D agrees with it and the
+    derivatives are those of its discrete solution.  ``params`` is any subset
+    of ilg_common.KERNEL_PARAMS; density parameters vary independently.
+    """
+    cosmo = bg.cosmo if bg is not None else (cosmo or Cosmo())
+    params = tuple(params)
+    unknown = [p for p in params if p not in KERNEL_PARAMS]
+    if unknown:
+        raise ValueError(f'unknown sensitivity parameters {unknown}; choose from {KERNEL_PARAMS}')
+    h = (math.log(a_end) - math.log(a_start)) / N
+    y = [a_start, a_start] + [0.0] * (2 * len(params))
+    ln_a = math.log(a_start)
+    for _ in range(N):
+        k1 = growth_rhs_tangent(ln_a, y, k_hmpc, a0, cosmo, beta, params, bg)
+        k2 = growth_rhs_tangent(ln_a + 0.5*h, [v + 0.5*h*d for v, d in zip(y, k1)], k_hmpc, a0, cosmo, beta, params,
+                                bg)
+        k3 = growth_rhs_tangent(ln_a + 0.5*h, [v + 0.5*h*d for v, d in zip(y, k2)], k_hmpc, a0, cosmo, beta, params,
+                                bg)
+        k4 = growth_rhs_tangent(ln_a + h, [v + h*d for v, d in zip(y, k3)], k_hmpc, a0, cosmo, beta, params, bg)
+        y = [v + (h/6.0) * (d1 + 2*d2 + 2*d3 + d4) for v, d1, d2, d3, d4 in zip(y, k1, k2, k3, k4)]
+        ln_a += h
+    return y[0], {p: y[2 + 2 * i] for i, p in enumerate(params)}
+
+
+# ------------------- Adaptive Dormand–Prince 5(4) with dense output -------------------
+
+_DP_C = (0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0)
+_DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+# 5th-order minus embedded 4th-order weights (error estimate)
+_DP_E = (71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+# Hairer's 4th-order continuous extension
+_DP_D = (-12715105075/11282082432, 0.0, 87487479700/32700410799, -10690763975/1880347072,
+         701980252875/199316789632, -1453857185/822651844, 69997945/29380423)
+
+
+def integrate_growth_dense(a_out, a_start=1e-3, k_hmpc=0.1, a0=1.2e-10, beta: float = 1.0, rtol=1e-8, atol=1e-10,
+                           mu_table=None, cosmo: Cosmo | None = None, h_init=None, max_steps=100000, bg=None):
+    """Error-controlled growth solve with dense output at every requested a.
+
+    One trajectory from a_start serves all of ``a_out`` (any order).  Returns a
+    dict with D and G at ``a_out`` plus the work done: accepted steps, rejected
+    steps and RHS evaluations ('nfev'; fixed-step RK4 costs 4·N per a_end).
+    """
+    cosmo = bg.cosmo if bg is not None else (cosmo or Cosmo())
+    if a0 == 0.0:
+        mu_table = None
+    a_out = [float(a) for a in a_out]
+    targets = sorted(set(math.log(a) for a in a_out))
+    if targets and targets[0] < math.log(a_start):
+        raise ValueError('requested a precedes a_start')
+
+    def f(t, y):
+        return growth_rhs(t, y, k_hmpc, a0, cosmo, beta, mu_table, bg)
+
+    t = math.log(a_start)
+    t_end = targets[-1] if targets else t
+    y = (a_start, a_start)
+    k1 = f(t, y)
+    nfev = 1
+    h = h_init if h_init is not None else 0.05
+    steps = rejected = 0
+    dense = {}
+    ti = 0
+    while ti < len(targets) and targets[ti] <= t:
+        dense[targets[ti]] = y
+        ti += 1
+    while ti < len(targets):
+        if steps + rejected >= max_steps:
+            raise RuntimeError(f'integrate_growth_dense: exceeded max_steps={max_steps}')
+        h = min(h, t_end - t)
+        ks = [k1]
+        for i in range(1, 7):
+            row = _DP_A[i]
+            yi = tuple(y[m] + h * sum(row[j] * ks[j][m] for j in range(i)) for m in range(2))
+            ks.append(f(t + _DP_C[i] * h, yi))
+        nfev += 6
+        y_new = yi  # stage 7 abscissa/weights equal the 5th-order solution (FSAL)
+        err = 0.0
+        for m in range(2):
+            e = h * sum(_DP_E[j] * ks[j][m] for j in range(7))
+            sc = atol + rtol * max(abs(y[m]), abs(y_new[m]))
+            err += (e / sc) ** 2
+        err = math.sqrt(err / 2.0)
+        if err <= 1.0:
+            steps += 1
+            t_new = t + h
+            # Dense output on [t, t+h] for every target that falls inside
+            while ti < len(targets) and targets[ti] <= t_new + 1e-14:
+                theta = (targets[ti] - t) / h
+                th1 = 1.0 - theta
+                vals = []
+                for m in range(2):
+                    ydiff = y_new[m] - y[m]
+                    bspl = h * ks[0][m] - ydiff
+                    r4 = ydiff - h * ks[6][m] - bspl
+                    r5 = h * sum(_DP_D[j] * ks[j][m] for j in range(7))
+                    vals.append(y[m] + theta * (ydiff + th1 * (bspl + theta * (r4 + th1 * r5))))
+                dense[targets[ti]] = tuple(vals)
+                ti += 1
+            t, y, k1 = t_new, y_new, ks[6]
+            fac = 10.0 if err == 0.0 else min(10.0, max(0.2, 0.9 * err ** -0.2))
+        else:
+            rejected += 1
+            fac = max(0.2, 0.9 * err ** -0.2)
+        h *= fac
+    D = [dense[math.log(a)][0] for a in a_out]
+    G = [dense[math.log(a)][1] for a in a_out]
+    return {'a': a_out, 'D': D, 'G': G, 'steps': steps, 'rejected': rejected, 'nfev': nfev}
+
+
+# ------------------- ΛCDM reference growth cache -------------------
+#
+# With a0 = 0, μ ≡ 1 exactly and D no longer depends on k, so the reference
+# curve is solved once per (Cosmo, a_start, integrator settings) and reused for
+# every k and every ILG/ΛCDM ratio.  Entries live in memory and in a JSON file
+# under ilg_common.cache_dir(); values are stored per a_end because the
+# fixed-step result depends on the step size.
+
+_LCDM_CACHE = {}
+# bump when growth_rhs or the integrators change, so stale on-disk entries are not reused
+LCDM_CACHE_VERSION = 1
+
+
+def _lcdm_key(cosmo: Cosmo, a_start, method, N, rtol, atol, bg=None):
+    settings = {'N': N} if method == 'rk4' else {'rtol': rtol, 'atol': atol}
+    if bg is not None:
+        settings['background'] = [bg.lna_min, bg.lna_max, bg.n]
+    return params_key('lcdm_growth', version=LCDM_CACHE_VERSION, cosmo=cosmo, a_start=a_start, method=method,
+                      **settings)
+
+
+def lcdm_growth_many(a_list, a_start=1e-3, cosmo: Cosmo | None = None, N=400, method='rk4',
+                     rtol=1e-8, atol=1e-10, persist=True, bg=None):
+    """Reference ΛCDM D(a) at each a in ``a_list`` (cached in memory and on disk)."""
+    cosmo = bg.cosmo if bg is not None else (cosmo or Cosmo())
+    key = _lcdm_key(cosmo, a_start, method, N, rtol, atol, bg)
+    path = cache_dir() / f'lcdm_growth_{key}.json' if persist else None
+    entry = _LCDM_CACHE.get(key)
+    if entry is None:
+        entry = {}
+        if path is not None and path.exists():
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f).get('D', {})
+            except (OSError, ValueError):
+                entry = {}
+        _LCDM_CACHE[key] = entry
+    missing = sorted({float(a) for a in a_list if repr(float(a)) not in entry})
+    if missing:
+        if method == 'rk4':
+            for a in missing:
+                entry[repr(a)] = integrate_growth(a_start=a_start, a_end=a, a0=0.0, N=N, cosmo=cosmo, bg=bg)
+        else:
+            sol = integrate_growth_dense(missing, a_start=a_start, a0=0.0, rtol=rtol, atol=atol, cosmo=cosmo,
+                                         bg=bg)
+            for a, D in zip(missing, sol['D']):
+                entry[repr(a)] = D
+        if path is not None:
+            tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp, 'w') as f:
+                json.dump({'version': LCDM_CACHE_VERSION, 'cosmo': asdict(cosmo), 'a_start': a_start, 'method': method,
+                           'D': entry}, f)
+            os.replace(tmp, path)
+    return [entry[repr(float(a))] for a in a_list]
+
+
+def lcdm_growth(a_end=1.0, **kwargs):
+    """Reference ΛCDM D(a_end); see lcdm_growth_many for the cache keys."""
+    return lcdm_growth_many([a_end], **kwargs)[0]
+
+
+# ------------------- Batched growth (NumPy) -------------------
+
+def _ensemble_column(v, n):
+    v = np.atleast_1d(np.asarray(v, dtype=float))
+    return np.broadcast_to(v, (n,))[:, None]
+
+
+def growth_rhs_batch(ln_a, y, k_row, a0_col, cs: Cosmo, beta_col, mu_table=None, bg=None):
+    """Vectorized growth_rhs: y has shape (n_cosmo, n_k, 2); cs is a stacked Cosmo.
+
+    ``bg`` (a background.Background) replaces the closed-form background terms
+    when every row of ``cs`` is its cosmology.
+    """
+    a = math.exp(ln_a)
+    D = y[..., 0]
+    G = y[..., 1]
+    if bg is not None:
+        dlnH_dlnA, Om_a = bg.growth_terms(a)
+    else:
+        dlnH_dlnA = dlnH_dlna(a, cs)
+        Om_a = omega_m_a(a, cs)
+    coeff = 2.0 + dlnH_dlnA
+    if mu_table is not None:
+        mu = mu_table.lookup_grid(np.full(k_row.shape, a), k_row)[0]
+    else:
+        mu = mu_eff_grid(a, k_row, a0_col, cs, beta_col, bg)[0]
+    out = np.empty_like(y)
+    out[..., 0] = G
+    out[..., 1] = -coeff * G + 1.5 * Om_a * mu * D
+    return out
+
+
+def integrate_growth_batch(ks, cosmos=None, a0=1.2e-10, beta: float = 1.0, a_start=1e-3, a_end=1.0, N=400,
+                           mu_table=None, return_state=False, a_out=None, bg=None):
+    """RK4 growth for every (cosmology, k) pair in one loop.
+
+    ``cosmos`` is a Cosmo or a sequence of them; ``a0`` and ``beta`` may be
+    scalars or per-cosmology sequences (length-1 inputs broadcast).  The state
+    carried through the loop has shape (n_cosmo, n_k, 2).  Returns D with shape
+    (n_cosmo, n_k), or the full final state when ``return_state`` is set.
+
+    With ``a_out`` (increasing scale factors in [a_start, a_end]) D is instead
+    returned at each of them, shape (n_cosmo, n_k, n_a), by cubic Hermite
+    interpolation between RK4 steps (D' = G is part of the state).
+
+    ``bg`` (a background.Background) supplies the background terms from its
+    tables; it serves a single cosmology, which is then the default ``cosmos``.
+    """
+    if np is None:
+        raise RuntimeError('integrate_growth_batch requires NumPy; use integrate_growth per k instead')
+    if cosmos is None:
+        cosmos = [bg.cosmo if bg is not None else Cosmo()]
+    elif isinstance(cosmos, Cosmo):
+        cosmos = [cosmos]
+    if bg is not None and any(c != bg.cosmo for c in cosmos):
+        raise ValueError('a Background serves a single Cosmo; pass bg=None for a cosmology ensemble')
+    n_c = max(len(cosmos), np.size(a0), np.size(beta))
+    if len(cosmos) == 1:
+        cosmos = list(cosmos) * n_c
+    cs = stack_cosmos(cosmos)
+    a0_col = _ensemble_column(a0, n_c)
+    beta_col = _ensemble_column(beta, n_c)
+    if mu_table is not None and not np.any(a0_col):
+        mu_table = None  # μ ≡ 1 exactly; no table needed
+    if mu_table is not None and n_c != 1:
+        raise ValueError('a μ table serves a single (a0, β, Cosmo); pass one parameter set')
+    k_row = np.atleast_1d(np.asarray(ks, dtype=float))[None, :]
+
+    ln_a = math.log(a_start)
+    h = (math.log(a_end) - ln_a) / N
+    y = np.empty((n_c, k_row.shape[1], 2))
+    y[..., 0] = a_start
+    y[..., 1] = a_start
+    if a_out is not None:
+        ln_out = np.log(np.atleast_1d(np.asarray(a_out, dtype=float)))
+        if np.any(np.diff(ln_out) < 0) or ln_out[0] < ln_a - 1e-12 or ln_out[-1] > math.log(a_end) + 1e-12:
+            raise ValueError('a_out must be increasing and inside [a_start, a_end]')
+        out = np.empty(y.shape[:2] + (len(ln_out),))
+        j = 0
+        while j < len(ln_out) and ln_out[j] <= ln_a:
+            out[..., j] = y[..., 0]
+            j += 1
+    for _ in range(N):
+        if a_out is not None:
+            y_prev = y.copy()
+        k1 = growth_rhs_batch(ln_a, y, k_row, a0_col, cs, beta_col, mu_table, bg)
+        k2 = growth_rhs_batch(ln_a + 0.5*h, y + 0.5*h*k1, k_row, a0_col, cs, beta_col, mu_table, bg)
+        k3 = growth_rhs_batch(ln_a + 0.5*h, y + 0.5*h*k2, k_row, a0_col, cs, beta_col, mu_table, bg)
+        k4 = growth_rhs_batch(ln_a + h, y + h*k3, k_row, a0_col, cs, beta_col, mu_table, bg)
+        y += (h/6.0) * (k1 + 2*k2 + 2*k3 + k4)
+        ln_a += h
+        if a_out is not None:
+            while j < len(ln_out) and ln_out[j] <= ln_a + 1e-12:
+                t = min(max((ln_out[j] - (ln_a - h)) / h, 0.0), 1.0)
+                t2, t3 = t * t, t * t * t
+                out[..., j] = ((2*t3 - 3*t2 + 1) * y_prev[..., 0] + (t3 - 2*t2 + t) * h * y_prev[..., 1]
+                               + (-2*t3 + 3*t2) * y[..., 0] + (t3 - t2) * h * y[..., 1])
+                j += 1
+    if a_out is not None:
+        return out
+    return y if return_state else y[..., 0]
+
+
 # ------------------- ILG a0 from canonical schedule -------------------
 
 
@@ -53,7 +392,16 @@ if __name__ == '__main__':
     parser.add_argument('--beta', type=float, default=None, help='Override scale proxy factor in a_char. If omitted, uses gating-derived β_gates=(T*N_gates)/S.')
     parser.add_argument('--write-json', type=str, default=None, help='If set, write demo JSON to this path (e.g., ../docs/demo_results.json).')
     parser.add_argument('--normalise', action='store_true', help='Report growth normalised to LCDM at a_end (ratios ~1).')
+    parser.add_argument('--mu-table', action='store_true', help='Evaluate μ from the cached interpolation table (scripts/ilg_table.py) instead of the exact kernel.')
+    parser.add_argument('--mu-table-tol', type=float, default=1e-5, help='Max interpolation error of the μ table.')
+    parser.add_argument('--method', choices=['rk4', 'dopri'], default='rk4', help='rk4: fixed --steps per a_end; dopri: adaptive Dormand–Prince with dense output (one trajectory per k).')
+    parser.add_argument('--rtol', type=float, default=1e-8, help='Relative tolerance for --method dopri.')
+    parser.add_argument('--atol', type=float, default=1e-10, help='Absolute tolerance for --method dopri.')
+    parser.add_argument('--sensitivities', action='store_true', help='Also print ∂ln D_ILG/∂ln p at a_end from the tangent equations.')
     args = parser.parse_args()
+    if args.sensitivities and (args.method != 'rk4' or args.mu_table):
+        # the tangent pass differentiates the fixed-step RK4 solve with the exact kernel
+        parser.error('--sensitivities requires --method rk4 without --mu-table')
 
     if args.kappa is None:
         kappa = kappa_for_target_a0(args.a0_target)
@@ -67,11 +415,49 @@ if __name__ == '__main__':
     beta_gates = gating_beta()
     beta = args.beta if args.beta is not None else beta_gates
 
+    # one tabulated background for every solve below
+    bg = background_for(Cosmo())
+    mu_table = None
+    if args.mu_table:
+        from ilg_table import load_or_build_mu_table
+        mu_table = load_or_build_mu_table(a0, beta, bg.cosmo, a_min=min(1e-4, args.a_start), tol=args.mu_table_tol)
+        print(f"μ table: {'loaded from cache' if mu_table.from_cache else 'built'} ({mu_table.n_a}×{mu_table.n_k}, max error {mu_table.max_error:.2e})")
+
+    def growth_pair(a_start, a_end, ks):
+        """(D_LCDM, D_ILG) lists over ks; one batched solve when NumPy is present."""
+        std = [lcdm_growth(a_end, a_start=a_start, N=args.steps, bg=bg)] * len(ks)
+        if np is not None:
+            ilg = integrate_growth_batch(ks, a0=a0, beta=beta, a_start=a_start, a_end=a_end, N=args.steps, mu_table=mu_table,
+                                         bg=bg)[0]
+            return std, ilg.tolist()
+        ilg = [integrate_growth(a_start=a_start, a_end=a_end, k_hmpc=k, a0=a0, N=args.steps, beta=beta, mu_table=mu_table,
+                                bg=bg) for k in ks]
+        return std, ilg
+
+    work = {'solves': 0, 'steps': 0, 'rejected': 0, 'nfev': 0}
+
+    def dense_pairs(a_start, a_list, ks):
+        """{a: (D_LCDM list, D_ILG list)} from one adaptive trajectory per (k, model)."""
+        std = lcdm_growth_many(a_list, a_start=a_start, method='dopri', rtol=args.rtol, atol=args.atol, bg=bg)
+        out = {a: ([D] * len(ks), []) for a, D in zip(a_list, std)}
+        for k in ks:
+            sol = integrate_growth_dense(a_list, a_start=a_start, k_hmpc=k, a0=a0, beta=beta,
+                                         rtol=args.rtol, atol=args.atol, mu_table=mu_table, bg=bg)
+            for a, D in zip(a_list, sol['D']):
+                out[a][1].append(D)
+            work['solves'] += 1
+            for key in ('steps', 'rejected', 'nfev'):
+                work[key] += sol[key]
+        return out
+
+    def growth_pairs(a_start, a_list, ks):
+        if args.method == 'dopri':
+            return dense_pairs(a_start, a_list, ks)
+        return {a: growth_pair(a_start, a, ks) for a in a_list}
+
     ks = [float(s) for s in args.ks.split(',') if s]
     results = []
-    for k in ks:
-        D_std = integrate_growth(a_start=args.a_start, a_end=args.a_end, k_hmpc=k, a0=0.0, N=args.steps, beta=beta)
-        D_ilg = integrate_growth(a_start=args.a_start, a_end=args.a_end, k_hmpc=k, a0=a0, N=args.steps, beta=beta)
+    for k, D_std, D_ilg in zip(ks, *growth_pairs(args.a_start, [args.a_end], ks)[args.a_end]):
         if args.normalise and D_std != 0.0:
             Dn_std = 1.0
             Dn_ilg = D_ilg / D_std
@@ -89,14 +475,22 @@ if __name__ == '__main__':
     for r in results:
         print(f"k={r['k']:5.2f}  D_LCDM={r['D_LCDM']:.6f}  D_ILG={r['D_ILG']:.6f}  ratio={r['ratio']:.5f}")
 
+    if args.sensitivities:
+        print('∂ln D_ILG/∂ln p at a_end (tangent equations, one pass per k):')
+        for k in ks:
+            D, dD = integrate_growth_tangent(args.a_start, args.a_end, k, a0, args.steps, beta, bg=bg)
+            pvals = dict(asdict(bg.cosmo), a0=a0, beta=beta)
+            print(f"k={k:5.2f}  " + '  '.join(f"{p}={dD[p] * pvals[p] / D:+.5f}" for p in TANGENT_PARAMS))
+
     if args.write_json:
         os.makedirs(os.path.dirname(os.path.abspath(args.write_json)), exist_ok=True)
         # Also compute a small grid over (a,k) for ILG/LCDM growth ratio
         grid = []
-        for a in [0.5, 0.7, 1.0]:
-            for k in [0.01, 0.05, 0.1, 0.2]:
-                D_std = integrate_growth(a_start=1e-3, a_end=a, k_hmpc=k, a0=0.0, N=args.steps, beta=beta)
-                D_ilg = integrate_growth(a_start=1e-3, a_end=a, k_hmpc=k, a0=a0, N=args.steps, beta=beta)
+        grid_a = [0.5, 0.7, 1.0]
+        grid_k = [0.01, 0.05, 0.1, 0.2]
+        grid_D = growth_pairs(1e-3, grid_a, grid_k)
+        for a in grid_a:
+            for k, D_std, D_ilg in zip(grid_k, *grid_D[a]):
                 ratio = (D_ilg / D_std) if D_std != 0 else float('nan')
                 z = (1.0 / a) - 1.0 if a > 0 else float('inf')
                 grid.append({'a': a, 'z': z, 'k': k, 'ratio': ratio})
@@ -114,3 +508,10 @@ if __name__ == '__main__':
         with open(args.write_json, 'w') as f:
             json.dump(payload, f, indent=2)
         print(f"Wrote demo JSON to {args.write_json}")
+
+    if args.method == 'dopri':
+        fixed = 4 * args.steps * 2 * len(ks)
+        if args.write_json:
+            fixed += 4 * args.steps * 2 * len(grid_k) * len(grid_a)
+        print(f"dopri: {work['solves']} ILG trajectories (ΛCDM reference cached), {work['steps']} steps ({work['rejected']} rejected), "
+              f"{work['nfev']} RHS evals vs {fixed} for fixed-step RK4 (N={args.steps} per a_end)")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Geometric multigrid for the ILG modified Poisson equation
+
+  ∇·(w ∇Φ) = 4πGρ
+
+on a 2D or 3D node grid with Dirichlet boundary values, using the conservative
+face-flux discretization of stencil.py (face w = mean of the two nodes).  The
+weight is either prescribed (a node array; w = 1 is plain Poisson) or the ILG
+kernel of the solution itself,
+
+  w = 1/(1+χ),  χ = a0/g,  g = |∇Φ|   (i.e. w = g/(g + a0)),
+
+in which case the problem is nonlinear and is solved with the full
+approximation scheme (FAS).  Both cases use the same FAS cycle (for a fixed w it
+reduces to the usual correction scheme):
+
+  - smoother: red-black Gauss-Seidel on the frozen face weights, with w
+    recomputed from Φ (central-difference |∇Φ|) before each sweep in kernel mode;
+  - transfers: full weighting for residuals, injection for Φ and prescribed w,
+    multilinear interpolation for corrections;
+  - coarse operators are rediscretized on each level (h doubles);
+  - V (γ = 1) or W (γ = 2) cycles down to a 3-node grid, which is smoothed to
+    convergence;
+  - the kernel weight vanishes with ∇Φ, so kernel solves start from a few
+    cycles of the Newtonian (w = 1) problem.
+
+Each cycle costs O(N); the residual history (RMS of f - ∇·(w∇Φ) over interior
+nodes) and wall time per cycle are returned.  The demo solves for a Plummer
+galaxy in kpc, km/s, M_sun units with the canonical a0, with the spherical
+ILG solution g·w(g) = g_N (see rotation_curves.py) as boundary values and
+reference.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+
+from ilg_common import compute_a0_from_kappa, kappa_for_target_a0
+from stencil import divergence, face_average
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+G_KPC = 4.300917e-6               # G in kpc (km/s)² / M_sun
+KPC_TO_M = 3.085677581e19
+ACC_SI_TO_KPC = KPC_TO_M / 1e6    # m/s² → (km/s)²/kpc
+
+
+def _inner(d: int, ax: int | None = None, sl: slice = slice(None)):
+    """Interior index in every axis, with ``sl`` on axis ``ax``."""
+    idx = [slice(1, -1)] * d
+    if ax is not None:
+        idx[ax] = sl
+    return tuple(idx)
+
+
+def kernel_weight(phi, h: float, a0: float):
+    """ILG weight w = g/(g + a0) with g = |∇Φ| at the nodes (central differences inside)."""
+    grads = np.gradient(phi, h)
+    if phi.ndim == 1:
+        grads = [grads]
+    g = np.sqrt(sum(gr * gr for gr in grads))
+    return g / (g + a0)
+
+
+def apply_operator(phi, w, h: float):
+    """∇·(w∇Φ) on the interior nodes (w = None: unit weight)."""
+    return divergence(phi, w, h)
+
+
+def residual(phi, w, f, h: float):
+    """f - ∇·(w∇Φ) as a full-size array, zero on the boundary."""
+    r = np.zeros_like(phi)
+    inner = _inner(phi.ndim)
+    r[inner] = f[inner] - apply_operator(phi, w, h)
+    return r
+
+
+_PARITY = {}
+
+
+def _parity(shape):
+    """Red/black masks of the interior nodes of ``shape``."""
+    if shape not in _PARITY:
+        s = sum(np.indices(tuple(n - 2 for n in shape)).astype(np.int8))
+        red = (s % 2) == 0
+        _PARITY[shape] = (red, ~red)
+    return _PARITY[shape]
+
+
+def gauss_seidel(phi, w, f, h: float, sweeps: int = 1):
+    """Red-black Gauss-Seidel sweeps for ∇·(w∇Φ) = f with fixed w, in place."""
+    d = phi.ndim
+    inner = _inner(d)
+    wf = [np.ones([n - (a == ax) for a, n in enumerate(phi.shape)]) if w is None else face_average(w, ax)
+          for ax in range(d)]
+    lo = [wf[ax][_inner(d, ax, slice(None, -1))] for ax in range(d)]
+    hi = [wf[ax][_inner(d, ax, slice(1, None))] for ax in range(d)]
+    diag = sum(lo) + sum(hi)
+    rhs = h * h * f[inner]
+    for _ in range(sweeps):
+        for mask in _parity(phi.shape):
+            off = np.zeros_like(diag)
+            for ax in range(d):
+                off += lo[ax] * phi[_inner(d, ax, slice(None, -2))]
+                off += hi[ax] * phi[_inner(d, ax, slice(2, None))]
+            new = (off - rhs) / diag
+            phi[inner] = np.where(mask, new, phi[inner])
+    return phi
+
+
+def restrict_full(r):
+    """Full weighting (tensor [1/4, 1/2, 1/4]) onto the every-other-node grid."""
+    for ax in range(r.ndim):
+        r = np.moveaxis(r, ax, 0)
+        c = r[::2].copy()
+        c[1:-1] = 0.25 * r[1:-2:2] + 0.5 * r[2:-1:2] + 0.25 * r[3::2]
+        r = np.moveaxis(c, 0, ax)
+    return r
+
+
+def inject(u):
+    return u[(slice(None, None, 2),) * u.ndim].copy()
+
+
+def prolong(c):
+    """Multilinear interpolation onto the grid with twice the resolution."""
+    for ax in range(c.ndim):
+        c = np.moveaxis(c, ax, 0)
+        f = np.empty((2 * c.shape[0] - 1,) + c.shape[1:])
+        f[::2] = c
+        f[1::2] = 0.5 * (c[:-1] + c[1:])
+        c = np.moveaxis(f, 0, ax)
+    return c
+
+
+class MultigridSolver:
+    """FAS multigrid for ∇·(w∇Φ) = f with Dirichlet boundary values; see the module docstring."""
+
+    def __init__(self, shape, h: float = 1.0, w=None, a0: float | None = None, cycle: str = 'V',
+                 nu1: int = 2, nu2: int = 2, coarse_sweeps: int = 10):
+        if np is None:
+            raise RuntimeError('multigrid requires NumPy')
+        shape = tuple(shape)
+        if len(shape) not in (2, 3):
+            raise ValueError('multigrid solves 2D or 3D problems')
+        if w is not None and a0 is not None:
+            raise ValueError('pass either a prescribed w or a0 for the ILG kernel, not both')
+        if cycle not in ('V', 'W'):
+            raise ValueError(f"cycle must be 'V' or 'W', got {cycle!r}")
+        levels = 0
+        n = list(shape)
+        while all((m - 1) % 2 == 0 and m > 3 for m in n):
+            n = [(m - 1) // 2 + 1 for m in n]
+            levels += 1
+        if levels == 0:
+            raise ValueError(f'grid {shape} cannot be coarsened; use 2^k+1 nodes per side')
+        self.shape, self.h, self.a0 = shape, h, a0
+        self.gamma = 1 if cycle == 'V' else 2
+        self.cycle_name = cycle
+        self.nu1, self.nu2, self.coarse_sweeps = nu1, nu2, coarse_sweeps
+        self.hs = [h * 2**l for l in range(levels + 1)]
+        self.ws = [None] * (levels + 1)
+        if w is not None:
+            w = np.asarray(w, dtype=float)
+            if w.shape != shape:
+                raise ValueError(f'w has shape {w.shape}, expected {shape}')
+            self.ws[0] = w
+            for l in range(levels):
+                self.ws[l + 1] = inject(self.ws[l])
+
+    def _w(self, level: int, phi):
+        return kernel_weight(phi, self.hs[level], self.a0) if self.a0 is not None else self.ws[level]
+
+    def _smooth(self, level: int, phi, f, sweeps: int):
+        if self.a0 is None:
+            return gauss_seidel(phi, self.ws[level], f, self.hs[level], sweeps)
+        for _ in range(sweeps):
+            gauss_seidel(phi, self._w(level, phi), f, self.hs[level], 1)
+        return phi
+
+    def _cycle(self, level: int, phi, f):
+        h = self.hs[level]
+        if level == len(self.hs) - 1:
+            return self._smooth(level, phi, f, self.coarse_sweeps)
+        self._smooth(level, phi, f, self.nu1)
+        r = residual(phi, self._w(level, phi), f, h)
+        phi_c = inject(phi)
+        base = phi_c.copy()
+        hc = self.hs[level + 1]
+        inner_c = _inner(phi_c.ndim)
+        f_c = restrict_full(r)
+        f_c[inner_c] += apply_operator(phi_c, self._w(level + 1, phi_c), hc)
+        for _ in range(self.gamma):
+            self._cycle(level + 1, phi_c, f_c)
+        phi += prolong(phi_c - base)
+        return self._smooth(level, phi, f, self.nu2)
+
+    def residual_norm(self, phi, f) -> float:
+        r = residual(phi, self._w(0, phi), f, self.h)
+        return float(np.sqrt(np.mean(r[_inner(phi.ndim)]**2)))
+
+    def solve(self, f, phi0, tol: float = 1e-8, max_cycles: int = 30) -> tuple:
+        """Cycle until the RMS residual drops by ``tol`` → (Φ, info with residual history and timings)."""
+        f = np.asarray(f, dtype=float)
+        phi = np.array(phi0, dtype=float)
+        if f.shape != self.shape or phi.shape != self.shape:
+            raise ValueError(f'f and phi0 must have shape {self.shape}')
+        warm = 0
+        if self.a0 is not None:
+            # w = g/(g + a0) vanishes where ∇Φ does, so start from the Newtonian (w = 1) solution
+            phi, pre = MultigridSolver(self.shape, self.h, cycle=self.cycle_name).solve(f, phi, 1e-3, max_cycles)
+            warm = pre['cycles']
+        history = [self.residual_norm(phi, f)]
+        seconds = []
+        for _ in range(max_cycles):
+            t0 = time.perf_counter()
+            self._cycle(0, phi, f)
+            seconds.append(time.perf_counter() - t0)
+            history.append(self.residual_norm(phi, f))
+            if history[-1] <= tol * history[0]:
+                break
+        factors = [b / a for a, b in zip(history[:-1], history[1:]) if a > 0]
+        info = {
+            'shape': list(self.shape), 'levels': len(self.hs), 'cycle': self.cycle_name,
+            'nu1': self.nu1, 'nu2': self.nu2, 'mode': 'kernel' if self.a0 is not None else 'prescribed',
+            'cycles': len(seconds), 'residual_history': history,
+            'mean_factor': (history[-1] / history[0])**(1.0 / len(seconds)) if seconds and history[0] > 0 else None,
+            'last_factor': factors[-1] if factors else None,
+            'seconds_per_cycle': seconds, 'mean_seconds_per_cycle': sum(seconds) / len(seconds) if seconds else 0.0,
+            'converged': history[-1] <= tol * history[0], 'warm_start_cycles': warm,
+        }
+        return phi, info
+
+
+# ------------------- Plummer demo -------------------
+
+def plummer(dim: int, r, M: float, b: float):
+    """(ρ, M(<r)) of a Plummer sphere (3D) or its 2D analogue Σ ∝ (r² + b²)^-2."""
+    if dim == 3:
+        return 3 * M / (4 * math.pi * b**3) * (1 + r * r / b**2)**-2.5, M * r**3 / (r * r + b * b)**1.5
+    return M * b * b / (math.pi * (r * r + b * b)**2), M * r * r / (r * r + b * b)
+
+
+def spherical_phi(dim: int, r, M: float, b: float, a0: float, G: float = G_KPC, n_fine: int = 20001):
+    """Φ(r) - Φ(0) of the symmetric ILG solution: g w(g) = g_N ⇒ g = (g_N + sqrt(g_N² + 4 g_N a0))/2."""
+    rf = np.linspace(0.0, float(np.max(r)) * 1.0001, n_fine)
+    _, m = plummer(dim, rf, M, b)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gn = np.where(rf > 0, (G * m / rf**2) if dim == 3 else (2 * G * m / rf), 0.0)
+    g = gn if a0 == 0 else 0.5 * (gn + np.sqrt(gn * gn + 4 * gn * a0))
+    phi = np.concatenate([[0.0], np.cumsum(0.5 * (g[1:] + g[:-1]) * np.diff(rf))])
+    return np.interp(r, rf, phi)
+
+
+def plummer_problem(dim: int = 3, n: int = 65, box: float = 200.0, M: float = 1e11, b: float = 10.0,
+                    a0: float = 0.0, G: float = G_KPC):
+    """(f = 4πGρ, Φ boundary/reference, h) on an n^dim node grid centred on the galaxy."""
+    h = box / (n - 1)
+    x = (np.arange(n) - (n - 1) / 2) * h
+    r = np.sqrt(sum(c * c for c in np.meshgrid(*([x] * dim), indexing='ij')))
+    rho, _ = plummer(dim, r, M, b)
+    f = 4 * math.pi * G * rho
+    return f, spherical_phi(dim, r, M, b, a0, G), h
+
+
+def boundary_only(phi_ref):
+    phi0 = np.zeros_like(phi_ref)
+    inner = _inner(phi_ref.ndim)
+    phi0[...] = phi_ref
+    phi0[inner] = 0.0
+    return phi0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multigrid solve of ∇·(w∇Φ) = 4πGρ for a Plummer galaxy.')
+    parser.add_argument('--dim', type=int, default=3, choices=(2, 3))
+    parser.add_argument('--n', type=int, default=65, help='Nodes per side (2^k + 1).')
+    parser.add_argument('--box', type=float, default=200.0, help='Box side [kpc].')
+    parser.add_argument('--mass', type=float, default=1e11, help='Galaxy mass [M_sun].')
+    parser.add_argument('--b', type=float, default=10.0, help='Plummer scale length [kpc].')
+    parser.add_argument('--mode', choices=('kernel', 'prescribed', 'newton'), default='kernel',
+                        help='w from the ILG kernel (FAS), prescribed from the Newtonian field, or w = 1.')
+    parser.add_argument('--cycle', choices=('V', 'W'), default='V')
+    parser.add_argument('--tol', type=float, default=1e-8)
+    parser.add_argument('--max-cycles', type=int, default=30)
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--write-json', type=str, default=None)
+    args = parser.parse_args()
+
+    a0 = compute_a0_from_kappa(kappa_for_target_a0(args.a0_target)) * ACC_SI_TO_KPC
+    ilg = args.mode != 'newton'
+    f, phi_ref, h = plummer_problem(args.dim, args.n, args.box, args.mass, args.b, a0 if ilg else 0.0)
+    w = None
+    if args.mode == 'prescribed':
+        _, phi_n, _ = plummer_problem(args.dim, args.n, args.box, args.mass, args.b, 0.0)
+        w = kernel_weight(phi_n, h, a0)
+    solver = MultigridSolver(f.shape, h, w=w, a0=a0 if args.mode == 'kernel' else None, cycle=args.cycle)
+    phi, info = solver.solve(f, boundary_only(phi_ref), args.tol, args.max_cycles)
+    span = float(phi_ref.max() - phi_ref.min())
+    info['a0_kpc'] = a0
+    info['max_abs_dev_from_spherical'] = float(np.abs(phi - phi_ref).max()) if args.mode != 'prescribed' else None
+    for i, r in enumerate(info['residual_history']):
+        t = f"  {info['seconds_per_cycle'][i - 1]:.3f}s" if i else ''
+        print(f'cycle {i:2d}  rms residual {r:.3e}{t}')
+    print(f"{args.mode} {args.cycle}-cycle on {args.n}^{args.dim}: {info['cycles']} cycles, "
+          f"mean factor {info['mean_factor']:.3f}, {info['mean_seconds_per_cycle']:.3f}s/cycle")
+    if info['max_abs_dev_from_spherical'] is not None:
+        print(f"max |Φ - Φ_spherical| / span = {info['max_abs_dev_from_spherical'] / span:.2e}")
+    if args.write_json:
+        with open(args.write_json, 'w') as fh:
+            json.dump(info, fh, indent=2)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable parameter sweeps of the ILG growth ratio and lensing Σ.
+
+A sweep is a set of parameter points over κ, β and Cosmo fields (Omega_m0, H0,
+...), built either as a Cartesian grid or a Latin hypercube.  Points are split
+into fixed chunks that are evaluated across a process pool; every finished chunk
+is written to <out>/chunks/chunk_NNNNN.jsonl straight away, so an interrupted
+run restarted with the same spec and --out resumes with the missing chunks only.
+
+Per point we report, at every (a, k) in the output grid,
+  ratio = D_ILG / D_LCDM   and   Sigma = μ(a,k).
+
+Parameter specs (``--param name=spec``, repeatable, or a JSON spec file):
+  lin:lo:hi:n   n values, linear spacing        (grid mode)
+  log:lo:hi:n   n values, logarithmic spacing   (grid mode)
+  list:v1,v2,.. explicit values                 (grid mode)
+  lo:hi         sampling range                  (lhs mode; log:lo:hi samples ln-uniformly)
+Unswept parameters take canonical values: κ from kappa_for_target_a0(1.2e-10),
+β = gating_beta(), Cosmo() defaults.  Sweeping Omega_m0 keeps Omega_L0 = 1 - Ω_m0 - Ω_r0 - Ω_k0
+and sweeping H0 keeps h = H0/100 unless those are swept explicitly.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+from pathlib import Path
+
+from ilg_common import Cosmo, compute_a0_from_kappa, gating_beta, kappa_for_target_a0, mu_eff, mu_eff_grid, stack_cosmos
+from linear_growth_demo import integrate_growth, integrate_growth_batch, lcdm_growth_many
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - scalar fallback below
+    np = None
+
+COSMO_FIELDS = [f.name for f in fields(Cosmo)]
+PARAMS = ['kappa', 'beta'] + COSMO_FIELDS
+
+
+# ------------------- Spec → points -------------------
+
+def parse_param(text: str):
+    """'name=spec' → (name, spec dict)."""
+    name, _, spec = text.partition('=')
+    name = name.strip()
+    if name not in PARAMS:
+        raise ValueError(f'unknown sweep parameter {name!r}; choose from {PARAMS}')
+    kind, _, rest = spec.partition(':')
+    if kind in ('lin', 'log'):
+        parts = rest.split(':')
+        if len(parts) == 2:
+            return name, {'kind': 'range', 'lo': float(parts[0]), 'hi': float(parts[1]), 'log': kind == 'log'}
+        lo, hi, n = parts
+        return name, {'kind': kind, 'lo': float(lo), 'hi': float(hi), 'n': int(n)}
+    if kind == 'list':
+        return name, {'kind': 'list', 'values': [float(v) for v in rest.split(',') if v]}
+    lo, hi = float(kind), float(rest)
+    return name, {'kind': 'range', 'lo': lo, 'hi': hi}
+
+
+def axis_values(spec: dict):
+    kind = spec['kind']
+    if kind == 'list':
+        return list(spec['values'])
+    if kind == 'range':
+        raise ValueError('lo:hi ranges are for --mode lhs; use lin:/log:/list: in grid mode')
+    lo, hi, n = spec['lo'], spec['hi'], spec['n']
+    if n == 1:
+        return [lo]
+    if kind == 'lin':
+        return [lo + (hi - lo) * i / (n - 1) for i in range(n)]
+    return [math.exp(math.log(lo) + (math.log(hi) - math.log(lo)) * i / (n - 1)) for i in range(n)]
+
+
+def n_points(spec: dict) -> int:
+    if spec['mode'] == 'lhs':
+        return spec['samples']
+    n = 1
+    for p in spec['params'].values():
+        n *= len(axis_values(p))
+    return n
+
+
+_LHS_CACHE = {}
+
+
+def build_points(spec: dict, start: int, stop: int):
+    """Points [start, stop) of the sweep, deterministic for a given spec."""
+    names = sorted(spec['params'])
+    if spec['mode'] == 'grid':
+        axes = [axis_values(spec['params'][n]) for n in names]
+        out = []
+        for idx in range(start, stop):
+            pt = {}
+            rem = idx
+            for name, ax in zip(reversed(names), reversed(axes)):
+                rem, r = divmod(rem, len(ax))
+                pt[name] = ax[r]
+            out.append(pt)
+        return out
+    # Latin hypercube: one stratified permutation per parameter, fixed by seed
+    key = json.dumps(spec, sort_keys=True)
+    if key in _LHS_CACHE:
+        return _LHS_CACHE[key][start:stop]
+    n = spec['samples']
+    rng = random.Random(spec.get('seed', 0))
+    cols = {}
+    for name in names:
+        p = spec['params'][name]
+        perm = list(range(n))
+        rng.shuffle(perm)
+        u = [(perm[i] + rng.random()) / n for i in range(n)]
+        if p.get('log'):
+            cols[name] = [math.exp(math.log(p['lo']) + (math.log(p['hi']) - math.log(p['lo'])) * v) for v in u]
+        else:
+            cols[name] = [p['lo'] + (p['hi'] - p['lo']) * v for v in u]
+    _LHS_CACHE[key] = [{name: cols[name][i] for name in names} for i in range(n)]
+    return _LHS_CACHE[key][start:stop]
+
+
+def resolve(pt: dict):
+    """Parameter point → (a0, β, Cosmo) with canonical defaults filled in."""
+    kappa = pt.get('kappa', kappa_for_target_a0(1.2e-10))
+    beta = pt.get('beta', gating_beta())
+    c = {k: v for k, v in pt.items() if k in COSMO_FIELDS}
+    if 'Omega_m0' in c and 'Omega_L0' not in c:
+        c['Omega_L0'] = 1.0 - c['Omega_m0'] - c.get('Omega_r0', 0.0) - c.get('Omega_k0', 0.0)
+    if 'H0' in c and 'h' not in c:
+        c['h'] = c['H0'] / 100.0
+    return compute_a0_from_kappa(kappa), beta, Cosmo(**c)
+
+
+# ------------------- Chunk evaluation (runs in workers) -------------------
+
+def evaluate_chunk(spec: dict, chunk: int):
+    cs = spec['chunk_size']
+    start = chunk * cs
+    stop = min(start + cs, n_points(spec))
+    pts = build_points(spec, start, stop)
+    resolved = [resolve(p) for p in pts]
+    a_out, ks, steps = spec['a'], spec['k'], spec['steps']
+    a0s = [r[0] for r in resolved]
+    betas = [r[1] for r in resolved]
+    cosmos = [r[2] for r in resolved]
+    ratio = [[[0.0] * len(ks) for _ in a_out] for _ in pts]
+    sigma = [[[0.0] * len(ks) for _ in a_out] for _ in pts]
+    same_cosmo = all(c == cosmos[0] for c in cosmos)
+    for ia, a in enumerate(a_out):
+        # ΛCDM reference: the shared cache when the background is fixed, one
+        # k-independent batched solve per chunk when the cosmology is swept
+        if same_cosmo:
+            ref = lcdm_growth_many([a], a_start=spec['a_start'], cosmo=cosmos[0], N=steps) * len(cosmos)
+        elif np is not None:
+            ref = integrate_growth_batch([1.0], cosmos, a0=0.0, a_start=spec['a_start'], a_end=a, N=steps)[:, 0].tolist()
+        else:
+            ref = [lcdm_growth_many([a], a_start=spec['a_start'], cosmo=c, N=steps, persist=False)[0] for c in cosmos]
+        if np is not None:
+            D = integrate_growth_batch(ks, cosmos, a0=a0s, beta=betas, a_start=spec['a_start'], a_end=a, N=steps)
+            mu = mu_eff_grid(a, np.asarray(ks)[None, :], np.asarray(a0s)[:, None], stack_cosmos(cosmos),
+                             np.asarray(betas)[:, None])[0]
+            for i in range(len(pts)):
+                ratio[i][ia] = (D[i] / ref[i]).tolist()
+                sigma[i][ia] = mu[i].tolist()
+        else:
+            for i, (a0, beta, c) in enumerate(resolved):
+                for ik, k in enumerate(ks):
+                    D = integrate_growth(a_start=spec['a_start'], a_end=a, k_hmpc=k, a0=a0, N=steps, beta=beta, cosmo=c)
+                    ratio[i][ia][ik] = D / ref[i]
+                    sigma[i][ia][ik] = mu_eff(a, k, a0, c, beta)
+    rows = []
+    for i, pt in enumerate(pts):
+        rows.append({'index': start + i, 'params': pt, 'a0': a0s[i], 'beta': betas[i],
+                     'ratio': ratio[i], 'Sigma': sigma[i]})
+    return chunk, rows
+
+
+# ------------------- Driver -------------------
+
+def run_sweep(spec: dict, out_dir, workers=None, log=print):
+    """Evaluate every missing chunk of ``spec`` into ``out_dir``; returns stats."""
+    out = Path(out_dir)
+    chunks_dir = out / 'chunks'
+    chunks_dir.mkdir(parents=True, exist_ok=True)
+    manifest = out / 'manifest.json'
+    if manifest.exists():
+        with open(manifest, 'r') as f:
+            old = json.load(f)
+        if old.get('spec') != spec:
+            raise ValueError(f'{manifest} was written for a different spec; use a fresh --out directory')
+    else:
+        with open(manifest, 'w') as f:
+            json.dump({'spec': spec, 'n_points': n_points(spec)}, f, indent=2)
+
+    total = n_points(spec)
+    n_chunks = (total + spec['chunk_size'] - 1) // spec['chunk_size']
+    todo = [c for c in range(n_chunks) if not (chunks_dir / f'chunk_{c:05d}.jsonl').exists()]
+    log(f'sweep: {total} points in {n_chunks} chunks; {n_chunks - len(todo)} already done, {len(todo)} to run')
+    t0 = time.time()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_chunk, spec, c) for c in todo]
+        for fut in as_completed(futures):
+            chunk, rows = fut.result()
+            path = chunks_dir / f'chunk_{chunk:05d}.jsonl'
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w') as f:
+                for r in rows:
+                    f.write(json.dumps(r) + '\n')
+            os.replace(tmp, path)
+            done += len(rows)
+            log(f'  chunk {chunk} done ({done} points this run, {done / max(time.time() - t0, 1e-9):.1f} pts/s)')
+    return {'points': total, 'chunks': n_chunks, 'ran_chunks': len(todo), 'seconds': time.time() - t0}
+
+
+def merge_results(out_dir):
+    """Concatenate chunk files (in chunk order) into <out>/results.jsonl."""
+    out = Path(out_dir)
+    dest = out / 'results.jsonl'
+    with open(dest, 'w') as f:
+        for path in sorted((out / 'chunks').glob('chunk_*.jsonl')):
+            f.write(path.read_text())
+    return dest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel, resumable κ/β/Cosmo sweep of ILG growth ratio and Σ.')
+    parser.add_argument('--spec', type=str, default=None, help='JSON spec file (keys: mode, params, samples, seed, a, k, ...).')
+    parser.add_argument('--param', action='append', default=[], help='name=spec, e.g. kappa=log:1e-58:1e-57:8 or Omega_m0=0.25:0.35 (lhs).')
+    parser.add_argument('--mode', choices=['grid', 'lhs'], default='grid')
+    parser.add_argument('--samples', type=int, default=1000, help='Number of Latin-hypercube points (lhs mode).')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--as', dest='a_values', type=str, default='0.5,0.7,1.0', help='Comma-separated output scale factors.')
+    parser.add_argument('--ks', type=str, default='0.01,0.05,0.1,0.2', help='Comma-separated k values in h/Mpc.')
+    parser.add_argument('--a-start', type=float, default=1e-3)
+    parser.add_argument('--steps', type=int, default=400)
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=None, help='Process-pool size (default: all cores).')
+    parser.add_argument('--out', type=str, required=True, help='Output/checkpoint directory.')
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec, 'r') as f:
+            spec = json.load(f)
+    else:
+        spec = {'mode': args.mode, 'params': dict(parse_param(p) for p in args.param)}
+        if args.mode == 'lhs':
+            spec.update({'samples': args.samples, 'seed': args.seed})
+    spec.setdefault('a', [float(s) for s in args.a_values.split(',') if s])
+    spec.setdefault('k', [float(s) for s in args.ks.split(',') if s])
+    spec.setdefault('a_start', args.a_start)
+    spec.setdefault('steps', args.steps)
+    spec.setdefault('chunk_size', args.chunk_size)
+    if spec['mode'] == 'lhs':
+        for name, p in spec['params'].items():
+            if p['kind'] != 'range':
+                raise SystemExit(f'lhs mode needs lo:hi ranges (got {p["kind"]} for {name})')
+
+    stats = run_sweep(spec, args.out, workers=args.workers)
+    dest = merge_results(args.out)
+    print(f"Evaluated {stats['ran_chunks']} chunks in {stats['seconds']:.1f}s; merged results in {dest}")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Particle-mesh N-body with the ILG μ(a,k) in the Poisson equation.
+
+Comoving positions x [Mpc/h] and momenta p = a² dx/dt (t in 1/H0) are kept in
+contiguous float32 arrays of shape (N, 3).  With H0 = 1 the equations are
+
+  dx/da = p / (a³ E),   dp/da = -∇ϕ / (a² E),   ∇²ϕ = (3/2) Ω_m0 μ(a,k) δ
+
+so the Fourier-space Green's function -(3/2) Ω_m0 μ(a,k)/k² carries the
+modification (μ from ilg_common.mu_eff_grid with the tabulated background, on
+the mesh |k|).  Density is deposited by cloud-in-cell (vectorized bincount
+over particle chunks), forces are spectral gradients interpolated back by CIC
+(both CIC windows deconvolved in the Green's function), and the time stepper
+is kick-drift-kick on steps uniform in ln a (linear-scale growth at 40 steps is
+within ~0.5% of 100; uniform steps in a lose ~5% at 40), with kick/drift
+factors integrated over E(a).  The CLI reports that linear-scale growth error
+as the low-k P_sim/P_lin at the end relative to the same ratio of the ICs.
+
+Initial conditions are Zel'dovich displacements of a particle lattice from a
+Gaussian realisation of power_spectrum.LinearPower at a_init (the same A_s /
+σ8 normalisation and ILG growth D(k,a) as the linear code), with momenta from
+the scale-dependent growth rate f(k) = dln D/dln a.  Snapshots are written
+incrementally (tmp file + rename) and a run resumes from its last snapshot.
+
+256³ particles on a 256³ mesh need under 2 GB.  Keep the mesh at the
+particle grid (the default): finer meshes pick up the CIC lattice self-force
+unless the particles are pre-evolved.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+from background import background_for
+from ilg_common import Cosmo, compute_a0_from_kappa, gating_beta, kappa_for_target_a0, mu_eff_grid
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+CHUNK = 1 << 20  # particles per CIC pass
+
+
+# ------------------- Mesh operations -------------------
+
+def kgrid(n: int, box: float):
+    """Broadcastable (kx, ky, kz) for an rfftn mesh of n³ cells, h/Mpc."""
+    k = 2.0 * math.pi * np.fft.fftfreq(n, d=box / n)
+    kr = 2.0 * math.pi * np.fft.rfftfreq(n, d=box / n)
+    return k[:, None, None], k[None, :, None], kr[None, None, :]
+
+
+def _cic_weights(pos, n: int, box: float):
+    """Lower cell indices (int64, (m,3)) and upper-cell weights ((m,3)) for CIC."""
+    u = pos.astype(np.float64) * (n / box)
+    i0 = np.floor(u)
+    t = u - i0
+    return i0.astype(np.int64) % n, t
+
+
+def cic_deposit(pos, n: int, box: float):
+    """Mass per cell (in units of the mean) → overdensity δ on an n³ mesh."""
+    rho = np.zeros(n**3)
+    for s in range(0, len(pos), CHUNK):
+        i0, t = _cic_weights(pos[s:s + CHUNK], n, box)
+        i1 = (i0 + 1) % n
+        idx, wts = [], []
+        for cx in (0, 1):
+            ix = i1[:, 0] if cx else i0[:, 0]
+            wx = t[:, 0] if cx else 1.0 - t[:, 0]
+            for cy in (0, 1):
+                iy = i1[:, 1] if cy else i0[:, 1]
+                wy = t[:, 1] if cy else 1.0 - t[:, 1]
+                for cz in (0, 1):
+                    iz = i1[:, 2] if cz else i0[:, 2]
+                    wz = t[:, 2] if cz else 1.0 - t[:, 2]
+                    idx.append((ix * n + iy) * n + iz)
+                    wts.append(wx * wy * wz)
+        rho += np.bincount(np.concatenate(idx), weights=np.concatenate(wts), minlength=n**3)
+    rho *= n**3 / len(pos)
+    rho -= 1.0
+    return rho.reshape(n, n, n)
+
+
+def cic_interp(fields, pos, n: int, box: float):
+    """CIC-interpolate same-shaped n³ meshes to particle positions → (m, len(fields))."""
+    out = np.empty((len(pos), len(fields)), dtype=np.float32)
+    flat = [f.reshape(-1) for f in fields]
+    for s in range(0, len(pos), CHUNK):
+        i0, t = _cic_weights(pos[s:s + CHUNK], n, box)
+        i1 = (i0 + 1) % n
+        acc = np.zeros((len(i0), len(fields)))
+        for cx in (0, 1):
+            ix = i1[:, 0] if cx else i0[:, 0]
+            wx = t[:, 0] if cx else 1.0 - t[:, 0]
+            for cy in (0, 1):
+                iy = i1[:, 1] if cy else i0[:, 1]
+                wy = t[:, 1] if cy else 1.0 - t[:, 1]
+                for cz in (0, 1):
+                    iz = i1[:, 2] if cz else i0[:, 2]
+                    w = wx * wy * (t[:, 2] if cz else 1.0 - t[:, 2])
+                    j = (ix * n + iy) * n + iz
+                    for c, f in enumerate(flat):
+                        acc[:, c] += w * f[j]
+        out[s:s + CHUNK] = acc
+    return out
+
+
+def measure_power(pos, n: int, box: float, n_bins: int = 24):
+    """Shell-averaged P(k) of the particle field with the CIC window deconvolved → (k, P)."""
+    d = np.fft.rfftn(cic_deposit(pos, n, box))
+    kx, ky, kz = kgrid(n, box)
+    h = box / n
+    w = (np.sinc(kx * h / (2 * math.pi)) * np.sinc(ky * h / (2 * math.pi)) * np.sinc(kz * h / (2 * math.pi)))**2
+    p = (np.abs(d / w)**2 * (box**3 / n**6))
+    k = np.sqrt(kx * kx + ky * ky + kz * kz)
+    # rfft half space: interior kz planes stand for two modes
+    mult = np.full(kz.shape, 2.0)
+    mult[..., 0] = 1.0
+    if n % 2 == 0:
+        mult[..., -1] = 1.0
+    mult = np.broadcast_to(mult, k.shape)
+    k_f, k_nyq = 2 * math.pi / box, math.pi * n / box
+    edges = np.linspace(k_f, k_nyq, n_bins + 1)
+    b = np.digitize(k.ravel(), edges) - 1
+    ok = (b >= 0) & (b < n_bins)
+    cnt = np.bincount(b[ok], weights=mult.ravel()[ok], minlength=n_bins)
+    ks = np.bincount(b[ok], weights=(k * mult).ravel()[ok], minlength=n_bins)
+    ps = np.bincount(b[ok], weights=(p * mult).ravel()[ok], minlength=n_bins)
+    good = cnt > 0
+    return ks[good] / cnt[good], ps[good] / cnt[good]
+
+
+# ------------------- Simulation -------------------
+
+class PMSimulation:
+    """One PM run: lattice ICs, μ-modified forces and KDK steps in ln a."""
+
+    def __init__(self, n_part: int = 64, box: float = 256.0, n_mesh: int | None = None, a0: float = 1.2e-10,
+                 beta: float = 1.0, cosmo: Cosmo | None = None, a_init: float = 0.02, seed: int = 0, **pk_kwargs):
+        if np is None:
+            raise RuntimeError('pm_nbody requires NumPy')
+        if not 0.0 < a_init < 1.0:
+            raise ValueError('a_init must lie in (0, 1)')
+        self.cosmo = cosmo or Cosmo()
+        self.bg = background_for(self.cosmo)
+        self.n_part, self.box = n_part, box
+        self.n_mesh = n_mesh or n_part
+        self.a0, self.beta = a0, beta
+        self.a_init, self.seed = a_init, seed
+        self.pk_kwargs = pk_kwargs
+        kx, ky, kz = kgrid(self.n_mesh, box)
+        self._k = (kx, ky, kz)
+        k2 = (kx * kx + ky * ky + kz * kz).astype(np.float32)
+        k2[0, 0, 0] = 1.0
+        self._k2 = k2
+        # deposit and interpolation each smooth by the CIC window; undo both in the Green's function
+        h = box / self.n_mesh
+        self._w2 = ((np.sinc(kx * h / (2 * math.pi)) * np.sinc(ky * h / (2 * math.pi))
+                     * np.sinc(kz * h / (2 * math.pi)))**4).astype(np.float32)
+        self.pos = None
+        self.mom = None
+        self.a = a_init
+
+    def linear_power(self):
+        from power_spectrum import linear_power
+
+        kw = dict(self.pk_kwargs)
+        kw.setdefault('a_min', min(0.05, 0.5 * self.a_init))
+        # cover every mesh wavenumber (LinearPower raises outside its k range)
+        kw.setdefault('k_max', max(1e2, 2.0 * math.sqrt(3) * math.pi * max(self.n_part, self.n_mesh) / self.box))
+        return linear_power(self.cosmo, self.a0, self.beta, **kw)
+
+    def linear_ratio(self, n_bins: int = 3):
+        """Mean P_sim/P_lin over the n_bins lowest-k bins at the current a (linear-scale growth check)."""
+        k, p = measure_power(self.pos, self.n_mesh, self.box)
+        return float(np.mean(p[:n_bins] / self.linear_power()(k[:n_bins], self.a)))
+
+    def initial_conditions(self):
+        """Zel'dovich lattice displacements and growing-mode momenta at a_init."""
+        n, box, a = self.n_part, self.box, self.a_init
+        pk = self.linear_power()
+        kx, ky, kz = kgrid(n, box)
+        k = np.sqrt(kx * kx + ky * ky + kz * kz)
+        k[0, 0, 0] = 1.0
+        # P(k) and f(k) tabulated in ln k, then interpolated onto the mesh
+        k_tab = np.logspace(math.log10(2 * math.pi / box) - 0.1, math.log10(math.sqrt(3) * math.pi * n / box) + 0.1, 256)
+        p_tab = pk(k_tab, a)
+        dl = 1e-2
+        f_tab = (np.log(pk.growth(k_tab, a * math.exp(dl))) - np.log(pk.growth(k_tab, a * math.exp(-dl)))) / (2 * dl)
+        lnk = np.log(k)
+        amp = np.sqrt(np.interp(lnk, np.log(k_tab), p_tab) * n**3 / box**3)
+        f_k = np.interp(lnk, np.log(k_tab), f_tab)
+        rng = np.random.default_rng(self.seed)
+        delta_k = np.fft.rfftn(rng.standard_normal((n, n, n))) * amp
+        delta_k[0, 0, 0] = 0.0
+        del amp
+        q = (np.arange(n) + 0.5) * (box / n)
+        self.pos = np.empty((n**3, 3), dtype=np.float32)
+        self.mom = np.empty((n**3, 3), dtype=np.float32)
+        lattice = np.meshgrid(q, q, q, indexing='ij')
+        vfac = a * a * float(self.bg.E(a))
+        for c, kc in enumerate((kx, ky, kz)):
+            psi = np.fft.irfftn(1j * kc / (k * k) * delta_k, s=(n, n, n), axes=(0, 1, 2))
+            self.pos[:, c] = ((lattice[c] + psi) % box).ravel()
+            self.mom[:, c] = (vfac * np.fft.irfftn(1j * kc / (k * k) * f_k * delta_k, s=(n, n, n),
+                                                    axes=(0, 1, 2))).ravel()
+        self.a = a
+
+    def accelerations(self, a: float):
+        """-∇ϕ at the particles for the μ(a,k)-modified Poisson equation."""
+        n = self.n_mesh
+        d = np.fft.rfftn(cic_deposit(self.pos, n, self.box))
+        mu = mu_eff_grid(a, np.sqrt(self._k2), self.a0, self.cosmo, self.beta, bg=self.bg)[0]
+        phi = d * (-1.5 * self.cosmo.Omega_m0) * mu / (self._k2 * self._w2)
+        phi[0, 0, 0] = 0.0
+        del d, mu
+        force = [np.fft.irfftn(-1j * kc * phi, s=(n, n, n), axes=(0, 1, 2)).astype(np.float32) for kc in self._k]
+        return cic_interp(force, self.pos, n, self.box)
+
+    def _factor(self, a1: float, a2: float, power: int, m: int = 8):
+        """∫_{a1}^{a2} da / (a^power E(a)) by Simpson's rule."""
+        a = np.linspace(a1, a2, 2 * m + 1)
+        g = 1.0 / (a**power * self.bg.E(a))
+        w = np.ones(2 * m + 1)
+        w[1:-1:2], w[2:-1:2] = 4.0, 2.0
+        return float((a2 - a1) / (6 * m) * np.dot(w, g))
+
+    def step(self, a_next: float, acc=None):
+        """One KDK step a → a_next; returns the accelerations at a_next for reuse."""
+        a = self.a
+        a_half = 0.5 * (a + a_next)
+        if acc is None:
+            acc = self.accelerations(a)
+        self.mom += acc * np.float32(self._factor(a, a_half, 2))
+        self.pos += self.mom * np.float32(self._factor(a, a_next, 3))
+        np.mod(self.pos, self.box, out=self.pos)
+        acc = self.accelerations(a_next)
+        self.mom += acc * np.float32(self._factor(a_half, a_next, 2))
+        self.a = a_next
+        return acc
+
+    def config(self):
+        return {'n_part': self.n_part, 'box': self.box, 'n_mesh': self.n_mesh, 'a0': self.a0, 'beta': self.beta,
+                'a_init': self.a_init, 'seed': self.seed, 'cosmo': self.cosmo.__dict__, 'pk': self.pk_kwargs}
+
+    def run(self, a_final: float = 1.0, n_steps: int = 40, snapshots=(1.0,), out_dir=None, log=print):
+        """Integrate to a_final in n_steps steps uniform in ln a, writing snapshots at the first step ≥ each a_snap."""
+        a_steps = np.geomspace(self.a_init, a_final, n_steps + 1)
+        snap_steps = sorted({int(np.searchsorted(a_steps, s - 1e-12)) for s in snapshots if s <= a_final + 1e-12})
+        out = Path(out_dir) if out_dir is not None else None
+        step0 = 0
+        if out is not None:
+            out.mkdir(parents=True, exist_ok=True)
+            manifest = out / 'manifest.json'
+            config = dict(self.config(), a_final=a_final, n_steps=n_steps, spacing='ln a')
+            if manifest.exists():
+                with open(manifest, 'r') as f:
+                    if json.load(f) != json.loads(json.dumps(config)):
+                        raise ValueError(f'{manifest} was written for a different run; use a fresh --out directory')
+                done = sorted(out.glob('snap_*.npz'))
+                if done:
+                    with np.load(done[-1]) as snap:
+                        self.pos, self.mom = snap['pos'].copy(), snap['mom'].copy()
+                        step0 = int(snap['step'])
+                        self.a = float(a_steps[step0])
+                    log(f'resuming from {done[-1].name} (a = {self.a:.4f})')
+            else:
+                with open(manifest, 'w') as f:
+                    json.dump(config, f, indent=2)
+        if self.pos is None:
+            self.initial_conditions()
+        acc = None
+        for i in range(step0 + 1, n_steps + 1):
+            t0 = time.time()
+            acc = self.step(float(a_steps[i]), acc)
+            log(f'step {i:4d}/{n_steps}  a = {self.a:.4f}  {time.time() - t0:.2f}s')
+            if out is not None and i in snap_steps:
+                path = out / f'snap_{i:04d}.npz'
+                tmp = path.with_suffix('.tmp')
+                with open(tmp, 'wb') as f:
+                    np.savez(f, pos=self.pos, mom=self.mom, a=self.a, step=i)
+                os.replace(tmp, path)
+                log(f'wrote {path.name}')
+        return self
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PM N-body with the ILG μ(a,k) Poisson equation (canonical schedule).')
+    parser.add_argument('--kappa', type=float, default=None, help='Dimensionless geometric factor κ. If omitted, inferred from a0-target.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--beta', type=float, default=None, help='Override β. If omitted, uses gating-derived β_gates.')
+    parser.add_argument('--lcdm', action='store_true', help='Run with a0 = 0 (ΛCDM forces).')
+    parser.add_argument('--n-part', type=int, default=64, help='Particles per side (256 for a workstation run).')
+    parser.add_argument('--n-mesh', type=int, default=None, help='Mesh cells per side (default: n-part).')
+    parser.add_argument('--box', type=float, default=256.0, help='Box side [Mpc/h].')
+    parser.add_argument('--a-init', type=float, default=0.02)
+    parser.add_argument('--a-final', type=float, default=1.0)
+    parser.add_argument('--steps', type=int, default=40)
+    parser.add_argument('--snapshots', type=str, default='0.5,1.0', help='Comma-separated output scale factors.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=str, default=None, help='Snapshot directory (resumable).')
+    args = parser.parse_args()
+
+    kappa = args.kappa if args.kappa is not None else kappa_for_target_a0(args.a0_target)
+    a0 = 0.0 if args.lcdm else compute_a0_from_kappa(kappa)
+    beta = args.beta if args.beta is not None else gating_beta()
+    sim = PMSimulation(args.n_part, args.box, args.n_mesh, a0, beta, a_init=args.a_init, seed=args.seed)
+    snaps = [float(s) for s in args.snapshots.split(',') if s]
+    sim.initial_conditions()
+    ratio_ic = sim.linear_ratio()
+    t0 = time.time()
+    sim.run(args.a_final, args.steps, snaps, args.out)
+    print(f'{args.n_part}³ particles, {args.steps} steps in {time.time() - t0:.1f}s')
+    k, p = measure_power(sim.pos, sim.n_mesh, sim.box)
+    p_lin = sim.linear_power()(k, sim.a)
+    for kv, pv, pl in list(zip(k, p, p_lin))[::3]:
+        print(f'k = {kv:.4f} h/Mpc  P_sim = {pv:.4e}  P_lin = {pl:.4e}  ratio = {pv / pl:.3f}')
+    print(f'linear-scale growth error (3 lowest k bins, vs ICs): {sim.linear_ratio() / ratio_ic - 1.0:+.2%}')
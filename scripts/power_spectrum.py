@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Linear matter power spectrum with scale-dependent ILG growth.
+
+  P(k,a) = P_prim(k) · T²(k) · D_ILG²(k,a)
+
+  Δ²_ζ(k) = A_s (k/k_pivot)^(n_s-1),
+  P(k,a)  = 2π²/k³ Δ²_ζ(k) [ (2/5) (k c/H0)² / Ω_m0 · T(k) · D(k,a) ]²
+
+T(k) is the Eisenstein & Hu (1998) no-wiggle fit, tabulated once per
+(Cosmo, Ω_b, T_cmb) on a log-k grid and read back by 4-point Lagrange
+interpolation in ln k (relative error ≲ 1e-7); D(k,a) comes from the batched
+RK4 growth integration (linear_growth_demo.integrate_growth_batch), solved for
+the whole k-array at once and sampled at every requested a in the same pass.
+D is normalised as in the growth solver (D = a deep in matter domination), so
+the early-time spectrum is the standard one.  With ``sigma8`` set, A_s is
+rescaled so that σ8(a=1) hits the target.
+
+Units: k in h/Mpc, R in Mpc/h, P in (Mpc/h)³.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import astuple
+from functools import lru_cache
+
+from ilg_common import Cosmo, compute_a0_from_kappa, gating_beta, kappa_for_target_a0
+from linear_growth_demo import integrate_growth_batch
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+C_KM_S = 299_792.458
+K_PIVOT_MPC = 0.05  # 1/Mpc
+
+
+def eh_nowiggle_transfer(k_hmpc, cosmo: Cosmo, omega_b: float = 0.045, T_cmb: float = 2.7255):
+    """Eisenstein–Hu zero-baryon-oscillation transfer function, k in h/Mpc."""
+    k = np.asarray(k_hmpc, dtype=float)
+    h = cosmo.h
+    om = cosmo.Omega_m0 * h * h
+    fb = omega_b / cosmo.Omega_m0
+    theta2 = (T_cmb / 2.7)**2
+    s = 44.5 * math.log(9.83 / om) / math.sqrt(1.0 + 10.0 * (omega_b * h * h)**0.75)  # Mpc
+    alpha = 1.0 - 0.328 * math.log(431.0 * om) * fb + 0.38 * math.log(22.3 * om) * fb * fb
+    gamma_eff = cosmo.Omega_m0 * h * (alpha + (1.0 - alpha) / (1.0 + (0.43 * k * h * s)**4))
+    q = k * theta2 / gamma_eff
+    l0 = np.log(2.0 * math.e + 1.8 * q)
+    c0 = 14.2 + 731.0 / (1.0 + 62.5 * q)
+    return l0 / (l0 + c0 * q * q)
+
+
+# T(k) tables: ln T on a uniform ln k grid over TRANSFER_K_RANGE (h/Mpc)
+TRANSFER_K_RANGE = (1e-6, 1e6)
+TRANSFER_PER_DECADE = 100
+
+
+@lru_cache(maxsize=16)
+def _transfer_table(cosmo_fields: tuple, omega_b: float, T_cmb: float):
+    lo, hi = (math.log(v) for v in TRANSFER_K_RANGE)
+    n = int(round(TRANSFER_PER_DECADE * math.log10(TRANSFER_K_RANGE[1] / TRANSFER_K_RANGE[0]))) + 1
+    lnk = np.linspace(lo, hi, n)
+    lnt = np.log(eh_nowiggle_transfer(np.exp(lnk), Cosmo(*cosmo_fields), omega_b, T_cmb))
+    lnt.flags.writeable = False
+    return lo, lnk[1] - lnk[0], lnt
+
+
+def transfer(k_hmpc, cosmo: Cosmo | None = None, omega_b: float = 0.045, T_cmb: float = 2.7255):
+    """T(k) from the cached table for (Cosmo, Ω_b, T_cmb); ValueError outside TRANSFER_K_RANGE."""
+    cosmo = cosmo or Cosmo()
+    lo, h, lnt = _transfer_table(astuple(cosmo), omega_b, T_cmb)
+    u = (np.log(np.asarray(k_hmpc, dtype=float)) - lo) / h
+    if np.any(u < -1e-9) or np.any(u > len(lnt) - 1 + 1e-9):
+        raise ValueError(f'k outside the transfer table [{TRANSFER_K_RANGE[0]:g}, {TRANSFER_K_RANGE[1]:g}] h/Mpc')
+    i = np.clip(np.floor(u).astype(np.int64) - 1, 0, len(lnt) - 4)
+    t = u - i
+    w0 = -(t - 1) * (t - 2) * (t - 3) / 6.0
+    w1 = t * (t - 2) * (t - 3) / 2.0
+    w2 = -t * (t - 1) * (t - 3) / 2.0
+    w3 = t * (t - 1) * (t - 2) / 6.0
+    return np.exp(w0 * lnt[i] + w1 * lnt[i + 1] + w2 * lnt[i + 2] + w3 * lnt[i + 3])
+
+
+def linear_shape(k_hmpc, cosmo: Cosmo, n_s: float = 0.965, omega_b: float = 0.045, T_cmb: float = 2.7255):
+    """A_s- and growth-independent part of P: P(k,a) = A_s · linear_shape(k) · D²(k,a)."""
+    k = np.asarray(k_hmpc, dtype=float)
+    d_h = C_KM_S / 100.0  # c/H0 in Mpc/h
+    k_piv = K_PIVOT_MPC / cosmo.h
+    t = transfer(k, cosmo, omega_b, T_cmb)
+    return (2.0 * math.pi**2 / k**3 * (k / k_piv)**(n_s - 1.0)
+            * (0.4 * (k * d_h)**2 / cosmo.Omega_m0 * t)**2)
+
+
+def tophat_window(x):
+    """W(x) = 3 (sin x - x cos x)/x³ with the small-x series."""
+    x = np.asarray(x, dtype=float)
+    small = np.abs(x) < 1e-3
+    xs = np.where(small, 1.0, x)
+    return np.where(small, 1.0 - x * x / 10.0, 3.0 * (np.sin(xs) - xs * np.cos(xs)) / xs**3)
+
+
+def sigma_r(R, k_hmpc, pk):
+    """σ(R) by trapezoid in ln k for every radius and every spectrum at once.
+
+    ``pk`` has shape (..., n_k) on the log-spaced ``k_hmpc``; returns (..., n_R).
+    """
+    k = np.asarray(k_hmpc, dtype=float)
+    R = np.atleast_1d(np.asarray(R, dtype=float))
+    w2 = tophat_window(R[:, None] * k[None, :])**2            # (n_R, n_k)
+    lnk = np.log(k)
+    wq = np.empty_like(k)
+    wq[1:-1] = 0.5 * (lnk[2:] - lnk[:-2])
+    wq[0] = 0.5 * (lnk[1] - lnk[0])
+    wq[-1] = 0.5 * (lnk[-1] - lnk[-2])
+    d2 = np.asarray(pk) * (k**3 / (2.0 * math.pi**2) * wq)   # (..., n_k)
+    return np.sqrt(d2 @ w2.T)
+
+
+class LinearPower:
+    """P(k,a) on a (k, a) grid for one parameter set, interpolable elsewhere."""
+
+    def __init__(self, cosmo: Cosmo | None = None, a0: float = 1.2e-10, beta: float = 1.0,
+                 A_s: float = 2.1e-9, n_s: float = 0.965, sigma8: float | None = None,
+                 omega_b: float = 0.045, T_cmb: float = 2.7255,
+                 k_min: float = 1e-4, k_max: float = 1e2, n_k: int = 512,
+                 a_min: float = 0.05, n_a: int = 96, a_start: float = 1e-3, N: int = 400):
+        if np is None:
+            raise RuntimeError('power_spectrum requires NumPy')
+        self.cosmo = cosmo or Cosmo()
+        self.a0, self.beta = a0, beta
+        self.n_s = n_s
+        self.omega_b, self.T_cmb = omega_b, T_cmb
+        self.k = np.logspace(math.log10(k_min), math.log10(k_max), n_k)
+        self.a = np.exp(np.linspace(math.log(a_min), 0.0, n_a))
+        self._lnk = np.log(self.k)
+        self._lna = np.log(self.a)
+        # (n_k, n_a) growth in one batched integration
+        self.D = integrate_growth_batch(self.k, self.cosmo, a0, beta, a_start, 1.0, N, a_out=self.a)[0]
+        self._lnD = np.log(self.D)
+        # T(k) and the rest of the A_s-independent shape on the native k grid, computed once
+        self._shape_k = self._shape(self.k)
+        self.A_s = A_s
+        if sigma8 is not None:
+            s8 = float(sigma_r(8.0, self.k, self.pk_grid()[:, -1])[0])
+            self.A_s = A_s * (sigma8 / s8)**2
+
+    def _shape(self, k):
+        """A_s-independent part P(k,a)/(A_s D²)."""
+        return linear_shape(k, self.cosmo, self.n_s, self.omega_b, self.T_cmb)
+
+    def pk_grid(self):
+        """P on the native grid, shape (n_k, n_a)."""
+        return self.A_s * self._shape_k[:, None] * self.D**2
+
+    def growth(self, k, a):
+        """D(k,a) by bilinear interpolation of ln D in (ln k, ln a); broadcasts k and a.
+
+        k and a must lie inside the table ([k_min, k_max], [a_min, 1]); ValueError otherwise.
+        """
+        k, a = np.broadcast_arrays(np.asarray(k, dtype=float), np.asarray(a, dtype=float))
+        uk = (np.log(k) - self._lnk[0]) / (self._lnk[1] - self._lnk[0])
+        if np.any(uk < -1e-9) or np.any(uk > len(self.k) - 1 + 1e-9):
+            raise ValueError(f'k outside [{self.k[0]:g}, {self.k[-1]:g}] h/Mpc; widen k_min/k_max')
+        uk = np.clip(uk, 0, len(self.k) - 1)
+        ua = (np.log(a) - self._lna[0]) / (self._lna[1] - self._lna[0])
+        if np.any(ua < -1e-9) or np.any(ua > len(self.a) - 1 + 1e-9):
+            raise ValueError(f'a outside [{self.a[0]:g}, 1]')
+        ua = np.clip(ua, 0, len(self.a) - 1)
+        i = np.minimum(uk.astype(np.int64), len(self.k) - 2)
+        j = np.minimum(ua.astype(np.int64), len(self.a) - 2)
+        tk, ta = uk - i, ua - j
+        L = self._lnD
+        return np.exp((1 - tk) * (1 - ta) * L[i, j] + tk * (1 - ta) * L[i + 1, j]
+                      + (1 - tk) * ta * L[i, j + 1] + tk * ta * L[i + 1, j + 1])
+
+    def __call__(self, k, a):
+        """P(k,a) for broadcastable arrays; T(k) from the per-Cosmo table, D interpolated."""
+        return self.A_s * self._shape(k) * self.growth(k, a)**2
+
+    def sigma(self, R, a=1.0):
+        """σ(R, a) for arrays of R (and a) by batched top-hat integration."""
+        a = np.atleast_1d(np.asarray(a, dtype=float))
+        pk = self.A_s * self._shape_k * self.growth(self.k[None, :], a[:, None])**2
+        return sigma_r(R, self.k, pk)
+
+    def sigma8(self, a=1.0):
+        return self.sigma(8.0, a)[:, 0]
+
+
+# LinearPower objects kept by linear_power; callers sweeping (a0, β) should hold their own
+POWER_CACHE_SIZE = 8
+
+
+@lru_cache(maxsize=POWER_CACHE_SIZE)
+def _linear_power(cosmo_fields: tuple, a0: float, beta: float, settings: tuple) -> LinearPower:
+    return LinearPower(Cosmo(*cosmo_fields), a0, beta, **dict(settings))
+
+
+def linear_power(cosmo: Cosmo | None = None, a0: float = 1.2e-10, beta: float = 1.0, **kwargs) -> LinearPower:
+    """Memoized LinearPower per (Cosmo, a0, β, settings); the POWER_CACHE_SIZE most recent are kept."""
+    cosmo = cosmo or Cosmo()
+    return _linear_power(astuple(cosmo), a0, beta, tuple(sorted(kwargs.items())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Linear P(k,a) with ILG growth (canonical schedule).')
+    parser.add_argument('--kappa', type=float, default=None, help='Dimensionless geometric factor κ. If omitted, inferred from a0-target.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--beta', type=float, default=None, help='Override β. If omitted, uses gating-derived β_gates.')
+    parser.add_argument('--A-s', type=float, default=2.1e-9)
+    parser.add_argument('--n-s', type=float, default=0.965)
+    parser.add_argument('--sigma8', type=float, default=None, help='Normalise to this σ8 instead of A_s.')
+    parser.add_argument('--ks', type=str, default='0.001,0.01,0.1,1,10')
+    parser.add_argument('--as', dest='a_list', type=str, default='0.5,1.0')
+    args = parser.parse_args()
+
+    kappa = args.kappa if args.kappa is not None else kappa_for_target_a0(args.a0_target)
+    a0 = compute_a0_from_kappa(kappa)
+    beta = args.beta if args.beta is not None else gating_beta()
+    kw = dict(A_s=args.A_s, n_s=args.n_s, sigma8=args.sigma8)
+    ilg = linear_power(Cosmo(), a0, beta, **kw)
+    std = linear_power(Cosmo(), 0.0, beta, **kw)
+    ks = np.array([float(s) for s in args.ks.split(',') if s])
+    a_list = [float(s) for s in args.a_list.split(',') if s]
+    print(f"a0 = {a0:.6e} m/s^2;  β = {beta:.3f};  A_s = {ilg.A_s:.4e}")
+    print(f"σ8: ILG = {ilg.sigma8()[0]:.5f}   ΛCDM = {std.sigma8()[0]:.5f}")
+    for a in a_list:
+        for k, p1, p0 in zip(ks, ilg(ks, a), std(ks, a)):
+            print(f"a={a:.3f}  k={k:8.4f} h/Mpc  P={p1:.5e} (Mpc/h)^3  ILG/ΛCDM={p1 / p0:.5f}")
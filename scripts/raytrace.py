@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Multi-plane weak-lensing maps from streamed 3D density slabs.
+
+Each lens plane i is a 3D overdensity slab δ (n_z, N, N) of a periodic box of
+side L [Mpc/h], centred at comoving distance χ_i with thickness Δχ_i, stored
+as a .npy file and read through a memory map in z-chunks:
+
+  Δ_i(x) = Σ_z δ dz                                   (projected, Mpc/h)
+  Δ̃_i(k) → Σ(a_i, k) Δ̃_i(k)                           (ILG lensing response)
+  φ̃_i = -2 Δ̃_i/k²,   α̂_i(x) = (3/2) Ω_m0 (H0/c)² ∇φ_i(x)/a_i
+
+Rays start at the observer along the pixel directions θ and are shot through
+the planes in χ order with the recursive multi-plane lens equation
+
+  x_j = χ_j θ - Σ_{i<j} (χ_j - χ_i) α̂_i(x_i),      β = x_s/χ_s,
+
+i.e. each plane deflects the rays at the positions where they actually cross
+it (periodic bilinear interpolation).  The distortion matrix A = ∂β/∂θ is
+carried along with the tidal tensors ∂∂φ_i, and κ = 1 - tr A/2,
+γ1 = (A_22 - A_11)/2, γ2 = -(A_12 + A_21)/2 at a single source plane χ_s.
+With --born the planes are instead summed along unperturbed rays,
+
+  κ(θ) = Σ_i W_i Δ_i(χ_i θ),   W_i = (3/2) Ω_m0 (H0/c)² χ_i (χ_s - χ_i)/(χ_s a_i)
+
+(γ likewise with (k_x²-k_y²)/k², 2k_xk_y/k²), the first-order limit of the above.
+
+The maps and the ray state (12 doubles per ray, a 96·n_pix² byte scratch
+file removed at the end) are .npy memory maps updated in row blocks.  Each
+plane's fields are inverse-transformed and applied one at a time, so peak
+memory is about 28·N² bytes (the plane's spectrum, one Fourier product and one
+real field) plus a few hundred bytes per ray of one row block; maps larger
+than RAM are fine, planes must fit.  Wall time, bytes read and peak RSS are
+reported per plane.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+from background import background_for
+from ilg_common import Cosmo, compute_a0_from_kappa, gating_beta, kappa_for_target_a0, mu_eff_grid
+from stencil import format_rss, peak_rss_mb
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+# ------------------- Planes -------------------
+
+def project_slab(path, z_chunk: int = 16, dtype=np.float64 if np is not None else None):
+    """Σ_z δ over a memory-mapped slab, read ``z_chunk`` layers at a time → (plane, bytes read)."""
+    slab = np.load(path, mmap_mode='r')
+    plane = np.zeros(slab.shape[1:], dtype=dtype)
+    for z0 in range(0, slab.shape[0], z_chunk):
+        block = slab[z0:z0 + z_chunk]
+        plane += block.sum(axis=0, dtype=dtype)
+    return plane, slab.nbytes, slab.shape[0]
+
+
+def plane_spectrum(plane, box: float, a: float, a0: float, beta: float, bg):
+    """Σ-filtered rFFT Δ̃ of one projected plane with its wavenumbers (k_x along axis 0, k_y along axis 1)."""
+    n = plane.shape[0]
+    kx = 2.0 * math.pi * np.fft.fftfreq(n, d=box / n)[:, None]
+    ky = 2.0 * math.pi * np.fft.rfftfreq(n, d=box / n)[None, :]
+    f = np.fft.rfft2(plane)
+    f *= mu_eff_grid(a, np.maximum(np.sqrt(kx * kx + ky * ky), 1e-12), a0, bg.cosmo, beta, bg=bg)[0]
+    f[0, 0] = 0.0
+    return f, kx, ky
+
+
+# Fourier multipliers on Δ̃ (φ̃ = -2Δ̃/k²): Born κ/γ, deflection ∇φ and tidal tensor ∂∂φ.
+PLANE_FIELDS = {
+    'kappa': lambda kx, ky, k2: 1.0,
+    'gamma1': lambda kx, ky, k2: (kx * kx - ky * ky) / k2,
+    'gamma2': lambda kx, ky, k2: 2.0 * kx * ky / k2,
+    'phi_x': lambda kx, ky, k2: -2j * kx / k2,
+    'phi_y': lambda kx, ky, k2: -2j * ky / k2,
+    'phi_xx': lambda kx, ky, k2: 2.0 * kx * kx / k2,
+    'phi_xy': lambda kx, ky, k2: 2.0 * kx * ky / k2,
+    'phi_yy': lambda kx, ky, k2: 2.0 * ky * ky / k2,
+}
+
+
+def plane_field(spec, name: str):
+    """One real-space field (see PLANE_FIELDS) of a plane spectrum from plane_spectrum."""
+    f, kx, ky = spec
+    k2 = kx * kx + ky * ky
+    k2[0, 0] = 1.0
+    n = f.shape[0]
+    return np.fft.irfft2(f * PLANE_FIELDS[name](kx, ky, k2), s=(n, n))
+
+
+def sample_periodic(fields, x, y, box: float):
+    """Bilinear periodic interpolation of same-shaped 2-D fields at comoving (x, y)."""
+    n = fields[0].shape[0]
+    u = (x / box * n) % n
+    v = (y / box * n) % n
+    i0 = np.floor(u).astype(np.int64)
+    j0 = np.floor(v).astype(np.int64)
+    tu, tv = u - i0, v - j0
+    i1, j1 = (i0 + 1) % n, (j0 + 1) % n
+    out = []
+    for f in fields:
+        out.append((1 - tu) * (1 - tv) * f[i0, j0] + tu * (1 - tv) * f[i1, j0]
+                   + (1 - tu) * tv * f[i0, j1] + tu * tv * f[i1, j1])
+    return out
+
+
+# ------------------- Driver -------------------
+
+# Ray state rows: comoving position x, direction u = dx/dχ, and the Jacobians
+# A_x = ∂x/∂θ, A_u = ∂u/∂θ (row-major 2×2).  Each tidal/deflection field kicks
+# its rows independently: row -= (α̂ prefactor) F(x) [× multiplier row].
+_N_STATE = 12
+_KICKS = (('phi_x', ((2, None),)), ('phi_y', ((3, None),)),
+          ('phi_xx', ((8, 4), (9, 5))), ('phi_yy', ((10, 6), (11, 7))),
+          ('phi_xy', ((8, 6), (9, 7), (10, 4), (11, 5))))
+
+
+def raytrace(manifest_path, out_dir, a0: float, beta: float, z_source: float = 1.0, n_pix: int = 1024,
+             fov_deg: float = 5.0, cosmo: Cosmo | None = None, row_block: int = 256, born: bool = False, log=print):
+    """κ/γ maps from the planes listed in a manifest → per-plane stats.
+
+    Rays are shot through the planes with the recursive multi-plane lens
+    equation unless ``born`` is set (see the module docstring).
+    """
+    cosmo = cosmo or Cosmo()
+    bg = background_for(cosmo)
+    with open(manifest_path, 'r') as f:
+        man = json.load(f)
+    base = Path(manifest_path).parent
+    box = float(man['box'])
+    chi_s = float(bg.chi(1.0 / (1.0 + z_source)))
+    planes = sorted((p for p in man['planes'] if float(p['chi']) < chi_s), key=lambda p: float(p['chi']))
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    maps = {name: np.lib.format.open_memmap(out / f'{name}.npy', mode='w+', dtype=np.float32, shape=(n_pix, n_pix))
+            for name in ('kappa', 'gamma1', 'gamma2')}
+    for m in maps.values():
+        m[:] = 0.0
+    theta = (np.arange(n_pix) + 0.5 - 0.5 * n_pix) * math.radians(fov_deg) / n_pix
+    pref = 1.5 * cosmo.Omega_m0 / bg.hubble_distance**2
+    blocks = [slice(r0, min(r0 + row_block, n_pix)) for r0 in range(0, n_pix, row_block)]
+    rays = None
+    if not born:
+        rays_path = out / 'rays.scratch.npy'
+        rays = np.lib.format.open_memmap(rays_path, mode='w+', dtype=np.float64, shape=(_N_STATE, n_pix, n_pix))
+        for b in blocks:
+            blk = np.zeros((_N_STATE, b.stop - b.start, n_pix))
+            blk[2] = theta[b][:, None]
+            blk[3] = theta[None, :]
+            blk[8] = blk[11] = 1.0
+            rays[:, b] = blk
+    stats = []
+    chi_prev = 0.0
+    for p in planes:
+        chi = float(p['chi'])
+        t0 = time.time()
+        plane, nbytes, n_z = project_slab(base / p['file'])
+        plane *= float(p['thickness']) / n_z
+        a = float(bg.a_of_chi(chi))
+        spec = plane_spectrum(plane, box, a, a0, beta, bg)
+        del plane
+        w = pref * chi * (chi_s - chi) / (chi_s * a)
+        if born:
+            x = chi * theta + 0.5 * box
+            for name, m in maps.items():
+                fld = plane_field(spec, name)
+                for b in blocks:
+                    rows = b.stop - b.start
+                    v, = sample_periodic([fld], np.broadcast_to(x[b][:, None], (rows, n_pix)),
+                                         np.broadcast_to(x[None, :], (rows, n_pix)), box)
+                    m[b] += (w * v).astype(np.float32)
+                del fld
+        else:
+            step = chi - chi_prev
+            for b in blocks:  # drift to the plane
+                blk = np.array(rays[:, b])
+                blk[0:2] += step * blk[2:4]
+                blk[4:8] += step * blk[8:12]
+                rays[:, b] = blk
+            for name, kicks in _KICKS:
+                fld = plane_field(spec, name)
+                for b in blocks:
+                    blk = np.array(rays[:, b])
+                    v, = sample_periodic([fld], blk[0] + 0.5 * box, blk[1] + 0.5 * box, box)
+                    v *= pref / a
+                    for r, m in kicks:
+                        rays[r, b] = blk[r] - (v if m is None else v * blk[m])
+                del fld
+            chi_prev = chi
+        del spec
+        row = {'file': p['file'], 'chi': chi, 'a': a, 'weight': w, 'seconds': time.time() - t0,
+               'bytes_read': int(nbytes), 'peak_rss_mb': peak_rss_mb()}
+        stats.append(row)
+        log(f"plane χ={chi:8.2f} Mpc/h  a={a:.4f}  {row['seconds']:.2f}s  read {nbytes / 2**20:.1f} MiB  "
+            f"peak RSS {format_rss(row['peak_rss_mb'])}")
+    if rays is not None:
+        # drift to the source plane; A = ∂β/∂θ = x_s/χ_s → κ, γ
+        step = chi_s - chi_prev
+        for b in blocks:
+            blk = np.array(rays[4:, b])
+            A = (blk[0:4] + step * blk[4:8]) / chi_s
+            maps['kappa'][b] = (1.0 - 0.5 * (A[0] + A[3])).astype(np.float32)
+            maps['gamma1'][b] = (0.5 * (A[3] - A[0])).astype(np.float32)
+            maps['gamma2'][b] = (-0.5 * (A[1] + A[2])).astype(np.float32)
+        del rays
+        os.remove(rays_path)
+    for m in maps.values():
+        m.flush()
+    with open(out / 'raytrace_stats.json', 'w') as f:
+        json.dump({'z_source': z_source, 'chi_source': chi_s, 'n_pix': n_pix, 'fov_deg': fov_deg,
+                   'a0': a0, 'beta': beta, 'born': born,
+                   'scratch_bytes': 0 if born else 8 * _N_STATE * n_pix * n_pix, 'planes': stats}, f, indent=2)
+    return stats
+
+
+def make_mock_planes(out_dir, n: int = 256, n_z: int = 32, box: float = 500.0, n_planes: int = 6,
+                     z_max: float = 1.0, cosmo: Cosmo | None = None, seed: int = 0):
+    """Gaussian linear-theory slabs (ΛCDM P(k,a) from power_spectrum) and their manifest."""
+    from power_spectrum import linear_power
+
+    cosmo = cosmo or Cosmo()
+    bg = background_for(cosmo)
+    pk = linear_power(cosmo, 0.0, 1.0)
+    rng = np.random.default_rng(seed)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    chi_max = float(bg.chi(1.0 / (1.0 + z_max)))
+    thickness = chi_max / n_planes
+    dz = thickness / n_z
+    kz = 2.0 * math.pi * np.fft.fftfreq(n_z, d=dz)[:, None, None]
+    kx = 2.0 * math.pi * np.fft.fftfreq(n, d=box / n)[None, :, None]
+    ky = 2.0 * math.pi * np.fft.rfftfreq(n, d=box / n)[None, None, :]
+    k = np.sqrt(kx * kx + ky * ky + kz * kz)
+    k[0, 0, 0] = 1.0
+    vol = thickness * box * box
+    planes = []
+    for i in range(n_planes):
+        chi = (i + 0.5) * thickness
+        a = float(bg.a_of_chi(chi))
+        amp = np.sqrt(pk(np.maximum(k, pk.k[0]), a) / vol) * (n_z * n * n)
+        amp[0, 0, 0] = 0.0
+        noise = rng.standard_normal(k.shape) + 1j * rng.standard_normal(k.shape)
+        delta = np.fft.irfftn(amp * noise / math.sqrt(2.0), s=(n_z, n, n), axes=(0, 1, 2)).astype(np.float32)
+        name = f'slab_{i:03d}.npy'
+        np.save(out / name, delta)
+        planes.append({'file': name, 'chi': chi, 'thickness': thickness})
+    man = {'box': box, 'n': n, 'planes': planes}
+    with open(out / 'manifest.json', 'w') as f:
+        json.dump(man, f, indent=2)
+    return out / 'manifest.json'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-plane κ/γ maps with the ILG Σ(a,k) from memory-mapped slabs '
+                                     '(recursive multi-plane lens equation, or --born).')
+    parser.add_argument('--manifest', type=str, default=None, help='Plane manifest JSON (box, planes[{file, chi, thickness}]).')
+    parser.add_argument('--make-mock', type=str, default=None, help='Write Gaussian mock slabs + manifest into this directory first.')
+    parser.add_argument('--mock-n', type=int, default=256, help='Transverse cells per mock slab.')
+    parser.add_argument('--mock-planes', type=int, default=6)
+    parser.add_argument('--kappa', type=float, default=None, help='Dimensionless geometric factor κ. If omitted, inferred from a0-target.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--beta', type=float, default=None, help='Override β. If omitted, uses gating-derived β_gates.')
+    parser.add_argument('--z-source', type=float, default=1.0)
+    parser.add_argument('--n-pix', type=int, default=1024)
+    parser.add_argument('--fov', type=float, default=5.0, help='Field of view [deg].')
+    parser.add_argument('--row-block', type=int, default=256, help='Map rows resident per accumulation step.')
+    parser.add_argument('--out', type=str, required=True, help='Directory for kappa/gamma1/gamma2 .npy maps.')
+    parser.add_argument('--born', action='store_true',
+                        help='Sum the planes along unperturbed rays instead of ray tracing (no scratch file).')
+    args = parser.parse_args()
+
+    kappa = args.kappa if args.kappa is not None else kappa_for_target_a0(args.a0_target)
+    a0 = compute_a0_from_kappa(kappa)
+    beta = args.beta if args.beta is not None else gating_beta()
+    manifest = args.manifest
+    if args.make_mock:
+        manifest = make_mock_planes(args.make_mock, n=args.mock_n, n_planes=args.mock_planes, z_max=args.z_source)
+        print(f'wrote mock planes to {args.make_mock}')
+    if manifest is None:
+        raise SystemExit('need --manifest or --make-mock')
+    t0 = time.time()
+    stats = raytrace(manifest, args.out, a0, beta, args.z_source, args.n_pix, args.fov, row_block=args.row_block,
+                     born=args.born)
+    kap = np.load(os.path.join(args.out, 'kappa.npy'), mmap_mode='r')
+    print(f"{len(stats)} planes in {time.time() - t0:.1f}s; κ rms = {float(np.sqrt(np.mean(np.square(kap, dtype=np.float64)))):.4e}; "
+          f"peak RSS {format_rss(peak_rss_mb())}")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Galaxy rotation curves with the ILG weight at the canonical a0.
+
+With w = 1/(1+χ), χ = a0/g and g = |∇Φ|, the spherical/midplane reduction of
+∇·(w∇Φ) = 4πGρ is w(g)·g = g_N, i.e. g²/(g + a0) = g_N, so
+
+  g = (g_N + sqrt(g_N² + 4 g_N a0)) / 2,     v² = g r,
+
+with g_N = v_bar²/r and v_bar² = v_gas|v_gas| + Υ_d v_disk² + Υ_b v_bul|v_bul|
+(the SPARC-style decomposition; gas/bulge signs carry counter-rotation).
+
+Catalogues are columnar .npz files (CSR layout): ``offsets`` (n_gal+1) indexes
+the concatenated point columns r_kpc, v_obs, v_err, v_gas, v_disk, v_bul, and
+``names`` holds the galaxy labels.  Every point of every galaxy is evaluated
+in one NumPy pass and χ² per galaxy is a segmented sum (differences of a
+running sum, so empty galaxies contribute 0).
+Large catalogues are split into contiguous galaxy ranges of similar point
+count and evaluated across a process pool.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from ilg_common import compute_a0_from_kappa, kappa_for_target_a0
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+KPC_TO_M = 3.085677581e19
+G_SI = 6.674_30e-11
+MSUN_KG = 1.988_47e30
+COLUMNS = ('r_kpc', 'v_obs', 'v_err', 'v_gas', 'v_disk', 'v_bul')
+
+
+# ------------------- Catalogue I/O -------------------
+
+def save_catalog(path, names, offsets, **cols):
+    """Write a columnar catalogue (.npz, uncompressed so columns load without inflating)."""
+    missing = [c for c in COLUMNS if c not in cols]
+    if missing:
+        raise ValueError(f'missing columns {missing}')
+    np.savez(path, names=np.asarray(names), offsets=np.asarray(offsets, dtype=np.int64),
+             **{c: np.asarray(cols[c], dtype=float) for c in COLUMNS})
+
+
+def load_catalog(path):
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+
+def catalog_from_rotmod(paths):
+    """Build catalogue columns from SPARC *_rotmod.dat files (Rad Vobs errV Vgas Vdisk Vbul ...)."""
+    names, offsets, rows = [], [0], []
+    for p in paths:
+        pts = []
+        with open(p, 'r') as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                pts.append([float(v) for v in line.split()[:6]])
+        names.append(os.path.basename(p).replace('_rotmod.dat', ''))
+        rows.extend(pts)
+        offsets.append(len(rows))
+    arr = np.asarray(rows, dtype=float).reshape(-1, 6)
+    return names, offsets, {c: arr[:, i] for i, c in enumerate(COLUMNS)}
+
+
+def mock_catalog(n_gal=1000, n_r=100, a0=1.2e-10, noise=0.03, seed=0):
+    """Synthetic catalogue: Kuzmin disk + gas disk + Hernquist bulge, observed through the ILG law (default Υ)."""
+    rng = np.random.default_rng(seed)
+    m_disk = 10**rng.uniform(8.5, 11.0, n_gal) * MSUN_KG
+    r_disk = 10**rng.uniform(0.0, 0.8, n_gal)                       # kpc
+    m_gas = m_disk * 10**rng.uniform(-1.0, 0.3, n_gal)
+    m_bul = np.where(rng.random(n_gal) < 0.3, 0.2 * m_disk, 0.0)
+    r_max = 8.0 * r_disk
+    frac = (np.arange(1, n_r + 1) / n_r)[None, :]
+    r = (frac * r_max[:, None])                                      # (n_gal, n_r) kpc
+    rm = r * KPC_TO_M
+
+    def kuzmin(M, R):
+        R = R[:, None] * KPC_TO_M
+        return np.sqrt(G_SI * M[:, None] * rm**2 / (rm**2 + R**2)**1.5) / 1e3
+
+    v_disk = kuzmin(m_disk, r_disk)
+    v_gas = kuzmin(m_gas, 2.0 * r_disk)
+    ab = (0.1 * r_disk)[:, None] * KPC_TO_M
+    v_bul = np.sqrt(G_SI * m_bul[:, None] * rm / (rm + ab)**2) / 1e3
+    cols = {'r_kpc': r.ravel(), 'v_gas': v_gas.ravel(), 'v_disk': v_disk.ravel(), 'v_bul': v_bul.ravel()}
+    v_true = ilg_velocity(cols['r_kpc'], cols['v_gas'], cols['v_disk'], cols['v_bul'], a0)
+    cols['v_err'] = noise * v_true + 2.0
+    cols['v_obs'] = v_true + cols['v_err'] * rng.standard_normal(v_true.shape)
+    names = [f'MOCK{i:05d}' for i in range(n_gal)]
+    return names, np.arange(n_gal + 1) * n_r, cols
+
+
+# ------------------- Model -------------------
+
+def ilg_velocity(r_kpc, v_gas, v_disk, v_bul, a0, ups_disk=0.5, ups_bul=0.7):
+    """ILG circular speed [km/s] for arrays of points (any broadcastable shapes)."""
+    v_bar2 = v_gas * np.abs(v_gas) + ups_disk * v_disk**2 + ups_bul * v_bul * np.abs(v_bul)
+    r_m = np.asarray(r_kpc) * KPC_TO_M
+    g_n = np.maximum(v_bar2, 0.0) * 1e6 / r_m
+    g = 0.5 * (g_n + np.sqrt(g_n * g_n + 4.0 * g_n * a0))
+    return np.sqrt(g * r_m) / 1e3
+
+
+def chi2_per_galaxy(cat, a0, ups_disk=0.5, ups_bul=0.7, g0=0, g1=None):
+    """χ² for galaxies [g0, g1) of a loaded catalogue; Υ may be scalars or (n_Υ, 1) grids."""
+    off = cat['offsets']
+    g1 = len(off) - 1 if g1 is None else g1
+    s, e = int(off[g0]), int(off[g1])
+    col = {c: cat[c][s:e] for c in COLUMNS}
+    v = ilg_velocity(col['r_kpc'], col['v_gas'], col['v_disk'], col['v_bul'], a0, ups_disk, ups_bul)
+    res2 = ((v - col['v_obs']) / col['v_err'])**2
+    # segment sums as differences of a running sum, so empty galaxies (equal offsets) get 0
+    csum = np.concatenate([np.zeros(res2.shape[:-1] + (1,)), np.cumsum(res2, axis=-1)], axis=-1)
+    return csum[..., off[g0 + 1:g1 + 1] - s] - csum[..., off[g0:g1] - s]
+
+
+def _chi2_range(path, a0, ups_disk, ups_bul, g0, g1, fit_grid):
+    cat = load_catalog(path)
+    if fit_grid is None:
+        return g0, chi2_per_galaxy(cat, a0, ups_disk, ups_bul, g0, g1), None
+    grid = np.asarray(fit_grid)[:, None]
+    chi2 = chi2_per_galaxy(cat, a0, grid, ups_bul, g0, g1)           # (n_Υ, n_gal)
+    best = np.argmin(chi2, axis=0)
+    return g0, chi2[best, np.arange(chi2.shape[1])], grid[best, 0]
+
+
+def split_ranges(offsets, parts):
+    """Contiguous galaxy ranges with roughly equal point counts."""
+    n_gal = len(offsets) - 1
+    targets = np.linspace(0, offsets[-1], parts + 1)[1:-1]
+    cuts = np.searchsorted(offsets, targets)
+    edges = np.unique(np.concatenate([[0], np.clip(cuts, 0, n_gal), [n_gal]]))
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def evaluate_catalog(path, a0, ups_disk=0.5, ups_bul=0.7, workers=None, fit_grid=None):
+    """χ² per galaxy (and best Υ_disk when ``fit_grid`` is given) using a process pool for big catalogues."""
+    with np.load(path) as z:
+        offsets = z['offsets']
+    n_gal = len(offsets) - 1
+    chi2 = np.empty(n_gal)
+    ups = np.full(n_gal, ups_disk, dtype=float)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or offsets[-1] < 200_000:
+        _, c, u = _chi2_range(path, a0, ups_disk, ups_bul, 0, n_gal, fit_grid)
+        chi2[:] = c
+        if u is not None:
+            ups[:] = u
+        return chi2, ups
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(_chi2_range, path, a0, ups_disk, ups_bul, g0, g1, fit_grid)
+                for g0, g1 in split_ranges(offsets, 4 * workers)]
+        for fut in futs:
+            g0, c, u = fut.result()
+            chi2[g0:g0 + len(c)] = c
+            if u is not None:
+                ups[g0:g0 + len(u)] = u
+    return chi2, ups
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ILG rotation curves at fixed a0: χ² per galaxy for a columnar catalogue.')
+    parser.add_argument('--catalog', type=str, default=None, help='Columnar .npz catalogue (see module docstring).')
+    parser.add_argument('--rotmod', nargs='*', default=None, help='SPARC *_rotmod.dat files to convert into --catalog.')
+    parser.add_argument('--mock', type=int, default=0, help='Write a synthetic catalogue with this many galaxies to --catalog.')
+    parser.add_argument('--mock-radii', type=int, default=100)
+    parser.add_argument('--kappa', type=float, default=None, help='Dimensionless geometric factor κ. If omitted, inferred from a0-target.')
+    parser.add_argument('--a0-target', type=float, default=1.2e-10)
+    parser.add_argument('--ups-disk', type=float, default=0.5, help='Disk mass-to-light ratio Υ_d.')
+    parser.add_argument('--ups-bul', type=float, default=0.7, help='Bulge mass-to-light ratio Υ_b.')
+    parser.add_argument('--fit-ups', action='store_true', help='Minimise χ² over a Υ_d grid per galaxy (a0 stays fixed).')
+    parser.add_argument('--workers', type=int, default=None, help='Process-pool size (default: all cores).')
+    parser.add_argument('--write-json', type=str, default=None, help='If set, write per-galaxy χ² JSON to this path.')
+    args = parser.parse_args()
+
+    kappa = args.kappa if args.kappa is not None else kappa_for_target_a0(args.a0_target)
+    a0 = compute_a0_from_kappa(kappa)
+    path = args.catalog or os.path.join(os.environ.get('TMPDIR', '/tmp'), 'ilg_rotation_mock.npz')
+    if args.rotmod:
+        names, offsets, cols = catalog_from_rotmod(args.rotmod)
+        save_catalog(path, names, offsets, **cols)
+    elif args.mock or not os.path.exists(path):
+        names, offsets, cols = mock_catalog(args.mock or 1000, args.mock_radii, a0)
+        save_catalog(path, names, offsets, **cols)
+        print(f'wrote mock catalogue {path}')
+
+    cat_names = load_catalog(path)['names']
+    with np.load(path) as z:
+        offsets = z['offsets']
+    t0 = time.time()
+    fit_grid = np.linspace(0.1, 1.5, 57) if args.fit_ups else None
+    chi2, ups = evaluate_catalog(path, a0, args.ups_disk, args.ups_bul, args.workers, fit_grid)
+    dt = time.time() - t0
+    dof = np.maximum(np.diff(offsets) - (1 if args.fit_ups else 0), 1)
+    red = chi2 / dof
+    print(f"a0 = {a0:.6e} m/s^2;  {len(chi2)} galaxies, {int(offsets[-1])} points in {dt:.3f}s "
+          f"({offsets[-1] / max(dt, 1e-9):.3g} points/s)")
+    print(f"χ²/ν: median {np.median(red):.3f}, 16–84% [{np.percentile(red, 16):.3f}, {np.percentile(red, 84):.3f}]")
+    if args.write_json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.write_json)), exist_ok=True)
+        payload = {
+            'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            'a0': a0,
+            'catalog': os.path.basename(path),
+            'galaxies': [{'name': str(n), 'n': int(d), 'chi2': float(c), 'ups_disk': float(u)}
+                         for n, d, c, u in zip(cat_names, np.diff(offsets), chi2, ups)],
+        }
+        with open(args.write_json, 'w') as f:
+            json.dump(payload, f, indent=2)
+        print(f"Wrote rotation-curve JSON to {args.write_json}")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Branch-and-bound search over gate schedules for a target suppression S.
+
+A schedule is a set (or, with --repeats, a multiset) of n gates drawn from an
+alphabet of (mask, pattern, phase set) triples.  Schedules that differ by a
+permutation of the gates or by a common rotation of the phase cycle
+(φ → φ + r mod P, a symmetry whenever no mask touches the phase bits) block
+the same ticks up to relabelling, so results are reported per orbit:
+
+  - permutations: gates are taken in alphabet order, so each schedule is
+    generated once, as its sorted index tuple;
+  - rotations: the alphabet is closed under rotation, orbits are counted with
+    Burnside's lemma (mean number of schedules fixed by each rotation; a
+    schedule fixed by r is a union of whole cycles of r on the alphabet), and
+    a listed schedule is the lexicographically smallest member of its orbit
+    (so it only uses gates that no rotation maps below its first gate).
+
+Each gate is a packed blocked-tick bitset (a Python int from gates_engine's
+bitmap), so a union is one OR and |B| one popcount.  Completions are counted
+by a memoized recursion over (position, union ∩ support of the remaining
+gates, |B|, gates left): projecting the union onto the ticks the remaining
+gates can still touch lets branches that differ only in settled ticks share
+one count.  This collapses the huge, mostly disjoint spaces the canonical
+schedule lives in.  A branch is cut as soon as |B| exceeds the target (|B|
+never shrinks).  Listing walks the same tree and descends only into branches
+whose count is non-zero.
+
+Work is split into (rotation, first gate) tasks across a process pool.
+Finished tasks are appended to <out>/progress.jsonl, so an interrupted search
+resumes.  Every match is counted; the first --max-results representatives are
+stored.  Requires NumPy (for the gate bitsets).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+
+from gates_engine import evaluate_schedule, validate_schedule
+from ilg_gates_check import MASKS, PATTERNS, PHASES, popcount
+
+
+def rotate_phases(bits: int, r: int, n_phases: int) -> int:
+    """Phase bitmask with every phase shifted by r (mod n_phases)."""
+    full = (1 << n_phases) - 1
+    r %= n_phases
+    return ((bits << r) | (bits >> (n_phases - r))) & full
+
+
+def build_alphabet(masks, patterns, phase_sets, n_bits: int = 10, n_phases: int = 8, close: bool = True):
+    """Sorted distinct (mask, pattern, phase bits) gates with pattern ⊆ mask, closed under phase rotation."""
+    gates = set()
+    for m in masks:
+        for p in patterns:
+            if p & ~m:
+                continue
+            for ph in phase_sets:
+                bits = sum(1 << q for q in ph)
+                rots = range(n_phases) if close and not m & (n_phases - 1) else (0,)
+                gates.update((m, p, rotate_phases(bits, r, n_phases)) for r in rots)
+    gates = sorted(gates)
+    validate_schedule([g[0] for g in gates], [g[1] for g in gates],
+                      [[q for q in range(n_phases) if g[2] >> q & 1] for g in gates], n_bits, n_phases)
+    return gates
+
+
+def gate_bitsets(alphabet, n_bits: int, n_phases: int) -> list[int]:
+    """Blocked ticks of each alphabet gate as a T-bit Python int (bit t ↔ tick t)."""
+    out = []
+    for m, p, ph in alphabet:
+        r = evaluate_schedule([m], [p], [[q for q in range(n_phases) if ph >> q & 1]], n_bits, n_phases, bitmap=True)
+        out.append(int.from_bytes(r['bitmap'].tobytes(), 'little'))
+    return out
+
+
+class Counter:
+    """Memoized count of item selections (total weight n) whose union blocks exactly ``target`` ticks."""
+
+    def __init__(self, bits, weights, n: int, target: int, repeats: bool = False):
+        self.bits, self.weights = list(bits), list(weights)
+        self.n, self.target, self.repeats = n, target, repeats
+        m = len(self.bits)
+        # support[i]: every tick items i.. can still block
+        self.support = [0] * (m + 1)
+        for i in range(m - 1, -1, -1):
+            self.support[i] = self.support[i + 1] | self.bits[i]
+        self.count = lru_cache(maxsize=None)(self._count)
+
+    def _count(self, i: int, proj: int, size: int, k: int) -> int:
+        if k == 0:
+            return int(size == self.target)
+        if i == len(self.bits):
+            return 0
+        if size + popcount(self.support[i] & ~proj) < self.target:
+            return 0
+        total = self.count(i + 1, proj & self.support[i + 1], size, k)
+        w = self.weights[i]
+        if w <= k:
+            b = self.bits[i]
+            s2 = size + popcount(b & ~proj)
+            if s2 <= self.target:
+                nxt = i if self.repeats else i + 1
+                total += self.count(nxt, (proj | b) & self.support[nxt], s2, k - w)
+        return total
+
+    def count_from(self, first: int) -> int:
+        """Selections whose smallest item is ``first``."""
+        b, w = self.bits[first], self.weights[first]
+        s = popcount(b)
+        if w > self.n or s > self.target:
+            return 0
+        nxt = first if self.repeats else first + 1
+        return self.count(nxt, b & self.support[nxt], s, self.n - w)
+
+
+class SearchSpace:
+    """Alphabet, bitsets and rotation cycles shared by every search task."""
+
+    def __init__(self, alphabet, n_gates: int, target: int, n_bits: int = 10, n_phases: int = 8,
+                 repeats: bool = False):
+        self.alphabet = list(alphabet)
+        self.n_gates, self.target = n_gates, target
+        self.n_bits, self.n_phases = n_bits, n_phases
+        self.repeats = repeats
+        self.bits = gate_bitsets(self.alphabet, n_bits, n_phases)
+        index = {g: i for i, g in enumerate(self.alphabet)}
+        self.rotations = [list(range(len(self.alphabet)))]
+        if not any(m & (n_phases - 1) for m, _, _ in self.alphabet):
+            perms = [[index.get((m, p, rotate_phases(ph, r, n_phases))) for m, p, ph in self.alphabet]
+                     for r in range(1, n_phases)]
+            if all(None not in perm for perm in perms):
+                self.rotations += perms
+        self._counters = {}
+
+    def config(self):
+        return {'alphabet': self.alphabet, 'n_gates': self.n_gates, 'target': self.target,
+                'n_bits': self.n_bits, 'n_phases': self.n_phases, 'repeats': self.repeats}
+
+    def counter(self, r: int) -> Counter:
+        """Counter over the cycles of rotation r (r = 0: the gates themselves)."""
+        c = self._counters.get(r)
+        if c is None:
+            perm = self.rotations[r]
+            seen, bits, weights = set(), [], []
+            for i in range(len(perm)):
+                if i in seen:
+                    continue
+                cyc, j = [], i
+                while j not in seen:
+                    seen.add(j)
+                    cyc.append(j)
+                    j = perm[j]
+                u = 0
+                for j in cyc:
+                    u |= self.bits[j]
+                bits.append(u)
+                weights.append(len(cyc))
+            c = self._counters[r] = Counter(bits, weights, self.n_gates, self.target, self.repeats)
+        return c
+
+    def is_canonical(self, sched) -> bool:
+        for rot in self.rotations[1:]:
+            if sorted(rot[i] for i in sched) < list(sched):
+                return False
+        return True
+
+    def schedule_dict(self, sched) -> dict:
+        g = [self.alphabet[i] for i in sched]
+        return {'masks': [x[0] for x in g], 'patterns': [x[1] for x in g],
+                'phases': [[q for q in range(self.n_phases) if x[2] >> q & 1] for x in g]}
+
+    def list_from(self, first: int, max_results: int):
+        """Up to ``max_results`` orbit representatives whose first gate is ``first``."""
+        # a representative never contains a gate that some rotation maps below ``first``
+        if min(rot[first] for rot in self.rotations) < first:
+            return []
+        start = first if self.repeats else first + 1
+        allowed = [j for j in range(start, len(self.alphabet)) if min(rot[j] for rot in self.rotations) >= first]
+        c = Counter([self.bits[j] for j in allowed], [1] * len(allowed), self.n_gates - 1, self.target,
+                    self.repeats)
+        found, sched = [], [first]
+
+        def walk(i, proj, size, k):
+            if k == 0:
+                if size == self.target and self.is_canonical(sched):
+                    found.append(list(sched))
+                return
+            for j in range(i, len(allowed)):
+                b = c.bits[j]
+                s2 = size + popcount(b & ~proj)
+                if s2 > self.target:
+                    continue
+                nxt = j if self.repeats else j + 1
+                p2 = (proj | b) & c.support[nxt]
+                if c.count(nxt, p2, s2, k - 1) == 0:
+                    continue
+                sched.append(allowed[j])
+                walk(nxt, p2, s2, k - 1)
+                sched.pop()
+                if len(found) >= max_results:
+                    return
+
+        b = self.bits[first]
+        if popcount(b) <= self.target:
+            walk(0, b & c.support[0], popcount(b), self.n_gates - 1)
+        return found
+
+
+_SPACE = None
+
+
+def _init_worker(space):
+    global _SPACE
+    _SPACE = space
+
+
+def _run_task(r, first, max_results):
+    t0 = time.time()
+    n = _SPACE.counter(r).count_from(first)
+    found = _SPACE.list_from(first, max_results) if r == 0 and n else []
+    return r, first, n, found, time.time() - t0
+
+
+def run_search(space: SearchSpace, out_dir=None, workers: int | None = None, max_results: int = 1000, log=print):
+    """Count orbits of schedules with |B| = target and list representatives; resumes from <out>."""
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * len(space.alphabet) + 100))
+    tasks = [(r, j) for r in range(len(space.rotations)) for j in range(len(space.counter(r).bits))]
+    done = {}
+    progress = None
+    if out_dir is not None:
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        manifest = out / 'manifest.json'
+        config = json.loads(json.dumps(space.config()))
+        if manifest.exists():
+            with open(manifest, 'r') as f:
+                if json.load(f) != config:
+                    raise ValueError(f'{manifest} was written for a different search; use a fresh --out directory')
+        else:
+            with open(manifest, 'w') as f:
+                json.dump(config, f)
+        progress = out / 'progress.jsonl'
+        if progress.exists():
+            good = []
+            with open(progress, 'r') as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:  # torn final line from an interrupted write
+                        break
+                    done[(row['r'], row['first'])] = row
+                    good.append(line)
+            tmp = progress.with_suffix('.tmp')
+            with open(tmp, 'w') as f:
+                f.writelines(good)
+            os.replace(tmp, progress)
+            log(f'resuming: {len(done)} of {len(tasks)} tasks done')
+    todo = [t for t in tasks if t not in done]
+    t0 = time.time()
+
+    def record(r, first, n, found, secs):
+        row = {'r': r, 'first': first, 'count': n, 'seconds': secs,
+               'schedules': [space.schedule_dict(s) for s in found]}
+        done[(r, first)] = row
+        if progress is not None:
+            with open(progress, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(space,)) as pool:
+            for res in pool.map(_run_task, *zip(*[(r, j, max_results) for r, j in todo])):
+                record(*res)
+    else:
+        _init_worker(space)
+        for r, j in todo:
+            record(*_run_task(r, j, max_results))
+    rows = [done[t] for t in tasks]
+    fixed = [sum(row['count'] for row in rows if row['r'] == r) for r in range(len(space.rotations))]
+    orbits, rem = divmod(sum(fixed), len(fixed))
+    if rem:
+        raise RuntimeError('Burnside count is not an integer; the alphabet is not closed under rotation')
+    schedules = [s for row in rows if row['r'] == 0 for s in row['schedules']][:max_results]
+    return {'target_blocked': space.target, 'T': 1 << space.n_bits, 'n_gates': space.n_gates,
+            'alphabet_size': len(space.alphabet), 'schedules_total': fixed[0], 'orbits': orbits,
+            'fixed_by_rotation': fixed, 'seconds': time.time() - t0, 'schedules': schedules}
+
+
+def _parse_ints(text):
+    return [int(s, 0) for s in text.split(',') if s]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count and list gate schedules hitting a target |B|, modulo symmetry.')
+    parser.add_argument('--n-gates', type=int, default=9)
+    parser.add_argument('--target', type=int, default=46, help='Target |B| (S = 1 - |B|/T); canonical 46 -> 489/512.')
+    parser.add_argument('--bits', type=int, default=10, help='Breath length 2^bits ticks.')
+    parser.add_argument('--masks', type=str, default=None, help='Comma-separated candidate masks (default: canonical).')
+    parser.add_argument('--patterns', type=str, default=None, help='Comma-separated candidate patterns (default: canonical).')
+    parser.add_argument('--phase-sizes', type=str, default=None,
+                        help='Use every phase subset of these sizes (default: the canonical PHASES sets).')
+    parser.add_argument('--repeats', action='store_true', help='Allow the same gate more than once.')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-results', type=int, default=1000, help='Representatives stored (all orbits are counted).')
+    parser.add_argument('--out', type=str, default=None, help='Checkpoint directory (resumable).')
+    parser.add_argument('--write-json', type=str, default=None)
+    args = parser.parse_args()
+
+    masks = _parse_ints(args.masks) if args.masks else sorted(set(MASKS))
+    patterns = _parse_ints(args.patterns) if args.patterns else list(PATTERNS)
+    if args.phase_sizes:
+        phase_sets = [c for s in _parse_ints(args.phase_sizes) for c in combinations(range(8), s)]
+    else:
+        phase_sets = [sorted(p) for p in PHASES]
+    alphabet = build_alphabet(masks, patterns, phase_sets, args.bits)
+    space = SearchSpace(alphabet, args.n_gates, args.target, args.bits, repeats=args.repeats)
+    print(f'alphabet: {len(alphabet)} gates; {len(space.rotations)} phase rotations; target |B| = {args.target} '
+          f'of {1 << args.bits}')
+    res = run_search(space, args.out, args.workers, args.max_results)
+    print(f"{res['schedules_total']} schedules with |B| = {args.target} in {res['orbits']} rotation orbits "
+          f"({res['seconds']:.1f}s)")
+    for s in res['schedules'][:3]:
+        chk = evaluate_schedule(s['masks'], s['patterns'], s['phases'], args.bits)
+        print(f"  |B| = {chk['blocked']}  patterns = {[bin(p) for p in s['patterns']]}  phases = {s['phases']}")
+    if args.write_json:
+        with open(args.write_json, 'w') as f:
+            json.dump(res, f, indent=2)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Conservative face-flux stencil for div(w ∇Φ) on regular grids of any dimension.
+
+Nodes sit at x = i·h.  For every axis the face between nodes i and i+1 carries
+
+  w_f = (w_i + w_{i+1})/2,   F = w_f (Φ_{i+1} - Φ_i)/h
+
+and the divergence at an interior node is Σ_axes (F_{i+1/2} - F_{i-1/2})/h
+(w = None gives the plain central-difference Laplacian).  All operations are
+whole-array shifted slices.  The discrete divergence theorem compares
+
+  Σ_interior div · h^d    with    Σ_boundary faces (outward F) · h^(d-1),
+
+where the boundary faces are those between the outermost two node layers,
+taken over the interior nodes of the other axes (the same faces the original
+per-cell loops used).
+
+Large grids are processed in slabs along axis 0: each slab reads its planes
+plus a one-plane halo, so memory stays bounded.  Field sources may be arrays
+(including np.memmap) or callables ``f(lo, hi)`` returning planes lo..hi-1,
+which lets analytic fixtures generate 512³ fields slab by slab.
+
+For grids that do not fit in memory, write_npy_planes streams a field into a
+float64 .npy file and NpyPlanes reads it back by mapping only the requested
+planes, so the mapped pages are released after each slab and peak RSS stays
+at a few slabs whatever the grid size (a single long-lived np.memmap would
+keep every page it touched resident).
+
+Without NumPy, radius2 / radial_weight return nested lists and
+conservation_sums / laplacian_error fall back to per-node loops over the
+whole grid (fine for the default 33² and 17³ CI fixtures); the array
+operators, slab streaming and .npy I/O require NumPy.
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+SLAB = 8
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MiB, or None where ``resource`` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024.0**2 if sys.platform == 'darwin' else 1024.0)
+
+
+def format_rss(mb) -> str:
+    """'123 MiB' for a peak_rss_mb value, 'n/a' when it is None."""
+    return f'{mb:.0f} MiB' if mb is not None else 'n/a'
+
+
+def _take(a, axis: int, sl: slice):
+    idx = [slice(None)] * a.ndim
+    idx[axis] = sl
+    return a[tuple(idx)]
+
+
+def planes(src, lo: int, hi: int):
+    """Planes lo..hi-1 along axis 0 of an array or plane-generating callable, as float64."""
+    if callable(src):
+        return np.asarray(src(lo, hi), dtype=float)
+    return np.asarray(src[lo:hi], dtype=float)
+
+
+def write_npy_planes(path, shape, src, slab: int = SLAB) -> int:
+    """Write planes of ``src`` (array or callable) to a float64 .npy file, one slab at a time → bytes."""
+    shape = tuple(shape)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        np.lib.format.write_array_header_1_0(
+            f, {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float64)), 'fortran_order': False, 'shape': shape})
+        for lo in range(0, shape[0], slab):
+            hi = min(lo + slab, shape[0])
+            f.write(np.ascontiguousarray(planes(src, lo, hi), dtype=np.float64).tobytes())
+        nbytes = f.tell()
+    os.replace(tmp, path)
+    return nbytes
+
+
+class NpyPlanes:
+    """Plane source over a float64 .npy file that maps only the planes it is asked for."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(f)
+            self.offset = f.tell()
+        if fortran or dtype != np.float64:
+            raise ValueError(f'{self.path}: expected a C-ordered float64 array, got {dtype}')
+        self.shape = tuple(shape)
+        self.plane_bytes = int(np.prod(self.shape[1:], dtype=np.int64)) * 8
+        self.bytes_read = 0
+
+    def __call__(self, lo: int, hi: int):
+        mm = np.memmap(self.path, dtype=np.float64, mode='r', offset=self.offset + lo * self.plane_bytes,
+                       shape=(hi - lo,) + self.shape[1:])
+        out = np.array(mm)
+        del mm
+        self.bytes_read += out.nbytes
+        return out
+
+
+def radius2(shape, h: float = 1.0, lo: int = 0, hi: int | None = None):
+    """r² = Σ (i_ax h)² on planes lo..hi-1 of a grid of ``shape``."""
+    hi = shape[0] if hi is None else hi
+    if np is None:
+        return _py_radius2(tuple(shape), h, lo, hi)
+    r2 = np.zeros((hi - lo,) + tuple(shape[1:]))
+    for ax, n in enumerate(shape):
+        rng = np.arange(lo, hi) if ax == 0 else np.arange(n)
+        x = (rng * h)**2
+        r2 += x.reshape((-1,) + (1,) * (len(shape) - ax - 1))
+    return r2
+
+
+def grid_shape(src) -> tuple:
+    """Shape of an array or of a nested-list grid."""
+    if hasattr(src, 'shape'):
+        return tuple(src.shape)
+    shape = []
+    while isinstance(src, (list, tuple)):
+        shape.append(len(src))
+        src = src[0]
+    return tuple(shape)
+
+
+def radial_weight(shape, h: float = 1.0, a: float = 0.0, lo: int = 0, hi: int | None = None):
+    """w = 1/(1 + a r²) on planes lo..hi-1 of a grid of ``shape``."""
+    r2 = radius2(shape, h, lo, hi)
+    if np is None:
+        return _py_map(lambda v: 1.0 / (1.0 + a * v), r2)
+    return 1.0 / (1.0 + a * r2)
+
+
+def face_average(w, axis: int):
+    """(w_i + w_{i+1})/2 on the faces normal to ``axis``."""
+    return 0.5 * (_take(w, axis, slice(None, -1)) + _take(w, axis, slice(1, None)))
+
+
+def face_gradient(phi, axis: int, h: float = 1.0):
+    """(Φ_{i+1} - Φ_i)/h on the faces normal to ``axis``."""
+    return (_take(phi, axis, slice(1, None)) - _take(phi, axis, slice(None, -1))) / h
+
+
+def face_flux(phi, w=None, axis: int = 0, h: float = 1.0):
+    """w_f ∇Φ on the faces normal to ``axis`` (w = None: unit weight)."""
+    g = face_gradient(phi, axis, h)
+    return g if w is None else face_average(w, axis) * g
+
+
+def divergence(phi, w=None, h: float = 1.0):
+    """div(w ∇Φ) on the interior nodes (each axis trimmed by one node per side)."""
+    d = phi.ndim
+    inner = [slice(1, -1)] * d
+    out = np.zeros(tuple(n - 2 for n in phi.shape))
+    for ax in range(d):
+        idx = list(inner)
+        idx[ax] = slice(None)
+        idx = tuple(idx)
+        f = face_flux(phi[idx], None if w is None else w[idx], ax, h)
+        out += _take(f, ax, slice(1, None))
+        out -= _take(f, ax, slice(None, -1))
+    out /= h
+    return out
+
+
+def _boundary_faces(phi, w, ax: int, h: float):
+    """Σ outward flux through the two boundary layers normal to ``ax`` (interior of other axes)."""
+    idx = [slice(1, -1)] * phi.ndim
+    idx[ax] = slice(None)
+    idx = tuple(idx)
+    p = phi[idx]
+    ww = None if w is None else w[idx]
+    lo = face_flux(_take(p, ax, slice(0, 2)), None if ww is None else _take(ww, ax, slice(0, 2)), ax, h)
+    hi = face_flux(_take(p, ax, slice(-2, None)), None if ww is None else _take(ww, ax, slice(-2, None)), ax, h)
+    return float(hi.sum()) - float(lo.sum())
+
+
+def conservation_sums(phi, w, shape, h: float = 1.0, slab: int | None = SLAB, on_slab=None) -> dict:
+    """Interior Σ div·h^d and boundary Σ flux·h^(d-1), streamed in slabs along axis 0.
+
+    ``on_slab(k0, k1, nbytes)`` is called after each slab (used for I/O accounting).
+    """
+    if np is None:
+        return _py_conservation_sums(phi, w, tuple(shape), h)
+    shape = tuple(shape)
+    d = len(shape)
+    n0 = shape[0]
+    slab = n0 if not slab else slab
+    vol, area = h**d, h**(d - 1)
+    sum_div = 0.0
+    flux = 0.0
+    for k0 in range(1, n0 - 1, slab):
+        k1 = min(k0 + slab, n0 - 1)
+        p = planes(phi, k0 - 1, k1 + 1)
+        ww = None if w is None else planes(w, k0 - 1, k1 + 1)
+        sum_div += float(divergence(p, ww, h).sum()) * vol
+        for ax in range(1, d):
+            flux += _boundary_faces(p, ww, ax, h) * area
+        if on_slab is not None:
+            on_slab(k0, k1, p.nbytes + (0 if ww is None else ww.nbytes))
+    # faces normal to axis 0: first and last pair of planes
+    for lo, sign in ((0, -1.0), (n0 - 2, 1.0)):
+        p = planes(phi, lo, lo + 2)
+        ww = None if w is None else planes(w, lo, lo + 2)
+        inner = (slice(None),) + (slice(1, -1),) * (d - 1)
+        f = face_flux(p[inner], None if ww is None else ww[inner], 0, h)
+        flux += sign * float(f.sum()) * area
+    return {'sum_div_interior': sum_div, 'flux_out_boundary': flux, 'abs_residual': abs(sum_div - flux)}
+
+
+def laplacian_error(phi, shape, expected: float, h: float = 1.0, slab: int | None = SLAB) -> dict:
+    """max |ΔΦ - expected| over interior nodes (central differences), streamed in slabs."""
+    if np is None:
+        return _py_laplacian_error(phi, tuple(shape), expected, h)
+    shape = tuple(shape)
+    n0 = shape[0]
+    slab = n0 if not slab else slab
+    err = 0.0
+    for k0 in range(1, n0 - 1, slab):
+        k1 = min(k0 + slab, n0 - 1)
+        lap = divergence(planes(phi, k0 - 1, k1 + 1), None, h)
+        err = max(err, float(np.abs(lap - expected).max()))
+    count = 1
+    for n in shape:
+        count *= n - 2
+    return {'max_abs_err': err, 'count_interior': count}
+
+
+# ------------------- Pure-Python path -------------------
+
+def _py_radius2(shape, h, lo, hi):
+    def build(ax, base):
+        if ax == len(shape):
+            return base
+        rng = range(lo, hi) if ax == 0 else range(shape[ax])
+        return [build(ax + 1, base + (i * h)**2) for i in rng]
+    return build(0, 0.0)
+
+
+def _py_map(fn, nested):
+    if isinstance(nested, list):
+        return [_py_map(fn, v) for v in nested]
+    return fn(nested)
+
+
+def _py_flat(src, shape):
+    """Whole-grid source (nested lists or callable) → flat row-major list."""
+    nested = src(0, shape[0]) if callable(src) else src
+    out = []
+
+    def walk(v):
+        if isinstance(v, (list, tuple)):
+            for u in v:
+                walk(u)
+        else:
+            out.append(float(v))
+    walk(nested)
+    return out
+
+
+def _strides(shape):
+    st = [1] * len(shape)
+    for ax in range(len(shape) - 2, -1, -1):
+        st[ax] = st[ax + 1] * shape[ax + 1]
+    return st
+
+
+def _py_flux(p, w, i, step, h):
+    """Face flux between flat nodes i and i+step (w = None: unit weight)."""
+    g = (p[i + step] - p[i]) / h
+    return g if w is None else 0.5 * (w[i] + w[i + step]) * g
+
+
+def _py_divergence(p, w, shape, h):
+    """Yield div(w∇Φ) at every interior node of a flat grid."""
+    from itertools import product
+
+    st = _strides(shape)
+    for idx in product(*(range(1, n - 1) for n in shape)):
+        i = sum(a * b for a, b in zip(idx, st))
+        yield sum(_py_flux(p, w, i, s, h) - _py_flux(p, w, i - s, s, h) for s in st) / h
+
+
+def _py_conservation_sums(phi, w, shape, h):
+    from itertools import product
+
+    d = len(shape)
+    p = _py_flat(phi, shape)
+    ww = None if w is None else _py_flat(w, shape)
+    st = _strides(shape)
+    sum_div = sum(_py_divergence(p, ww, shape, h)) * h**d
+    flux = 0.0
+    for ax in range(d):
+        others = [range(1, n - 1) if a != ax else (0,) for a, n in enumerate(shape)]
+        for idx in product(*others):
+            i = sum(a * b for a, b in zip(idx, st))
+            flux -= _py_flux(p, ww, i, st[ax], h)
+            flux += _py_flux(p, ww, i + (shape[ax] - 2) * st[ax], st[ax], h)
+    flux *= h**(d - 1)
+    return {'sum_div_interior': sum_div, 'flux_out_boundary': flux, 'abs_residual': abs(sum_div - flux)}
+
+
+def _py_laplacian_error(phi, shape, expected, h):
+    p = _py_flat(phi, shape)
+    err = max((abs(v - expected) for v in _py_divergence(p, None, shape, h)), default=0.0)
+    count = 1
+    for n in shape:
+        count *= n - 2
+    return {'max_abs_err': err, 'count_interior': count}
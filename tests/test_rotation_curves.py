@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip('numpy')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+from rotation_curves import COLUMNS, chi2_per_galaxy, ilg_velocity  # noqa: E402
+
+
+def _catalog(offsets, seed=0):
+    rng = np.random.default_rng(seed)
+    n = offsets[-1]
+    cat = {c: rng.uniform(1.0, 100.0, n) for c in COLUMNS}
+    cat['offsets'] = np.asarray(offsets, dtype=np.int64)
+    return cat
+
+
+def _reference(cat, a0, ups_disk=0.5, ups_bul=0.7):
+    out = []
+    off = cat['offsets']
+    for g in range(len(off) - 1):
+        sl = slice(off[g], off[g + 1])
+        v = ilg_velocity(cat['r_kpc'][sl], cat['v_gas'][sl], cat['v_disk'][sl], cat['v_bul'][sl], a0,
+                         ups_disk, ups_bul)
+        out.append(float(np.sum(((v - cat['v_obs'][sl]) / cat['v_err'][sl])**2)))
+    return np.array(out)
+
+
+@pytest.mark.parametrize('offsets', [[0, 2, 5, 5], [0, 0, 3, 3, 7], [0, 3, 3, 6, 6]])
+def test_empty_galaxies(offsets):
+    cat = _catalog(offsets)
+    a0 = 1.2e-10
+    got = chi2_per_galaxy(cat, a0)
+    np.testing.assert_allclose(got, _reference(cat, a0), rtol=1e-12, atol=0.0)
+    assert all(got[g] == 0.0 for g in range(len(offsets) - 1) if offsets[g] == offsets[g + 1])
+
+
+def test_empty_galaxies_subrange_and_grid():
+    cat = _catalog([0, 2, 2, 5, 9, 9])
+    a0 = 1.2e-10
+    ref = _reference(cat, a0)
+    np.testing.assert_allclose(chi2_per_galaxy(cat, a0, g0=1, g1=5), ref[1:5], rtol=1e-12)
+    ups = np.array([[0.5], [0.5]])
+    grid = chi2_per_galaxy(cat, a0, ups_disk=ups)
+    assert grid.shape == (2, 5)
+    np.testing.assert_allclose(grid[1], ref, rtol=1e-12)